@@ -0,0 +1,55 @@
+import { parentPort, workerData } from "worker_threads";
+import { pathToFileURL } from "url";
+import { getLogs, flushEvents } from "./logging.js";
+import { notifyFunded } from "./utils.js";
+
+// One packed agent, run by host.js in its own worker thread. The worker has its
+// own copy of utils.js/logging.js module state, its own process.env and its own
+// heap, so agents sharing a container cannot see or starve each other.
+const { agentId, modulePath, ownerAddress } = workerData;
+const agent = await import(pathToFileURL(modulePath).href);
+
+agent.setOnStatusUpdate((status) => {
+  parentPort.postMessage({ type: "status", status });
+});
+
+// Requests routed here by the host, answered by message id
+const handlers = {
+  status: () => agent.getCurrentStatus(),
+  logs: () => getLogs(),
+  withdraw: ({ tokenAddress, amount }) =>
+    agent.withdrawToOwner(tokenAddress, amount),
+  funded: (payload) => notifyFunded(payload),
+};
+
+async function stopAgent() {
+  // Modules built by the code-generation service cancel their own timers;
+  // plain baselineFunction() modules just stop with the worker
+  if (typeof agent.stop === "function") await agent.stop();
+  await flushEvents();
+  process.exit(0);
+}
+
+parentPort.on("message", async ({ id, type, payload }) => {
+  if (type === "stop") {
+    await stopAgent();
+    return;
+  }
+  try {
+    const handler = handlers[type];
+    if (!handler) throw new Error(`Unknown request: ${type}`);
+    const result = await handler(payload);
+    parentPort.postMessage({ id, result });
+  } catch (error) {
+    parentPort.postMessage({ id, error: error.message });
+  }
+});
+
+console.log(`Starting agent ${agentId} for owner: ${ownerAddress}`);
+if (typeof agent.start === "function") {
+  await agent.start({ ownerAddress });
+} else {
+  // A rejection here is unhandled on purpose: it ends this worker and the
+  // host restarts it, like App Runner restarting a single-agent container
+  agent.baselineFunction(ownerAddress);
+}
@@ -0,0 +1,398 @@
+import express from "express";
+import cors from "cors";
+import crypto from "crypto";
+import fs from "fs";
+import path from "path";
+import readline from "readline";
+import { Worker } from "worker_threads";
+import dotenv from "dotenv";
+
+dotenv.config();
+
+// Multi-tenant runtime for packed deployments: every agent listed in the
+// manifest runs in its own worker thread (agent-worker.js) with its own
+// environment, data directory and heap limit, behind one HTTP server.
+const PORT = process.env.PORT || 3000;
+const MANIFEST_FILE =
+  process.env.AGENTS_MANIFEST || path.join(process.cwd(), "agents.json");
+const DATA_DIR =
+  process.env.AGENTS_DATA_DIR || path.join(process.cwd(), "data");
+// Public URL of this host; agents' balance watcher callbacks go to HOST_URL/agents/:agentId/funded
+const HOST_URL = process.env.HOST_URL;
+// Heap limit for agents whose manifest entry has no heapLimitMb
+const DEFAULT_AGENT_HEAP_LIMIT_MB = Number(process.env.AGENT_HEAP_LIMIT_MB || 144);
+const STOP_GRACE_MS = 5000;
+const REQUEST_TIMEOUT_MS = 15000;
+// Crashed agents are restarted after 1s, 2s, 4s... up to this
+const RESTART_MAX_MS = 5 * 60 * 1000;
+// Per-agent variables, never inherited from the host environment
+const AGENT_ENV_KEYS = [
+  "AGENT_ID",
+  "OWNER_ADDRESS",
+  "WALLET_ID",
+  "WALLET_ADDRESS",
+  "AGENT_URL",
+  "LOGS_FILE",
+  "STATUS_FILE",
+  "ENV_FILE",
+  "PORT",
+  "EVENT_INGEST_KEY",
+];
+const WORKER_PATH = path.join(process.cwd(), "agent-worker.js");
+
+const app = express();
+
+app.use(
+  cors({
+    origin: "*",
+    methods: ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allowedHeaders: ["Content-Type", "Authorization", "x-api-key"],
+    credentials: false,
+  })
+);
+
+// Keep the raw body so watcher signatures can be checked
+app.use(
+  express.json({
+    verify: (req, res, buf) => {
+      req.rawBody = buf;
+    },
+  })
+);
+
+// Authentication middleware
+function authenticateAPIKey(req, res, next) {
+  const apiKey = req.headers["x-api-key"];
+
+  if (!process.env.API_KEY) {
+    console.warn("⚠️  WARNING: API_KEY not set in environment. Agent endpoints are unprotected!");
+    return next();
+  }
+
+  if (apiKey !== process.env.API_KEY) {
+    console.log(`❌ Unauthorized request to ${req.path} from ${req.ip}`);
+    return res.status(401).json({
+      success: false,
+      error: "Unauthorized: Invalid or missing API key",
+    });
+  }
+
+  next();
+}
+
+// Funded callbacks carry the balance watcher's HMAC-SHA256 of the body, keyed
+// by API_KEY, instead of the key itself; stale notifications are rejected
+const WATCHER_MAX_AGE_S = 300;
+function authenticateWatcher(req, res, next) {
+  if (!process.env.API_KEY) {
+    console.warn("⚠️  WARNING: API_KEY not set in environment. Funded notifications are unverified!");
+    return next();
+  }
+
+  const signature = String(req.headers["x-watcher-signature"] || "");
+  const expected = crypto
+    .createHmac("sha256", process.env.API_KEY)
+    .update(req.rawBody || "")
+    .digest("hex");
+  const sentAt = Number(req.body?.sent_at);
+  if (
+    signature.length !== expected.length ||
+    !crypto.timingSafeEqual(Buffer.from(signature), Buffer.from(expected)) ||
+    !(Math.abs(Date.now() / 1000 - sentAt) <= WATCHER_MAX_AGE_S)
+  ) {
+    console.log(`❌ Rejected funded notification from ${req.ip}`);
+    return res.status(401).json({
+      success: false,
+      error: "Unauthorized: Invalid or stale watcher signature",
+    });
+  }
+
+  next();
+}
+
+// agentId -> { config, worker, status, pending, nextRequestId, restarts, ... }
+const agents = new Map();
+let shuttingDown = false;
+
+function loadManifest() {
+  const manifest = JSON.parse(fs.readFileSync(MANIFEST_FILE, "utf8"));
+  for (const config of manifest) {
+    if (!/^[A-Za-z0-9_-]+$/.test(String(config.agentId))) {
+      throw new Error(`Invalid agentId in manifest: ${config.agentId}`);
+    }
+  }
+  return manifest;
+}
+
+// Environment for one agent: shared credentials from the host, plus the
+// agent's own id, owner, files and wallet (from its own .env file)
+function agentEnv(config) {
+  const dir = path.join(DATA_DIR, String(config.agentId));
+  fs.mkdirSync(dir, { recursive: true });
+  const envFile = path.join(dir, ".env");
+
+  const env = { ...process.env };
+  for (const key of AGENT_ENV_KEYS) delete env[key];
+  if (fs.existsSync(envFile)) {
+    Object.assign(env, dotenv.parse(fs.readFileSync(envFile)));
+  }
+  return {
+    ...env,
+    AGENT_ID: String(config.agentId),
+    OWNER_ADDRESS: config.ownerAddress || "",
+    AGENT_URL: HOST_URL ? `${HOST_URL}/agents/${config.agentId}` : "",
+    LOGS_FILE: path.join(dir, "logs.json"),
+    STATUS_FILE: path.join(dir, "status.json"),
+    ENV_FILE: envFile,
+    // Derived per agent by the deployer; see eventIngestKey() in deploy.js
+    EVENT_INGEST_KEY: config.eventIngestKey || "",
+  };
+}
+
+// Prefix a worker's output with its agent id so packed agents' logs stay separable
+function pipeOutput(stream, target, agentId) {
+  readline
+    .createInterface({ input: stream })
+    .on("line", (line) => target.write(`[${agentId}] ${line}\n`));
+}
+
+function startAgent(agentId) {
+  const agent = agents.get(agentId);
+  const { config } = agent;
+  const heapLimitMb = Number(config.heapLimitMb || DEFAULT_AGENT_HEAP_LIMIT_MB);
+
+  const worker = new Worker(WORKER_PATH, {
+    workerData: {
+      agentId,
+      modulePath: path.join(process.cwd(), config.module),
+      ownerAddress: config.ownerAddress,
+    },
+    env: agentEnv(config),
+    resourceLimits: { maxOldGenerationSizeMb: heapLimitMb },
+    stdout: true,
+    stderr: true,
+  });
+  pipeOutput(worker.stdout, process.stdout, agentId);
+  pipeOutput(worker.stderr, process.stderr, agentId);
+
+  agent.worker = worker;
+  agent.stopping = false;
+  agent.startedAt = Date.now();
+
+  worker.on("message", (message) => {
+    if (message.type === "status") {
+      agent.status = message.status;
+      return;
+    }
+    const request = agent.pending.get(message.id);
+    if (!request) return;
+    agent.pending.delete(message.id);
+    clearTimeout(request.timer);
+    if (message.error) request.reject(new Error(message.error));
+    else request.resolve(message.result);
+  });
+
+  worker.on("error", (error) => {
+    if (error.code === "ERR_WORKER_OUT_OF_MEMORY") {
+      agent.outOfMemory += 1;
+      agent.lastError = `Out of memory (heap limit ${heapLimitMb}MB)`;
+      console.error(`💥 Agent ${agentId} ran out of memory (heap limit ${heapLimitMb}MB)`);
+      return;
+    }
+    agent.lastError = error.message;
+    console.error(`❌ Agent ${agentId} crashed: ${error.message}`);
+  });
+
+  worker.on("exit", (code) => {
+    agent.worker = null;
+    for (const request of agent.pending.values()) {
+      clearTimeout(request.timer);
+      request.reject(new Error("Agent stopped"));
+    }
+    agent.pending.clear();
+    if (agent.stopping || shuttingDown) {
+      console.log(`⏹️  Agent ${agentId} stopped`);
+      return;
+    }
+
+    // A worker that ran for a while before failing starts over at the shortest delay
+    if (Date.now() - agent.startedAt > RESTART_MAX_MS) agent.restarts = 0;
+    const delay = Math.min(1000 * 2 ** agent.restarts, RESTART_MAX_MS);
+    agent.restarts += 1;
+    console.warn(`⚠️ Agent ${agentId} exited with code ${code}, restarting in ${delay / 1000}s`);
+    agent.restartTimer = setTimeout(() => {
+      agent.restartTimer = null;
+      if (!agent.worker && !agent.stopping && !shuttingDown) startAgent(agentId);
+    }, delay);
+  });
+
+  console.log(`▶️  Agent ${agentId} started (heap limit ${heapLimitMb}MB)`);
+}
+
+// Ask the agent to stop cleanly, and terminate it if it doesn't within STOP_GRACE_MS
+async function stopAgent(agentId) {
+  const agent = agents.get(agentId);
+  agent.stopping = true;
+  clearTimeout(agent.restartTimer);
+  agent.restartTimer = null;
+  const worker = agent.worker;
+  if (!worker) return;
+
+  const exited = new Promise((resolve) => worker.once("exit", resolve));
+  worker.postMessage({ type: "stop" });
+  const timer = setTimeout(() => worker.terminate(), STOP_GRACE_MS);
+  await exited;
+  clearTimeout(timer);
+}
+
+// Send a request to an agent's worker and wait for its answer
+function requestAgent(agentId, type, payload) {
+  const agent = agents.get(agentId);
+  if (!agent.worker) {
+    return Promise.reject(new Error("Agent is not running"));
+  }
+  const id = agent.nextRequestId++;
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => {
+      agent.pending.delete(id);
+      reject(new Error(`Agent did not answer within ${REQUEST_TIMEOUT_MS / 1000}s`));
+    }, REQUEST_TIMEOUT_MS);
+    agent.pending.set(id, { resolve, reject, timer });
+    agent.worker.postMessage({ id, type, payload });
+  });
+}
+
+// Resolve :agentId to a packed agent, or answer 404
+function findAgent(req, res, next) {
+  if (!agents.has(req.params.agentId)) {
+    return res.status(404).json({ success: false, error: "Unknown agent" });
+  }
+  next();
+}
+
+// Endpoint: Host overview
+app.get("/status", (req, res) => {
+  const memory = process.memoryUsage();
+  res.json({
+    agents: agents.size,
+    running: [...agents.values()].filter((agent) => agent.worker).length,
+    rssMb: Math.round(memory.rss / 1024 / 1024),
+    uptimeSeconds: Math.round(process.uptime()),
+  });
+});
+
+// Endpoint: Every packed agent and its state
+app.get("/agents", (req, res) => {
+  res.json(
+    [...agents.values()].map((agent) => ({
+      agentId: agent.config.agentId,
+      running: Boolean(agent.worker),
+      restarts: agent.restarts,
+      phase: agent.status?.phase || null,
+      heapLimitMb: Number(agent.config.heapLimitMb || DEFAULT_AGENT_HEAP_LIMIT_MB),
+      outOfMemory: agent.outOfMemory,
+      lastError: agent.lastError,
+    }))
+  );
+});
+
+// Endpoint: Get an agent's current status (its last update, also while restarting)
+app.get("/agents/:agentId/status", findAgent, (req, res) => {
+  res.json(agents.get(req.params.agentId).status || {});
+});
+
+// Endpoint: Get an agent's recent logs
+app.get("/agents/:agentId/logs", findAgent, async (req, res) => {
+  try {
+    res.json(await requestAgent(req.params.agentId, "logs"));
+  } catch (error) {
+    res.status(503).json({ success: false, error: error.message });
+  }
+});
+
+// Endpoint: Withdraw an agent's funds (protected with API key authentication)
+app.post("/agents/:agentId/withdraw", authenticateAPIKey, findAgent, async (req, res) => {
+  const { agentId } = req.params;
+  const { tokenAddress, amount } = req.body;
+  if (!tokenAddress || !amount) {
+    return res.status(400).json({
+      success: false,
+      error: "tokenAddress and amount are required",
+    });
+  }
+
+  try {
+    console.log(`💰 Processing withdrawal request for agent ${agentId}: ${amount} of ${tokenAddress}`);
+    const result = await requestAgent(agentId, "withdraw", { tokenAddress, amount });
+    console.log(`✅ Withdrawal successful for agent ${agentId}: ${result.hash}`);
+    res.json({ success: true, ...result });
+  } catch (error) {
+    console.error(`❌ Withdrawal failed for agent ${agentId}: ${error.message}`);
+    res.status(500).json({ success: false, error: error.message });
+  }
+});
+
+// Endpoint: Funded notification from the balance watcher (protected with its signature)
+app.post("/agents/:agentId/funded", authenticateWatcher, findAgent, async (req, res) => {
+  try {
+    await requestAgent(req.params.agentId, "funded", req.body || {});
+    res.json({ success: true });
+  } catch (error) {
+    res.status(503).json({ success: false, error: error.message });
+  }
+});
+
+// Endpoint: Stop an agent without affecting the others (protected with API key authentication)
+app.post("/agents/:agentId/stop", authenticateAPIKey, findAgent, async (req, res) => {
+  await stopAgent(req.params.agentId);
+  res.json({ success: true, message: "Agent stopped" });
+});
+
+// Endpoint: Start a stopped agent (protected with API key authentication)
+app.post("/agents/:agentId/start", authenticateAPIKey, findAgent, (req, res) => {
+  const agent = agents.get(req.params.agentId);
+  if (agent.worker) {
+    return res.json({ success: true, message: "Agent already running" });
+  }
+  clearTimeout(agent.restartTimer);
+  agent.restarts = 0;
+  startAgent(req.params.agentId);
+  res.json({ success: true, message: "Agent started" });
+});
+
+// Stop every agent so each can flush its logs and events before the container stops
+process.once("SIGTERM", async () => {
+  shuttingDown = true;
+  console.log("🛑 Stopping all agents...");
+  await Promise.all([...agents.keys()].map(stopAgent));
+  process.exit(0);
+});
+
+for (const config of loadManifest()) {
+  const agentId = String(config.agentId);
+  agents.set(agentId, {
+    config,
+    worker: null,
+    status: null,
+    pending: new Map(),
+    nextRequestId: 0,
+    restarts: 0,
+    restartTimer: null,
+    outOfMemory: 0,
+    lastError: null,
+    stopping: false,
+    startedAt: 0,
+  });
+  startAgent(agentId);
+}
+
+app.listen(PORT, () => {
+  console.log(`Agent host running on port ${PORT} with ${agents.size} agents`);
+  console.log(`- GET /status: Host overview`);
+  console.log(`- GET /agents: Packed agents`);
+  console.log(`- GET /agents/:agentId/status: Agent status`);
+  console.log(`- GET /agents/:agentId/logs: Agent logs`);
+  console.log(`- POST /agents/:agentId/withdraw: Withdraw an agent's funds`);
+  console.log(`- POST /agents/:agentId/funded: Funded notification from the balance watcher`);
+  console.log(`- POST /agents/:agentId/stop, /agents/:agentId/start: Stop or start one agent`);
+});
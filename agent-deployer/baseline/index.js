@@ -1,5 +1,6 @@
 import express from "express";
 import cors from "cors";
+import crypto from "crypto";
 import fs from "fs";
 import path from "path";
 import dotenv from "dotenv";
@@ -10,8 +11,9 @@ import {
   setOnLog,
   withdrawToOwner,
 } from "./baseline.js";
+import { notifyFunded } from "./utils.js";
 
-dotenv.config();
+dotenv.config({ path: process.env.ENV_FILE });
 
 const app = express();
 
@@ -25,7 +27,14 @@ app.use(
   })
 );
 
-app.use(express.json());
+// Keep the raw body so watcher signatures can be checked
+app.use(
+  express.json({
+    verify: (req, res, buf) => {
+      req.rawBody = buf;
+    },
+  })
+);
 const PORT = process.env.PORT || 3000;
 
 // Authentication middleware
@@ -48,13 +57,48 @@ function authenticateAPIKey(req, res, next) {
   next();
 }
 
+// Funded callbacks carry the balance watcher's HMAC-SHA256 of the body, keyed
+// by API_KEY, instead of the key itself; stale notifications are rejected
+const WATCHER_MAX_AGE_S = 300;
+function authenticateWatcher(req, res, next) {
+  if (!process.env.API_KEY) {
+    console.warn('⚠️  WARNING: API_KEY not set in environment. Funded notifications are unverified!');
+    return next();
+  }
+
+  const signature = String(req.headers["x-watcher-signature"] || "");
+  const expected = crypto
+    .createHmac("sha256", process.env.API_KEY)
+    .update(req.rawBody || "")
+    .digest("hex");
+  const sentAt = Number(req.body?.sent_at);
+  if (
+    signature.length !== expected.length ||
+    !crypto.timingSafeEqual(Buffer.from(signature), Buffer.from(expected)) ||
+    !(Math.abs(Date.now() / 1000 - sentAt) <= WATCHER_MAX_AGE_S)
+  ) {
+    console.log(`❌ Rejected funded notification from ${req.ip}`);
+    return res.status(401).json({
+      success: false,
+      error: "Unauthorized: Invalid or stale watcher signature",
+    });
+  }
+
+  next();
+}
+
 // File paths for persistence
-const LOGS_FILE = path.join(process.cwd(), "logs.json");
-const STATUS_FILE = path.join(process.cwd(), "status.json");
+const LOGS_FILE =
+  process.env.LOGS_FILE || path.join(process.cwd(), "logs.json");
+const STATUS_FILE =
+  process.env.STATUS_FILE || path.join(process.cwd(), "status.json");
+// Files are rewritten at most this often instead of on every log line or status change
+const SAVE_DEBOUNCE_MS = 1000;
 
 // In-memory logs and status (loaded from files)
 let logs = [];
 let currentStatus = {};
+const saveTimers = {};
 
 // Load persistent data
 function loadPersistentData() {
@@ -96,13 +140,22 @@ function saveStatus() {
   }
 }
 
+// Coalesce writes of one file into a single write per SAVE_DEBOUNCE_MS
+function scheduleSave(name, save) {
+  if (saveTimers[name]) return;
+  saveTimers[name] = setTimeout(() => {
+    delete saveTimers[name];
+    save();
+  }, SAVE_DEBOUNCE_MS);
+}
+
 // Load data on startup
 loadPersistentData();
 
 // Hook into baseline callbacks
 setOnStatusUpdate((status) => {
   currentStatus = status;
-  saveStatus();
+  scheduleSave("status", saveStatus);
   console.log("Status updated:", status.phase, "-", status.lastMessage);
 });
 
@@ -110,7 +163,7 @@ setOnLog((message) => {
   const logEntry = { timestamp: new Date().toISOString(), message };
   logs.push(logEntry);
   if (logs.length > 1000) logs.shift(); // Keep last 1000
-  saveLogs();
+  scheduleSave("logs", saveLogs);
   console.log(message);
 });
 
@@ -154,6 +207,12 @@ app.post("/withdraw", authenticateAPIKey, async (req, res) => {
   }
 });
 
+// Endpoint: Funded notification from the balance watcher (protected with its signature)
+app.post("/funded", authenticateWatcher, (req, res) => {
+  notifyFunded(req.body);
+  res.json({ success: true });
+});
+
 // Endpoint: Start baseline manually (if not auto-started)
 app.post("/start", async (req, res) => {
   try {
@@ -178,4 +237,5 @@ app.listen(PORT, () => {
   console.log(`- GET /logs: Recent logs`);
   console.log(`- POST /withdraw: Withdraw funds`);
   console.log(`- POST /start: Start baseline manually`);
+  console.log(`- POST /funded: Funded notification from the balance watcher`);
 });
@@ -1,9 +1,12 @@
 import { createClient } from "@supabase/supabase-js";
+import axios from "axios";
 import fs from "fs";
 import path from "path";
+import zlib from "zlib";
 import dotenv from "dotenv";
 
-dotenv.config();
+// ENV_FILE lets several agents share one working directory (see host.js)
+dotenv.config({ path: process.env.ENV_FILE });
 
 // Initialize Supabase client
 const supabase = createClient(
@@ -12,10 +15,28 @@ const supabase = createClient(
 );
 
 // File paths for persistence
-const LOGS_FILE = path.join(process.cwd(), "logs.json");
+const LOGS_FILE =
+  process.env.LOGS_FILE || path.join(process.cwd(), "logs.json");
+// logs.json is rewritten at most this often instead of on every log line
+const SAVE_DEBOUNCE_MS = 1000;
+
+// Batched event ingestion (code-generation events.py). When set, log lines and
+// status updates are buffered and sent in gzip-compressed NDJSON batches
+const EVENT_INGEST_URL = process.env.EVENT_INGEST_URL;
+const EVENT_INGEST_KEY = process.env.EVENT_INGEST_KEY;
+const INGEST_ENABLED = Boolean(EVENT_INGEST_URL && process.env.AGENT_ID);
+const EVENT_FLUSH_MS = Number(process.env.EVENT_FLUSH_MS || 5000);
+const EVENT_BATCH_SIZE = 200;
+// Events kept while the ingestion endpoint is unreachable; the oldest are dropped beyond this
+const EVENT_BUFFER_MAX = 5000;
 
 // In-memory logs
 let logs = [];
+let saveTimer = null;
+let eventBuffer = [];
+let flushTimer = null;
+let flushing = null;
+let pendingBroadcast = null;
 
 // Load existing logs
 try {
@@ -30,13 +51,101 @@ try {
 
 // Save logs to file
 function saveLogs() {
+  if (saveTimer) {
+    clearTimeout(saveTimer);
+    saveTimer = null;
+  }
   try {
-    fs.writeFileSync(LOGS_FILE, JSON.stringify(logs, null, 2));
+    fs.writeFileSync(LOGS_FILE, JSON.stringify(logs));
   } catch (error) {
     console.error("Error saving logs:", error.message);
   }
 }
 
+// Coalesce log writes into one file write per SAVE_DEBOUNCE_MS
+function scheduleSaveLogs() {
+  if (!saveTimer) {
+    saveTimer = setTimeout(saveLogs, SAVE_DEBOUNCE_MS);
+    saveTimer.unref();
+  }
+}
+
+// Queue an event for the next ingestion batch
+function enqueueEvent(event) {
+  eventBuffer.push(event);
+  if (eventBuffer.length > EVENT_BUFFER_MAX) {
+    eventBuffer.splice(0, eventBuffer.length - EVENT_BUFFER_MAX);
+  }
+  if (eventBuffer.length >= EVENT_BATCH_SIZE) {
+    flushEvents();
+  } else if (!flushTimer) {
+    flushTimer = setTimeout(flushEvents, EVENT_FLUSH_MS);
+    flushTimer.unref();
+  }
+}
+
+// Send buffered events in one request, plus the latest status broadcast
+async function flushEvents() {
+  if (flushTimer) {
+    clearTimeout(flushTimer);
+    flushTimer = null;
+  }
+  if (flushing) {
+    // Send whatever was queued meanwhile once the in-flight request is done
+    await flushing;
+    if (eventBuffer.length === 0 && !pendingBroadcast) return;
+    return flushEvents();
+  }
+
+  const batch = eventBuffer;
+  eventBuffer = [];
+  const status = pendingBroadcast;
+  pendingBroadcast = null;
+
+  flushing = (async () => {
+    if (status) await broadcastStatus(status);
+    if (batch.length === 0) return;
+    try {
+      const body = zlib.gzipSync(
+        batch.map((event) => JSON.stringify(event)).join("\n")
+      );
+      const headers = {
+        "Content-Type": "application/x-ndjson",
+        "Content-Encoding": "gzip",
+      };
+      if (EVENT_INGEST_KEY) headers["x-api-key"] = EVENT_INGEST_KEY;
+      await axios.post(
+        `${EVENT_INGEST_URL}/events/${process.env.AGENT_ID}`,
+        body,
+        { headers, timeout: 10000 }
+      );
+    } catch (error) {
+      // Keep the batch for the next flush
+      console.error("Event ingestion failed:", error.message);
+      eventBuffer = batch.concat(eventBuffer).slice(-EVENT_BUFFER_MAX);
+    }
+  })();
+  try {
+    await flushing;
+  } finally {
+    flushing = null;
+  }
+  if (eventBuffer.length > 0 && !flushTimer) {
+    flushTimer = setTimeout(flushEvents, EVENT_FLUSH_MS);
+    flushTimer.unref();
+  }
+}
+
+// Flush pending logs and events before the container stops
+process.once("exit", () => {
+  if (saveTimer) saveLogs();
+});
+process.once("SIGTERM", async () => {
+  saveLogs();
+  if (INGEST_ENABLED) await flushEvents();
+  process.exit(0);
+});
+
 // Broadcast status update
 async function broadcastStatus(status) {
   try {
@@ -86,7 +195,8 @@ function log(message, level = "info") {
   if (logs.length > 1000) logs.shift(); // Keep last 1000 logs
 
   // Save to file
-  saveLogs();
+  scheduleSaveLogs();
+  if (INGEST_ENABLED) enqueueEvent({ type: "log", ...logEntry });
 
   // Console output with color
   const colors = {
@@ -149,8 +259,26 @@ function updateStatus(currentStatus, newStatus) {
 
   const updatedStatus = { ...currentStatus, ...newStatus, nextStep };
 
-  // Broadcast status updates
-  broadcastStatus(updatedStatus);
+  // Broadcast status updates. With batched ingestion, statuses go out with
+  // the next flush and only the latest one is broadcast
+  if (INGEST_ENABLED) {
+    pendingBroadcast = updatedStatus;
+    enqueueEvent({
+      type: "status",
+      timestamp: new Date().toISOString(),
+      status: {
+        phase: updatedStatus.phase,
+        walletAddress: updatedStatus.walletAddress,
+        polBalance: updatedStatus.polBalance || 0,
+        lastMessage: updatedStatus.lastMessage,
+        nextStep: updatedStatus.nextStep,
+        error: updatedStatus.error,
+        isRunning: updatedStatus.isRunning,
+      },
+    });
+  } else {
+    broadcastStatus(updatedStatus);
+  }
 
   // Log status update
   log(
@@ -174,4 +302,4 @@ function clearLogs() {
   saveLogs();
 }
 
-export { log, updateStatus, getLogs, clearLogs };
+export { log, updateStatus, getLogs, clearLogs, flushEvents };
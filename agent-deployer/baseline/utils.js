@@ -9,7 +9,7 @@ async function getGasPrice() {
 }
 
 // Load environment variables
-dotenv.config();
+dotenv.config({ path: process.env.ENV_FILE });
 
 // Configure LiFi SDK
 createConfig({
@@ -18,6 +18,21 @@ createConfig({
 
 // Constants
 const LIFI_API_BASE = "https://li.quest/v1";
+const MOBULA_API_BASE = "https://api.mobula.io/api/1";
+// Optional shared market-data cache (code-generation/market_data.py). When set,
+// market data and token info are read through it instead of each agent
+// polling Mobula and LiFi directly.
+const MARKET_DATA_URL = process.env.MARKET_DATA_URL;
+// Optional fleet balance watcher (code-generation/balance_watcher.py). When
+// set, the funding loop waits for its funded notification instead of
+// re-checking the balance every 30 seconds.
+const BALANCE_WATCHER_URL = process.env.BALANCE_WATCHER_URL;
+// Sent as x-api-key to the watcher; must match its WATCHER_API_KEY
+const BALANCE_WATCHER_KEY = process.env.BALANCE_WATCHER_KEY;
+// Public URL of this agent, so the watcher can POST /funded to it
+const AGENT_URL = process.env.AGENT_URL;
+// With the watcher, the balance is still re-checked this often as a fallback
+const WATCHER_FALLBACK_MS = 10 * 60 * 1000;
 const POLYGON_CHAIN_ID = "137";
 const NATIVE_TOKEN_ADDRESS = "0x0000000000000000000000000000000000000000";
 
@@ -136,6 +151,39 @@ function fromWei(rawAmount, decimals) {
   return humanAmount;
 }
 
+/**
+ * GET through the shared market-data cache when MARKET_DATA_URL is set, falling
+ * back to the upstream URL if the cache is unset, unreachable, or doesn't serve
+ * the token (it only serves tokens.json). The cache returns the upstream
+ * response shape, so callers don't care which served it.
+ * @param {string} cachePath - Path and query on the cache service
+ * @param {string} upstreamUrl - Full upstream URL
+ * @returns {Promise<Object>} Axios response
+ */
+async function readThroughCache(cachePath, upstreamUrl) {
+  if (MARKET_DATA_URL) {
+    try {
+      return await axios.get(`${MARKET_DATA_URL}${cachePath}`, {
+        timeout: 15000,
+      });
+    } catch (error) {
+      // The cache only serves tokens.json; anything else goes straight upstream
+      const detail = String(error.response?.data?.detail || "");
+      const unlisted = error.response?.status === 400 && detail.startsWith("Unsupported ");
+      // Other client errors (e.g. unknown symbol) would fail upstream too
+      if (error.response && error.response.status < 500 && !unlisted) {
+        throw error;
+      }
+      console.warn(
+        unlisted
+          ? `⚠️ ${detail} in the market-data cache, calling upstream`
+          : `⚠️ Market-data cache unavailable (${error.message}), calling upstream`
+      );
+    }
+  }
+  return axios.get(upstreamUrl);
+}
+
 /**
  * Get token information from LiFi API
  * @param {string} token - Token address
@@ -153,13 +201,15 @@ function fromWei(rawAmount, decimals) {
 async function getTokenInfo(token) {
   try {
     const chain = 137;
-    const url = `${LIFI_API_BASE}/token`;
     const queryParams = new URLSearchParams({
       chain,
       token,
     });
 
-    const response = await axios.get(`${url}?${queryParams}`);
+    const response = await readThroughCache(
+      `/market/token?${queryParams}`,
+      `${LIFI_API_BASE}/token?${queryParams}`
+    );
     return response.data;
   } catch (error) {
     console.error("Error fetching token info:", error.message);
@@ -207,8 +257,11 @@ async function getTokenInfo(token) {
  */
 async function getTokenMarketData(symbol) {
   try {
-    const url = `https://api.mobula.io/api/1/market/data`;
-    const response = await axios.get(`${url}?symbol=${symbol}&chain=137`);
+    const query = `symbol=${encodeURIComponent(symbol)}&chain=137`;
+    const response = await readThroughCache(
+      `/market/data?${query}`,
+      `${MOBULA_API_BASE}/market/data?${query}`
+    );
     return response.data.data;
   } catch (error) {
     console.error("Error fetching token market data:", error.message);
@@ -514,7 +567,7 @@ async function checkBalance(walletAddress, amount = 0.01) {
  */
 async function writeToEnvFile(walletId, walletAddress) {
   try {
-    const envPath = path.join(process.cwd(), ".env");
+    const envPath = process.env.ENV_FILE || path.join(process.cwd(), ".env");
     let envContent = "";
 
     // Read existing .env file if it exists
@@ -545,6 +598,123 @@ async function writeToEnvFile(walletId, walletAddress) {
   }
 }
 
+// Funding waiters, resolved early by notifyFunded()
+const fundingWaiters = new Set();
+let watcherRegistered = false;
+// Set once the watcher reports the wallet funded on-chain
+let fundedNotified = false;
+// Wallet registered with the watcher; notifications for any other are ignored
+let watchedAddress = null;
+
+/**
+ * Wake any waitForFunding() calls, e.g. from the agent's POST /funded endpoint
+ * @param {Object} payload - Funded notification from the balance watcher
+ */
+function notifyFunded(payload = {}) {
+  if (
+    payload.address &&
+    watchedAddress &&
+    String(payload.address).toLowerCase() !== watchedAddress
+  ) {
+    console.warn(`⚠️ Ignoring funded notification for ${payload.address}`);
+    return;
+  }
+  console.log(`💰 Funded notification received: ${JSON.stringify(payload)}`);
+  fundedNotified = true;
+  for (const resolve of fundingWaiters) {
+    resolve(true);
+  }
+  fundingWaiters.clear();
+}
+
+/**
+ * Wait until the wallet may be funded, as a drop-in for the funding loop's
+ * fixed sleep. Without BALANCE_WATCHER_URL this simply sleeps `timeoutMs`.
+ * With it, the wait lasts up to WATCHER_FALLBACK_MS but ends as soon as the
+ * watcher reports the wallet funded (long-poll, or POST /funded when AGENT_URL
+ * is set), within about a block of the funding transaction.
+ * @param {string} walletAddress - Wallet address being funded
+ * @param {number} amount - POL threshold, as passed to checkBalance
+ * @param {number} timeoutMs - Sleep when no watcher is configured
+ * @returns {Promise<boolean>} True if woken by a funded notification
+ */
+async function waitForFunding(walletAddress, amount = 0.01, timeoutMs = 30000) {
+  if (!BALANCE_WATCHER_URL) {
+    await new Promise((resolve) => setTimeout(resolve, timeoutMs));
+    return false;
+  }
+
+  if (fundedNotified) {
+    // Funded on-chain but checkBalance disagrees: the balance API is still
+    // indexing the transfer, so re-check shortly rather than after the fallback
+    await new Promise((resolve) => setTimeout(resolve, Math.min(timeoutMs, 5000)));
+    return true;
+  }
+
+  const headers = BALANCE_WATCHER_KEY ? { "x-api-key": BALANCE_WATCHER_KEY } : {};
+  watchedAddress = String(walletAddress).toLowerCase();
+
+  if (AGENT_URL && !watcherRegistered) {
+    try {
+      await axios.post(
+        `${BALANCE_WATCHER_URL}/wallets`,
+        {
+          address: walletAddress,
+          min_balance: amount,
+          callback_url: `${AGENT_URL}/funded`,
+        },
+        { headers }
+      );
+      watcherRegistered = true;
+    } catch (error) {
+      console.warn(`⚠️ Balance watcher registration failed: ${error.message}`);
+    }
+  }
+
+  const deadline = Date.now() + Math.max(timeoutMs, WATCHER_FALLBACK_MS);
+  let done = false;
+  let wake;
+  const notified = new Promise((resolve) => {
+    wake = resolve;
+    fundingWaiters.add(resolve);
+  });
+  const timer = setTimeout(() => wake(false), deadline - Date.now());
+
+  // Long-poll the watcher; the POST /funded callback resolves `notified` too
+  const poll = (async () => {
+    while (!done && Date.now() < deadline) {
+      const waitSeconds = Math.min(25, Math.max(1, (deadline - Date.now()) / 1000));
+      try {
+        const response = await axios.get(
+          `${BALANCE_WATCHER_URL}/wallets/${walletAddress}/wait`,
+          {
+            params: { min_balance: amount, timeout: waitSeconds },
+            headers,
+            timeout: (waitSeconds + 10) * 1000,
+          }
+        );
+        if (response.data?.funded) {
+          fundedNotified = true;
+          return true;
+        }
+      } catch (error) {
+        console.warn(
+          `⚠️ Balance watcher unavailable (${error.message}), falling back to polling`
+        );
+        await new Promise((resolve) => setTimeout(resolve, timeoutMs));
+        return false;
+      }
+    }
+    return false;
+  })();
+
+  const funded = await Promise.race([notified, poll]);
+  done = true;
+  clearTimeout(timer);
+  fundingWaiters.delete(wake);
+  return funded;
+}
+
 function weiToHex(weiAmount) {
   return "0x" + BigInt(weiAmount).toString(16);
 }
@@ -562,6 +732,8 @@ export {
   getTokenMarketData,
   getGasPrice,
   getBalances,
+  waitForFunding,
+  notifyFunded,
 };
 
 // // Example usage (commented out)
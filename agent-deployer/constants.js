@@ -8,6 +8,7 @@ import {
   getTokenInfo,
   getTokenMarketData,
   getBalances,
+  waitForFunding,
 } from "./utils.js";
 import { PrivyClient } from "@privy-io/server-auth";
 import axios from "axios";
@@ -22,7 +23,7 @@ const supabase = createClient(
   process.env.VITE_SUPABASE_ANON_KEY
 );
 
-dotenv.config();
+dotenv.config({ path: process.env.ENV_FILE });
 
 // Constants
 const LIFI_API_BASE = "https://li.quest/v1";
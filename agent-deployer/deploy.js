@@ -1,3 +1,4 @@
+const crypto = require("crypto");
 const fs = require("fs");
 const path = require("path");
 const { v4: uuidv4 } = require("uuid");
@@ -16,11 +17,12 @@ const codeString = require("./constants");
 const REGION = process.env.AWS_REGION;
 const ACCOUNT_ID = process.env.AWS_ACCOUNT_ID;
 
-async function deployAgent({ agentId, ownerAddress, baselineFunction }) {
-  console.log(`🚀 Starting deployment for EVM agent: ${agentId}`);
-  console.log(`📍 Region: ${REGION}`);
-  console.log(`🏢 Account ID: ${ACCOUNT_ID}`);
+// Instance size of a packed host; code-generation's packing planner assumes the same
+// (PACK_HOST_MEMORY_MB / PACK_HOST_VCPU)
+const PACK_INSTANCE_CPU = process.env.PACK_INSTANCE_CPU || "1024";
+const PACK_INSTANCE_MEMORY = process.env.PACK_INSTANCE_MEMORY || "2048";
 
+function validateEnvironment() {
   // Validate required environment variables
   const requiredEnvVars = [
     "AWS_REGION",
@@ -34,7 +36,7 @@ async function deployAgent({ agentId, ownerAddress, baselineFunction }) {
   ];
 
   const missingVars = requiredEnvVars.filter((varName) => !process.env[varName]);
-  
+
   if (missingVars.length > 0) {
     throw new Error(
       `Missing required environment variables: ${missingVars.join(", ")}`
@@ -42,60 +44,26 @@ async function deployAgent({ agentId, ownerAddress, baselineFunction }) {
   }
 
   console.log("✅ Environment variables validated");
+}
 
-  console.log("📁 Creating build directory...");
-  const buildDir = path.join("/tmp", `evm-agent-${agentId}`);
-  fs.mkdirSync(buildDir, { recursive: true });
-  console.log(`📂 Build directory created: ${buildDir}`);
-
-  // Copy the baseline files from the baseline folder
+// Copy runtime files from the baseline folder into the build directory
+function copyBaselineFiles(buildDir, files) {
   console.log("📄 Copying baseline files...");
   const baselineDir = path.join(process.cwd(), "./baseline");
-
-  // Copy baseline.js
-  fs.copyFileSync(
-    path.join(baselineDir, "index.js"),
-    path.join(buildDir, "index.js")
-  );
-
-  // Copy utils.js
-  fs.copyFileSync(
-    path.join(baselineDir, "utils.js"),
-    path.join(buildDir, "utils.js")
-  );
-
-  // Copy logging.js (new file)
-  fs.copyFileSync(
-    path.join(baselineDir, "logging.js"),
-    path.join(buildDir, "logging.js")
-  );
-
-  // Copy tokens.json
-  fs.copyFileSync(
-    path.join(baselineDir, "tokens.json"),
-    path.join(buildDir, "tokens.json")
-  );
-
+  for (const file of files) {
+    fs.copyFileSync(path.join(baselineDir, file), path.join(buildDir, file));
+  }
   console.log("✅ Baseline files copied");
+}
 
-  console.log("📝 Generating agent code...");
-  const agentCode = `
-  ${codeString}
-  ${baselineFunction}
-  `;
-
-  console.log(agentCode);
-
-  fs.writeFileSync(path.join(buildDir, "baseline.js"), agentCode);
-  console.log("✅ Agent code generated and saved");
-
+function writePackageFiles(buildDir, name, main) {
   console.log("📦 Creating package.json...");
   const packageJson = {
-    name: `evm-agent-${agentId}`,
+    name,
     version: "1.0.0",
     type: "module",
-    main: "index.js",
-    scripts: { start: "node index.js" },
+    main,
+    scripts: { start: `node ${main}` },
     dependencies: {
       "@lifi/sdk": "^3.7.9",
       "@privy-io/server-auth": "^1.27.4",
@@ -130,8 +98,9 @@ CMD ["npm", "start"]
 `
   );
   console.log("✅ Dockerfile created");
+}
 
-  const repoName = `evm-${agentId}`;
+async function buildAndPushImage(buildDir, repoName, files) {
   const imageUri = `${ACCOUNT_ID}.dkr.ecr.${REGION}.amazonaws.com/${repoName}:latest`;
   console.log(`🏗️  ECR Repository: ${repoName}`);
   console.log(`🖼️  Image URI: ${imageUri}`);
@@ -158,15 +127,7 @@ CMD ["npm", "start"]
   const tarStream = await docker.buildImage(
     {
       context: buildDir,
-      src: [
-        "Dockerfile",
-        "index.js",
-        "baseline.js",
-        "utils.js",
-        "logging.js",
-        "tokens.json",
-        "package.json",
-      ],
+      src: files,
     },
     {
       t: imageUri,
@@ -223,30 +184,53 @@ CMD ["npm", "start"]
   // Small delay to ensure ECR propagation
   await new Promise((resolve) => setTimeout(resolve, 3000));
 
-  // Deploy to App Runner
+  return imageUri;
+}
+
+// Per-agent event ingest key, HMAC-SHA256(EVENT_INGEST_KEY, agentId) as checked by
+// the code-generation service; the master key itself never reaches an agent
+function eventIngestKey(agentId) {
+  const master = process.env.EVENT_INGEST_KEY;
+  if (!master) return "";
+  return crypto.createHmac("sha256", master).update(String(agentId)).digest("hex");
+}
+
+// Environment shared by every agent, packed or not
+function sharedEnvironment() {
+  return {
+    API_KEY: process.env.API_KEY || "",
+    PRIVY_APP_ID: process.env.PRIVY_APP_ID || "",
+    PRIVY_APP_SECRET: process.env.PRIVY_APP_SECRET || "",
+    TATUM_API_KEY: process.env.TATUM_API_KEY || "",
+    VITE_SUPABASE_URL: process.env.VITE_SUPABASE_URL || "",
+    VITE_SUPABASE_ANON_KEY: process.env.VITE_SUPABASE_ANON_KEY || "",
+    MARKET_DATA_URL: process.env.MARKET_DATA_URL || "",
+    BALANCE_WATCHER_URL: process.env.BALANCE_WATCHER_URL || "",
+    BALANCE_WATCHER_KEY: process.env.BALANCE_WATCHER_KEY || "",
+    EVENT_INGEST_URL: process.env.EVENT_INGEST_URL || "",
+    NODE_ENV: "production",
+    PORT: "3000",
+  };
+}
+
+async function createService(
+  serviceName,
+  imageUri,
+  environment,
+  instance = { Cpu: "512", Memory: "1024" }
+) {
   console.log("🚀 Deploying to AWS App Runner...");
   const appRunner = new AppRunnerClient({ region: REGION });
 
   const serviceConfig = {
-    ServiceName: `evm-${agentId}`,
+    ServiceName: serviceName,
     SourceConfiguration: {
       ImageRepository: {
         ImageIdentifier: imageUri,
         ImageRepositoryType: "ECR",
         ImageConfiguration: {
           Port: "3000",
-          RuntimeEnvironmentVariables: {
-            API_KEY: process.env.API_KEY || "",
-            OWNER_ADDRESS: ownerAddress || "",
-            PRIVY_APP_ID: process.env.PRIVY_APP_ID || "",
-            PRIVY_APP_SECRET: process.env.PRIVY_APP_SECRET || "",
-            TATUM_API_KEY: process.env.TATUM_API_KEY || "",
-            VITE_SUPABASE_URL: process.env.VITE_SUPABASE_URL || "",
-            VITE_SUPABASE_ANON_KEY: process.env.VITE_SUPABASE_ANON_KEY || "",
-            AGENT_ID: String(agentId) || "",
-            NODE_ENV: "production",
-            PORT: "3000",
-          },
+          RuntimeEnvironmentVariables: environment,
         },
       },
       AuthenticationConfiguration: {
@@ -254,10 +238,7 @@ CMD ["npm", "start"]
       },
       AutoDeploymentsEnabled: false,
     },
-    InstanceConfiguration: {
-      Cpu: "512",
-      Memory: "1024",
-    },
+    InstanceConfiguration: instance,
   };
 
   console.log(
@@ -269,11 +250,11 @@ CMD ["npm", "start"]
     new CreateServiceCommand(serviceConfig)
   );
 
-  const serviceUrl = createSvc.Service.ServiceUrl;
-  console.log("🎉 EVM Agent deployment completed successfully!");
-  console.log(`🌐 Service URL: ${serviceUrl}`);
   console.log(`📊 Service ARN: ${createSvc.Service.ServiceArn}`);
+  return createSvc.Service.ServiceUrl;
+}
 
+function cleanupBuildDir(buildDir) {
   // Cleanup build directory
   console.log("🧹 Cleaning up build directory...");
   try {
@@ -283,8 +264,168 @@ CMD ["npm", "start"]
     console.warn(`⚠️  Failed to cleanup build directory: ${cleanupErr.message}`);
     // Don't throw - cleanup failure shouldn't fail deployment
   }
+}
+
+async function deployAgent({ agentId, ownerAddress, baselineFunction }) {
+  console.log(`🚀 Starting deployment for EVM agent: ${agentId}`);
+  console.log(`📍 Region: ${REGION}`);
+  console.log(`🏢 Account ID: ${ACCOUNT_ID}`);
+
+  validateEnvironment();
+
+  console.log("📁 Creating build directory...");
+  const buildDir = path.join("/tmp", `evm-agent-${agentId}`);
+  fs.mkdirSync(buildDir, { recursive: true });
+  console.log(`📂 Build directory created: ${buildDir}`);
+
+  copyBaselineFiles(buildDir, [
+    "index.js",
+    "utils.js",
+    "logging.js",
+    "tokens.json",
+  ]);
+
+  console.log("📝 Generating agent code...");
+  const agentCode = `
+  ${codeString}
+  ${baselineFunction}
+  `;
+
+  console.log(agentCode);
+
+  fs.writeFileSync(path.join(buildDir, "baseline.js"), agentCode);
+  console.log("✅ Agent code generated and saved");
+
+  writePackageFiles(buildDir, `evm-agent-${agentId}`, "index.js");
+
+  const imageUri = await buildAndPushImage(buildDir, `evm-${agentId}`, [
+    "Dockerfile",
+    "index.js",
+    "baseline.js",
+    "utils.js",
+    "logging.js",
+    "tokens.json",
+    "package.json",
+  ]);
+
+  const serviceUrl = await createService(`evm-${agentId}`, imageUri, {
+    ...sharedEnvironment(),
+    OWNER_ADDRESS: ownerAddress || "",
+    AGENT_ID: String(agentId) || "",
+    EVENT_INGEST_KEY: eventIngestKey(agentId),
+  });
+  console.log("🎉 EVM Agent deployment completed successfully!");
+  console.log(`🌐 Service URL: ${serviceUrl}`);
+
+  cleanupBuildDir(buildDir);
 
   return serviceUrl;
 }
 
+/**
+ * Deploy many agents to one shared App Runner service (see baseline/host.js).
+ * Each agent runs in its own worker thread with its own environment, data
+ * directory and heap limit. `hostId` and the agent grouping come from the
+ * code-generation service's POST /pack plan.
+ * @param {string} hostId - Host name, e.g. "pack-3189f82a73"
+ * @param {Array} agents - [{ agentId, ownerAddress, baselineFunction, heapLimitMb }],
+ *   where baselineFunction is the agent's module and heapLimitMb its heap_limit_mb from the plan
+ * @returns {Promise<{hostUrl: string, agentUrls: Object}>}
+ */
+async function deployPack({ hostId, agents }) {
+  console.log(`🚀 Starting packed deployment ${hostId} with ${agents.length} agents`);
+  console.log(`📍 Region: ${REGION}`);
+  console.log(`🏢 Account ID: ${ACCOUNT_ID}`);
+
+  if (!/^[A-Za-z0-9_-]+$/.test(hostId || "")) {
+    throw new Error("hostId must contain only letters, digits, '-' and '_'");
+  }
+  if (!Array.isArray(agents) || agents.length === 0) {
+    throw new Error("agents must be a non-empty array");
+  }
+  const agentIds = agents.map((agent) => String(agent.agentId));
+  for (const agentId of agentIds) {
+    if (!/^[A-Za-z0-9_-]+$/.test(agentId)) {
+      throw new Error(`Invalid agentId: ${agentId}`);
+    }
+  }
+  if (new Set(agentIds).size !== agentIds.length) {
+    throw new Error("agentIds must be unique");
+  }
+
+  validateEnvironment();
+
+  console.log("📁 Creating build directory...");
+  const buildDir = path.join("/tmp", `evm-${hostId}`);
+  fs.mkdirSync(buildDir, { recursive: true });
+  console.log(`📂 Build directory created: ${buildDir}`);
+
+  copyBaselineFiles(buildDir, [
+    "host.js",
+    "agent-worker.js",
+    "utils.js",
+    "logging.js",
+    "tokens.json",
+  ]);
+
+  // One module per agent, next to utils.js/logging.js so its imports resolve;
+  // each worker loads its own copy of them
+  console.log("📝 Generating agent modules...");
+  const manifest = [];
+  for (const agent of agents) {
+    const module = `baseline-${agent.agentId}.js`;
+    fs.writeFileSync(
+      path.join(buildDir, module),
+      `
+  ${codeString}
+  ${agent.baselineFunction}
+  `
+    );
+    manifest.push({
+      agentId: String(agent.agentId),
+      ownerAddress: agent.ownerAddress || "",
+      module,
+      heapLimitMb: agent.heapLimitMb,
+      eventIngestKey: eventIngestKey(agent.agentId),
+    });
+  }
+  fs.writeFileSync(
+    path.join(buildDir, "agents.json"),
+    JSON.stringify(manifest, null, 2)
+  );
+  console.log(`✅ ${manifest.length} agent modules generated and saved`);
+
+  writePackageFiles(buildDir, `evm-${hostId}`, "host.js");
+
+  const imageUri = await buildAndPushImage(buildDir, `evm-${hostId}`, [
+    "Dockerfile",
+    "host.js",
+    "agent-worker.js",
+    "utils.js",
+    "logging.js",
+    "tokens.json",
+    "package.json",
+    "agents.json",
+    ...manifest.map((agent) => agent.module),
+  ]);
+
+  const hostUrl = await createService(
+    `evm-${hostId}`,
+    imageUri,
+    sharedEnvironment(),
+    { Cpu: PACK_INSTANCE_CPU, Memory: PACK_INSTANCE_MEMORY }
+  );
+  console.log("🎉 Packed deployment completed successfully!");
+  console.log(`🌐 Service URL: ${hostUrl}`);
+
+  cleanupBuildDir(buildDir);
+
+  const agentUrls = {};
+  for (const agentId of agentIds) {
+    agentUrls[agentId] = `${hostUrl}/agents/${agentId}`;
+  }
+  return { hostUrl, agentUrls };
+}
+
 module.exports = deployAgent;
+module.exports.deployPack = deployPack;
@@ -6,6 +6,7 @@ const WebSocket = require("ws");
 const http = require("http");
 const url = require("url");
 const deployAgent = require("./deploy");
+const { deployPack } = require("./deploy");
 const { getAgentLogs, streamAgentLogs } = require("./logs");
 
 const app = express();
@@ -58,6 +59,28 @@ app.post("/deploy-agent", async (req, res) => {
   }
 });
 
+// Deploy a packed host: many agents sharing one container (plan from code-generation POST /pack)
+app.post("/deploy-pack", async (req, res) => {
+  const { hostId, agents } = req.body;
+
+  console.log(
+    `🚀 [DEPLOY-PACK] Starting packed deployment ${hostId} with ${
+      Array.isArray(agents) ? agents.length : 0
+    } agents`
+  );
+
+  try {
+    const result = await deployPack({ hostId, agents });
+    console.log(
+      `✅ [DEPLOY-PACK] Successfully deployed host ${hostId} to: ${result.hostUrl}`
+    );
+    res.status(200).json(result);
+  } catch (err) {
+    console.error(`❌ [DEPLOY-PACK] Failed to deploy host ${hostId}:`, err);
+    res.status(500).json({ error: "Failed to deploy packed agents." });
+  }
+});
+
 app.get("/logs/:agentId", async (req, res) => {
   const { agentId } = req.params;
   const { lines = 500 } = req.query;
@@ -7,6 +7,7 @@ import {
   getTokenInfo,
   getTokenMarketData,
   getBalances,
+  waitForFunding,
 } from "./utils.js";
 import { PrivyClient } from "@privy-io/server-auth";
 import axios from "axios";
@@ -21,7 +22,7 @@ const supabase = createClient(
   process.env.VITE_SUPABASE_ANON_KEY
 );
 
-dotenv.config();
+dotenv.config({ path: process.env.ENV_FILE });
 
 // Global status object
 let currentStatus = {
@@ -378,11 +379,12 @@ export async function baselineFunction(ownerAddress) {
 
       updateStatus({
         phase: "checking_balance",
-        lastMessage: "Target not reached, retrying in 30 seconds",
-        nextStep: "Checking balance again in 30 seconds",
+        lastMessage: "Target not reached, waiting for funding",
+        nextStep: "Checking balance again once funded (or in 30 seconds)",
       });
-      log("❌ Target not reached yet. Retrying in 30 seconds.", "warning");
-      await new Promise((resolve) => setTimeout(resolve, 30_000));
+      log("❌ Target not reached yet. Waiting for funding.", "warning");
+      // Returns when the balance watcher reports the wallet funded, or after 30s without one
+      await waitForFunding(wallet.address, 0.01, 30_000);
     } catch (error) {
       log(`Error checking balance: ${error.message}`, "error");
       updateStatus({
@@ -1,9 +1,16 @@
 import os
 import json
+import time
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional
-from fastapi import FastAPI, HTTPException
+from collections import deque
+from contextlib import asynccontextmanager, suppress
+from typing import Dict, List, Any, Literal, Optional
+import anyio
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
@@ -21,13 +28,82 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+import shared_state
+import market_data
+import events
+from auth import API_KEY, require_api_key
+
+if not API_KEY:
+    logger.warning("⚠️  API_KEY not set; privileged routes are unprotected")
+
+# Number of uvicorn worker processes; state they share lives in shared_state
+API_WORKERS = max(1, int(os.getenv("API_WORKERS", "1")))
+# Successful /code results are reused for identical requests for this long (0, the default, disables)
+CODE_CACHE_TTL = float(os.getenv("CODE_CACHE_TTL", "0"))
+# How long a worker may hold a /code request before others stop waiting on it
+CODE_INFLIGHT_TIMEOUT = float(os.getenv("CODE_INFLIGHT_TIMEOUT", "180"))
+# Threads per worker that may run generations at once; they draw on their own
+# limiter, so heartbeats and shared-state calls never queue behind the model
+GENERATION_CONCURRENCY = max(1, int(os.getenv("GENERATION_CONCURRENCY", "32")))
+# Per-client requests per minute on the generation endpoints, across all workers (0 disables)
+RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "0"))
+
+# The lag monitor sleeps this long and records how late it wakes up
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+
+_started_at = time.time()
+_inflight = 0
+_requests_total = 0
+# About the last minute of event-loop lag samples, in seconds
+_loop_lag = deque(maxlen=max(1, int(60 / LOOP_LAG_INTERVAL)))
+_generation_limiter = anyio.CapacityLimiter(GENERATION_CONCURRENCY)
+
+async def _loop_lag_monitor():
+    """Sample event-loop lag: anything blocking the loop delays this wakeup."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        _loop_lag.append(max(0.0, loop.time() - start - LOOP_LAG_INTERVAL))
+
+async def _heartbeat_loop():
+    from validation import pool_ready
+    while True:
+        try:
+            await run_in_threadpool(shared_state.heartbeat, _started_at, _inflight, pool_ready())
+        except Exception as e:
+            logger.warning(f"Heartbeat failed: {e}")
+        await asyncio.sleep(shared_state.HEARTBEAT_INTERVAL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm the validation process pool and register this worker before accepting requests."""
+    from validation import start_pool, shutdown_pool
+    shared_state.init()
+    start_pool()
+    tasks = [asyncio.create_task(_heartbeat_loop()), asyncio.create_task(_loop_lag_monitor())]
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await market_data.close()
+    shared_state.deregister()
+    shutdown_pool()
+
 # Initialize FastAPI
 app = FastAPI(
     title="EVM Trader API",
     description="API for EVM trading agent code generation and prompt improvement",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Read-through cache of Mobula/LiFi data for deployed agents
+app.include_router(market_data.router)
+# Batched log/status ingestion from deployed agents
+app.include_router(events.router)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -37,13 +113,80 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def track_inflight(request: Request, call_next):
+    """Count requests in progress on this worker, reported in its heartbeat."""
+    global _inflight, _requests_total
+    _inflight += 1
+    _requests_total += 1
+    try:
+        return await call_next(request)
+    finally:
+        _inflight -= 1
+
+async def rate_limit(request: Request):
+    """Enforce RATE_LIMIT_PER_MINUTE per client IP, shared by all workers."""
+    if RATE_LIMIT_PER_MINUTE <= 0:
+        return
+    client = request.client.host if request.client else "unknown"
+    retry_after = await run_in_threadpool(shared_state.hit, f"{request.url.path}:{client}", RATE_LIMIT_PER_MINUTE)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(retry_after)},
+        )
+
 class PromptRequest(BaseModel):
     prompt: str
     history: Optional[List[str]] = Field(default_factory=list)
 
+class DryRunRequest(BaseModel):
+    code: str
+    simulated_seconds: int = Field(default=86_400, gt=0, le=30 * 86_400)
+    funded_after_seconds: int = Field(default=0, ge=0)
+    prices: Optional[Dict[str, float]] = None
+    volatility: float = Field(default=0.001, ge=0)
+    seed: int = 42
+    balance_watcher: bool = False
+
+class BacktestRequest(BaseModel):
+    # The `spec` returned by /code
+    spec: Dict[str, Any]
+    # CSV file name in BACKTEST_DATA_DIR; or simulate `synthetic_days` of prices instead
+    data: Optional[str] = None
+    synthetic_days: Optional[float] = Field(default=None, gt=0, le=5 * 365)
+    # Parameter path -> values, e.g. {"rules[0].threshold": [-1, -2, -3]}
+    sweep: Dict[str, List[float]] = Field(default_factory=dict)
+    capital: float = Field(default=1000.0, gt=0)
+    fee_bps: float = Field(default=30.0, ge=0)
+    top: int = Field(default=10, ge=1, le=100)
+    seed: int = 42
+
+class PackAgent(BaseModel):
+    agent_id: str
+    owner_address: Optional[str] = None
+    # The `code` returned by /code; its cost_report is recomputed unless given
+    code: Optional[str] = None
+    cost_report: Optional[Dict[str, Any]] = None
+    memory_mb: Optional[float] = Field(default=None, gt=0)
+
+class PackRequest(BaseModel):
+    agents: List[PackAgent] = Field(min_length=1, max_length=1000)
+    host_memory_mb: Optional[int] = Field(default=None, gt=0)
+    max_agents_per_host: Optional[int] = Field(default=None, ge=1)
+    include_modules: bool = True
+
 class CodeRequest(BaseModel):
     prompt: str
     history: Optional[List[str]] = Field(default_factory=list)
+    # When set, `prompt` is an instruction to revise this previously generated code
+    previous_code: Optional[str] = None
+    # "full" regenerates the whole baselineFunction, "strategy" only the AI CODE section
+    # (spliced into the baseline server-side). Defaults to CODER_MODE.
+    mode: Optional[Literal["full", "strategy"]] = None
+    # False skips the shared result cache for this request (the fresh result is still stored)
+    use_cache: bool = True
 
 @app.get("/")
 async def health_check():
@@ -72,13 +215,65 @@ async def health_check():
 #         logger.error(f"Error processing prompt: {str(e)}", exc_info=True)
 #         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/code", summary="Generate code for a trading agent")
+def _generate(request: CodeRequest) -> Dict[str, Any]:
+    from coder import code, edit
+    if request.previous_code:
+        return edit(
+            previous_code=request.previous_code,
+            instruction=request.prompt,
+            history=request.history,
+        )
+    return code(prompt=request.prompt, mode=request.mode)
+
+async def _run_generation(request: CodeRequest) -> Dict[str, Any]:
+    # Generation blocks on the model and the validation pool; keep it off the event loop
+    # and out of the default threadpool
+    return await anyio.to_thread.run_sync(_generate, request, limiter=_generation_limiter)
+
+async def _generate_shared(request: CodeRequest) -> Dict[str, Any]:
+    """
+    Serve identical requests from the shared cache. If another worker is
+    already generating the same request, wait for its result instead of
+    calling the model twice; if it fails or takes too long, generate here.
+    """
+    if CODE_CACHE_TTL <= 0:
+        return await _run_generation(request)
+
+    from coder import CODER_MODE
+    key = shared_state.request_key(
+        "code", request.prompt, request.history, request.previous_code, request.mode or CODER_MODE
+    )
+    claimed = False
+    if request.use_cache:
+        deadline = time.time() + CODE_INFLIGHT_TIMEOUT
+        while True:
+            cached = await run_in_threadpool(shared_state.cache_get, key)
+            if cached is not None:
+                logger.info("Serving code from shared cache")
+                return {**cached, "cached": True}
+            claimed = await run_in_threadpool(shared_state.claim, key, CODE_INFLIGHT_TIMEOUT)
+            if claimed or time.time() > deadline:
+                break
+            # Waiting on another worker holds no thread
+            await asyncio.sleep(0.25)
+
+    try:
+        result = await _run_generation(request)
+        if "error" not in result:
+            await run_in_threadpool(shared_state.cache_set, key, result, CODE_CACHE_TTL)
+        return result
+    finally:
+        if claimed:
+            await run_in_threadpool(shared_state.release, key)
+
+@app.post("/code", summary="Generate code for a trading agent", dependencies=[Depends(rate_limit)])
 async def generate_code(request: CodeRequest):
     """
     Generate JavaScript code for a trading agent based on the provided prompt.
+    If previous_code is provided, the prompt is applied to it as a minimal edit.
     
     Args:
-        request: CodeRequest containing the prompt and optional history
+        request: CodeRequest containing the prompt, optional history and optional previous_code
         
     Returns:
         Dict containing the generated code and execution interval
@@ -86,14 +281,104 @@ async def generate_code(request: CodeRequest):
     logger.info(f"Generating code for prompt: {request.prompt[:100]}...")
     
     try:
-        from coder import code
-        result = code(prompt=request.prompt)
+        result = await _generate_shared(request)
         logger.info("Code generation completed successfully")
         return result
     except Exception as e:
         logger.error(f"Error generating code: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/dryrun", summary="Simulate a generated agent before deployment", dependencies=[Depends(require_api_key), Depends(rate_limit)])
+async def dry_run_agent(request: DryRunRequest):
+    """
+    Run generated agent code against stubbed helpers under a virtual clock.
+    
+    Args:
+        request: DryRunRequest containing the code and simulation settings
+        
+    Returns:
+        Dict containing time to first trade, call counts and status transitions
+    """
+    logger.info(f"Dry-running agent for {request.simulated_seconds}s of simulated time")
+    
+    try:
+        from dryrun import dry_run
+        result = await run_in_threadpool(
+            dry_run,
+            request.code,
+            simulated_seconds=request.simulated_seconds,
+            funded_after_seconds=request.funded_after_seconds,
+            prices=request.prices,
+            volatility=request.volatility,
+            seed=request.seed,
+            balance_watcher=request.balance_watcher,
+        )
+        logger.info(f"Dry run completed: success={result['success']}")
+        return result
+    except Exception as e:
+        logger.error(f"Error running dry run: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/backtest", summary="Backtest a strategy spec over historical prices", dependencies=[Depends(rate_limit)])
+async def backtest_spec(request: BacktestRequest):
+    """
+    Simulate a strategy spec, sweeping the given parameters in one vectorized pass.
+    
+    Args:
+        request: BacktestRequest containing the spec, price data and sweep
+        
+    Returns:
+        Dict with PnL, drawdown and trade-count summaries and the best combinations
+    """
+    logger.info(f"Backtesting spec with {len(request.sweep)} swept parameter(s)")
+    
+    from backtest import run_backtest
+    try:
+        return await run_in_threadpool(
+            run_backtest,
+            request.spec,
+            data=request.data,
+            synthetic_days=request.synthetic_days,
+            sweep=request.sweep,
+            capital=request.capital,
+            fee_bps=request.fee_bps,
+            top=request.top,
+            seed=request.seed,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error running backtest: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/pack", summary="Plan a packed deployment of many agents per container", dependencies=[Depends(rate_limit)])
+async def pack_agents(request: PackRequest):
+    """
+    Assign agents to shared hosts by estimated memory and call rate.
+    
+    Args:
+        request: PackRequest containing the agents and optional host limits
+        
+    Returns:
+        Dict with the hosts, each agent's start/stop module, and the memory and vCPU saved
+    """
+    logger.info(f"Planning packed deployment for {len(request.agents)} agent(s)")
+    
+    from packing import plan_packing, PACK_HOST_MEMORY_MB, PACK_MAX_AGENTS_PER_HOST
+    try:
+        return await run_in_threadpool(
+            plan_packing,
+            [agent.model_dump() for agent in request.agents],
+            host_memory_mb=request.host_memory_mb or PACK_HOST_MEMORY_MB,
+            max_agents_per_host=request.max_agents_per_host or PACK_MAX_AGENTS_PER_HOST,
+            include_modules=request.include_modules,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error planning packed deployment: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 # @app.get("/tokens", summary="Get available tokens")
 # async def get_tokens():
 #     """
@@ -114,6 +399,68 @@ async def generate_code(request: CodeRequest):
 #         logger.error(f"Error getting tokens: {str(e)}", exc_info=True)
 #         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/health/workers", summary="Get the health of every API worker")
+async def worker_health():
+    """
+    Report every API worker's last heartbeat, in-flight requests and readiness.
+    
+    Returns:
+        Dict containing one entry per worker, and whether all expected workers are alive
+    """
+    workers = await run_in_threadpool(shared_state.workers)
+    alive = [w for w in workers if w["alive"]]
+    return {
+        "status": "healthy" if len(alive) >= API_WORKERS else "degraded",
+        "expected_workers": API_WORKERS,
+        "alive_workers": len(alive),
+        "workers": workers,
+    }
+
+@app.get("/ready", summary="Check whether this worker can serve requests")
+async def readiness():
+    """
+    Readiness of the worker handling this request: its validation pool is up
+    and the shared state store is reachable. Returns 503 otherwise.
+    """
+    from validation import pool_ready
+    checks = {"validation_pool": pool_ready()}
+    try:
+        await run_in_threadpool(shared_state.cache_get, "ready-probe")
+        checks["shared_state"] = True
+    except Exception as e:
+        logger.warning(f"Shared state unavailable: {e}")
+        checks["shared_state"] = False
+
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "pid": os.getpid(), "checks": checks},
+    )
+
+@app.get("/metrics", summary="Get this worker's runtime metrics")
+async def metrics():
+    """
+    Event-loop lag over roughly the last minute, plus request counters, for
+    the worker handling this request. Used by loadtest.py.
+    """
+    lag = sorted(_loop_lag)
+
+    def pct(p: float) -> float:
+        return 1000 * lag[min(len(lag) - 1, int(p / 100 * len(lag)))] if lag else 0.0
+
+    return {
+        "pid": os.getpid(),
+        "uptime_s": round(time.time() - _started_at, 1),
+        "inflight": _inflight,
+        "requests_total": _requests_total,
+        "loop_lag_ms": {
+            "samples": len(lag),
+            "p50": round(pct(50), 2),
+            "p99": round(pct(99), 2),
+            "max": round(1000 * lag[-1], 2) if lag else 0.0,
+        },
+    }
+
 @app.get("/status", summary="Get API status")
 async def get_status():
     """
@@ -134,11 +481,27 @@ async def get_status():
         "endpoints": {
             "POST /prompt": "Evaluate and improve trading agent prompts",
             "POST /code": "Generate trading agent code",
+            "POST /dryrun": "Simulate a generated agent under a virtual clock",
+            "POST /backtest": "Backtest a strategy spec over historical prices with parameter sweeps",
+            "POST /pack": "Plan a packed deployment of many agents per container",
             "GET /tokens": "Get available tokens",
+            "GET /health/workers": "Get the health of every API worker",
+            "GET /ready": "Check whether this worker can serve requests",
+            "GET /metrics": "Get this worker's event-loop lag and request counters",
+            "GET /market/data": "Cached Mobula market data for a token",
+            "GET /market/token": "Cached LiFi token info",
+            "POST /events/{agent_id}": "Ingest a batch of agent log and status events",
+            "GET /events/{agent_id}": "Tail or range query of an agent's events",
+            "GET /events/{agent_id}/status": "Get an agent's latest status",
             "GET /status": "Get API status"
         }
     }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    port = int(os.getenv("PORT", "8000"))
+    if API_WORKERS > 1:
+        # Workers are separate processes, so uvicorn needs an import string
+        uvicorn.run("api:app", host="0.0.0.0", port=port, workers=API_WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port) 
\ No newline at end of file
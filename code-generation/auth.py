@@ -0,0 +1,29 @@
+"""
+API key check for privileged routes, shared by the API, the event store and
+the balance watcher.
+
+Clients send the key as x-api-key, as with the agent deployer. The API checks
+API_KEY, the watcher WATCHER_API_KEY; an unset key leaves its routes open
+(development mode).
+"""
+
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+API_KEY = os.getenv("API_KEY")
+
+
+def check_api_key(given: Optional[str], expected: Optional[str]) -> None:
+    """Raise 401 unless `given` matches `expected`; an unset `expected` allows everything."""
+    if not expected:
+        return
+    if not given or not hmac.compare_digest(given.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing API key")
+
+
+async def require_api_key(x_api_key: Optional[str] = Header(None)):
+    """Reject requests without the service's x-api-key."""
+    check_api_key(x_api_key, API_KEY)
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Vectorized backtester for generated strategy specs.
+
+coder.code() returns a `spec` alongside the code: the traded tokens, check
+interval, trade rules (trigger, threshold, lookback, size) and exits. This
+module replays a spec against a historical OHLCV series and sweeps parameter
+grids over it. Every parameter combination is simulated at once as a column
+of NumPy arrays, stepping through the price series a single time, so
+thousands of combinations take about as long as a handful.
+
+The simulation follows the agent's behaviour rather than an idealised one:
+the strategy only looks at the market every `interval_seconds`, trades at the
+close of that check, pays `fee_bps` per swap, and can't spend more quote or
+sell more base than it holds.
+
+Price files are CSV with a header containing `timestamp` (epoch seconds or
+milliseconds, or ISO-8601) and `close`; other OHLCV columns are ignored.
+
+Usage:
+    python backtest.py spec.json prices.csv
+    python backtest.py spec.json prices.csv --sweep "rules[0].threshold=-0.5:-5:10" --sweep interval_seconds=600,1800,3600
+    python backtest.py spec.json --synthetic-days 365 --sweep "rules[0].amount_usd=5:50:10" --top 5
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from functools import reduce
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from validation import validate_strategy_spec
+
+# Upper bound on combinations per sweep; memory is a few arrays of this length
+BACKTEST_MAX_COMBINATIONS = int(os.getenv("BACKTEST_MAX_COMBINATIONS", "200000"))
+# Upper bound on checks per run; the simulation loops once per check in Python
+BACKTEST_MAX_STEPS = int(os.getenv("BACKTEST_MAX_STEPS", "1000000"))
+# Directory /backtest reads price files from
+BACKTEST_DATA_DIR = os.getenv("BACKTEST_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "backtest_data"))
+# Trades smaller than this (in quote) are skipped, like dust swaps the agent wouldn't send
+MIN_TRADE_USD = 0.01
+
+_SWEEPABLE = {"interval_seconds", "take_profit_pct", "stop_loss_pct", "max_trades"}
+_RULE_SWEEPABLE = {"threshold", "lookback_seconds", "amount_usd"}
+_RULE_PATH = re.compile(r"^rules\[(\d+)\]\.(\w+)$")
+
+
+# --- Price data ---
+
+def _parse_timestamp(value: str) -> float:
+    try:
+        ts = float(value)
+        # Millisecond epochs (e.g. exchange exports)
+        return ts / 1000 if ts > 1e11 else ts
+    except ValueError:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def load_ohlcv(path: str) -> Dict[str, np.ndarray]:
+    """Load `timestamp` and `close` columns from a CSV file, sorted by time."""
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+        ts_column = next((columns[c] for c in ("timestamp", "time", "date") if c in columns), None)
+        if ts_column is None or "close" not in columns:
+            raise ValueError(f"{path} needs a 'timestamp' and a 'close' column")
+        rows = [(_parse_timestamp(row[ts_column]), float(row[columns["close"]])) for row in reader]
+    if len(rows) < 2:
+        raise ValueError(f"{path} has fewer than two rows")
+    data = np.array(rows, dtype=np.float64)
+    data = data[np.argsort(data[:, 0], kind="stable")]
+    return {"timestamp": data[:, 0], "close": data[:, 1]}
+
+
+def synthetic_ohlcv(days: float, bar_seconds: int = 60, start_price: float = 0.25,
+                    volatility: float = 0.001, seed: int = 42) -> Dict[str, np.ndarray]:
+    """Geometric random walk closes, `volatility` being the per-minute log-price sigma."""
+    rng = np.random.default_rng(seed)
+    bars = int(days * 86_400 / bar_seconds)
+    sigma = volatility * math.sqrt(bar_seconds / 60)
+    close = start_price * np.exp(np.cumsum(rng.normal(0.0, sigma, bars)))
+    timestamp = time.time() - bars * bar_seconds + np.arange(bars) * bar_seconds
+    return {"timestamp": timestamp, "close": close}
+
+
+# --- Parameter grids ---
+
+def parse_sweep(items: List[str]) -> Dict[str, List[float]]:
+    """Parse `path=v1,v2,...` or `path=start:stop:count` sweep arguments."""
+    sweep = {}
+    for item in items:
+        path, _, values = item.partition("=")
+        if not values:
+            raise ValueError(f"Sweep '{item}' should look like path=1,2,3 or path=start:stop:count")
+        if ":" in values:
+            start, stop, count = values.split(":")
+            sweep[path.strip()] = np.linspace(float(start), float(stop), int(count)).tolist()
+        else:
+            sweep[path.strip()] = [float(v) for v in values.split(",")]
+    return sweep
+
+
+def _spec_value(spec: Dict[str, Any], path: str) -> Any:
+    match = _RULE_PATH.match(path)
+    if match:
+        index, field = int(match.group(1)), match.group(2)
+        if index >= len(spec["rules"]) or field not in _RULE_SWEEPABLE:
+            raise ValueError(f"Can't sweep '{path}'")
+        return spec["rules"][index].get(field)
+    if path not in _SWEEPABLE:
+        raise ValueError(f"Can't sweep '{path}'")
+    # Optional fields may be omitted as well as null
+    return spec.get(path)
+
+
+def expand_grid(spec: Dict[str, Any], sweep: Dict[str, List[float]]) -> Tuple[int, Dict[str, np.ndarray]]:
+    """
+    Cartesian product of the swept values. Returns the combination count and
+    one array per swept path, indexed by combination.
+    """
+    for path in sweep:
+        _spec_value(spec, path)
+    sizes = [len(values) for values in sweep.values()]
+    count = reduce(lambda a, b: a * b, sizes, 1)
+    if count > BACKTEST_MAX_COMBINATIONS:
+        raise ValueError(f"{count} combinations exceeds BACKTEST_MAX_COMBINATIONS ({BACKTEST_MAX_COMBINATIONS})")
+    if not sweep:
+        return 1, {}
+    grids = np.meshgrid(*[np.asarray(v, dtype=np.float64) for v in sweep.values()], indexing="ij")
+    return count, {path: grid.ravel() for path, grid in zip(sweep, grids)}
+
+
+def _param(spec: Dict[str, Any], grid: Dict[str, np.ndarray], path: str, count: int) -> np.ndarray:
+    """The per-combination values of one parameter; NaN where the spec leaves it unset."""
+    if path in grid:
+        return grid[path]
+    value = _spec_value(spec, path)
+    return np.full(count, np.nan if value is None else float(value))
+
+
+# --- Simulation ---
+
+def _bar_seconds(timestamps: np.ndarray) -> int:
+    """Typical spacing between closes, ignoring gaps and duplicate timestamps."""
+    spacing = np.diff(timestamps)
+    spacing = spacing[spacing > 0]
+    return max(1, int(round(float(np.median(spacing))))) if spacing.size else 1
+
+
+def _check_grid(timestamps: np.ndarray, intervals: np.ndarray) -> Tuple[int, np.ndarray, np.ndarray]:
+    """
+    Sample the series every gcd(intervals) seconds, at the last close at or
+    before each tick. Intervals are snapped to multiples of the bar spacing
+    first: checking more often than the data changes only repeats closes.
+    Returns the grid step, the close index per tick and each interval in ticks.
+    """
+    bar = _bar_seconds(timestamps)
+    snapped = bar * np.maximum(1, np.round(intervals / bar)).astype(np.int64)
+    step = reduce(math.gcd, {int(s) for s in snapped})
+    steps = int((timestamps[-1] - timestamps[0]) // step) + 1
+    if steps > BACKTEST_MAX_STEPS:
+        raise ValueError(f"{steps} checks at a {step}s grid exceeds BACKTEST_MAX_STEPS ({BACKTEST_MAX_STEPS}); "
+                         f"use a shorter series or longer intervals")
+    ticks = timestamps[0] + np.arange(steps) * step
+    return step, np.searchsorted(timestamps, ticks, side="right") - 1, snapped // step
+
+
+def backtest(spec: Dict[str, Any], ohlcv: Dict[str, np.ndarray], sweep: Optional[Dict[str, List[float]]] = None,
+             capital: float = 1000.0, fee_bps: float = 30.0) -> Dict[str, Any]:
+    """
+    Simulate the spec for every combination in `sweep`.
+
+    Args:
+        spec: Strategy spec from coder.code()
+        ohlcv: Price series from load_ohlcv() or synthetic_ohlcv()
+        sweep: Parameter path -> values to try, e.g. {"rules[0].threshold": [-1, -2, -3]}
+        capital: Starting quote balance
+        fee_bps: Swap fee plus slippage per trade, in basis points
+
+    Returns:
+        Dict with per-combination arrays (params, pnl_usd, return_pct,
+        max_drawdown_pct, trades) and the buy-and-hold return for reference
+    """
+    is_valid, message = validate_strategy_spec(spec)
+    if not is_valid:
+        raise ValueError(f"Invalid spec: {message}")
+    start = time.perf_counter()
+    count, grid = expand_grid(spec, sweep or {})
+
+    intervals = _param(spec, grid, "interval_seconds", count)
+    grid_s, idx, interval_steps = _check_grid(ohlcv["timestamp"], intervals)
+    close = ohlcv["close"][idx]
+    steps = len(close)
+    take_profit = _param(spec, grid, "take_profit_pct", count) / 100
+    stop_loss = _param(spec, grid, "stop_loss_pct", count) / 100
+    max_trades = _param(spec, grid, "max_trades", count)
+    has_exits = not (np.isnan(take_profit).all() and np.isnan(stop_loss).all())
+
+    rules = []
+    for i, rule in enumerate(spec["rules"]):
+        threshold = _param(spec, grid, f"rules[{i}].threshold", count)
+        compiled = {
+            "buy": rule["action"] == "buy",
+            "trigger": rule["trigger"],
+            "threshold": threshold,
+            "amount": _param(spec, grid, f"rules[{i}].amount_usd", count),
+        }
+        if rule["trigger"] == "price_change":
+            lookback = _param(spec, grid, f"rules[{i}].lookback_seconds", count)
+            # No lookback: compare with the previous check
+            lookback_steps = np.where(np.isnan(lookback), interval_steps,
+                                      np.maximum(1, np.round(np.nan_to_num(lookback) / grid_s))).astype(np.int64)
+            # Percent change over each distinct lookback, for the whole series at once
+            distinct, position = np.unique(lookback_steps, return_inverse=True)
+            changes = np.full((len(distinct), steps), np.nan)
+            for row, lb in enumerate(distinct):
+                if lb < steps:
+                    changes[row, lb:] = 100 * (close[lb:] / close[:-lb] - 1)
+            # Drops fire at or below a negative threshold, rises at or above a positive one
+            sign = np.where(threshold < 0, -1.0, 1.0)
+            compiled.update(changes=changes, position=position, sign=sign, signed_threshold=sign * threshold)
+        rules.append(compiled)
+
+    fee = fee_bps / 10_000
+    cash = np.full(count, capital)
+    units = np.zeros(count)
+    cost_basis = np.zeros(count)
+    trades = np.zeros(count, dtype=np.int64)
+    peak = np.full(count, capital)
+    max_drawdown = np.zeros(count)
+    limited = ~np.isnan(max_trades)
+    exit_above = 1 + take_profit
+    exit_below = 1 - stop_loss
+    # Combinations share check times when they share an interval; build each mask once
+    check_masks = {int(s): interval_steps == s for s in np.unique(interval_steps)}
+
+    for t in range(steps):
+        price = close[t]
+        active = None
+        for s, mask in check_masks.items():
+            if t % s == 0:
+                active = mask if active is None else active | mask
+        if active is not None:
+            if limited.any():
+                active = active & (~limited | (trades < max_trades))
+
+            # State changes touch only the combinations that trade, which are usually few
+            if has_exits:
+                held = np.flatnonzero(active & (units > 0))
+                if held.size:
+                    entry = cost_basis[held] / units[held]
+                    hit = held[(price >= entry * exit_above[held]) | (price <= entry * exit_below[held])]
+                    cash[hit] += units[hit] * price * (1 - fee)
+                    units[hit] = 0.0
+                    cost_basis[hit] = 0.0
+                    trades[hit] += 1
+
+            for rule in rules:
+                trigger = rule["trigger"]
+                if trigger == "schedule":
+                    fire = active
+                elif trigger == "price_above":
+                    fire = active & (price > rule["threshold"])
+                elif trigger == "price_below":
+                    fire = active & (price < rule["threshold"])
+                else:
+                    change = rule["changes"][:, t][rule["position"]]
+                    fire = active & (rule["sign"] * change >= rule["signed_threshold"])
+                idx = np.flatnonzero(fire)
+                if not idx.size:
+                    continue
+
+                if rule["buy"]:
+                    spend = np.minimum(rule["amount"][idx], cash[idx])
+                    keep = spend >= MIN_TRADE_USD
+                    idx, spend = idx[keep], spend[keep]
+                    cash[idx] -= spend
+                    units[idx] += spend * (1 - fee) / price
+                    cost_basis[idx] += spend
+                else:
+                    held_units = units[idx]
+                    sold = np.minimum(rule["amount"][idx] / price, held_units)
+                    keep = sold * price >= MIN_TRADE_USD
+                    idx, sold, held_units = idx[keep], sold[keep], held_units[keep]
+                    cash[idx] += sold * price * (1 - fee)
+                    units[idx] -= sold
+                    cost_basis[idx] *= (held_units - sold) / held_units
+                trades[idx] += 1
+
+        equity = cash + units * price
+        np.maximum(peak, equity, out=peak)
+        np.maximum(max_drawdown, 1 - equity / peak, out=max_drawdown)
+    final_equity = cash + units * close[-1]
+    return {
+        "combinations": count,
+        "steps": steps,
+        "check_grid_seconds": grid_s,
+        "elapsed_s": time.perf_counter() - start,
+        "capital": capital,
+        "buy_and_hold_return_pct": 100 * (close[-1] / close[0] - 1),
+        "params": {path: values for path, values in grid.items()},
+        "final_equity": final_equity,
+        "pnl_usd": final_equity - capital,
+        "return_pct": 100 * (final_equity / capital - 1),
+        "max_drawdown_pct": 100 * max_drawdown,
+        "trades": trades,
+    }
+
+
+def summarize(result: Dict[str, Any], top: int = 10) -> Dict[str, Any]:
+    """JSON-friendly summary: distribution of outcomes and the best combinations by PnL."""
+    pnl = result["pnl_usd"]
+    order = np.argsort(-pnl, kind="stable")[:top]
+    best = [
+        {
+            "params": {path: float(values[i]) for path, values in result["params"].items()},
+            "pnl_usd": round(float(pnl[i]), 2),
+            "return_pct": round(float(result["return_pct"][i]), 2),
+            "max_drawdown_pct": round(float(result["max_drawdown_pct"][i]), 2),
+            "trades": int(result["trades"][i]),
+        }
+        for i in order
+    ]
+    return {
+        "combinations": result["combinations"],
+        "steps": result["steps"],
+        "check_grid_seconds": result["check_grid_seconds"],
+        "elapsed_s": round(result["elapsed_s"], 3),
+        "buy_and_hold_return_pct": round(float(result["buy_and_hold_return_pct"]), 2),
+        "profitable_fraction": round(float((pnl > 0).mean()), 4),
+        "pnl_usd": {k: round(float(v), 2) for k, v in zip(("min", "median", "max"), np.percentile(pnl, [0, 50, 100]))},
+        "max_drawdown_pct": {
+            k: round(float(v), 2) for k, v in zip(("min", "median", "max"), np.percentile(result["max_drawdown_pct"], [0, 50, 100]))
+        },
+        "trades": {k: int(v) for k, v in zip(("min", "median", "max"), np.percentile(result["trades"], [0, 50, 100]))},
+        "best": best,
+    }
+
+
+def run_backtest(spec: Dict[str, Any], data: Optional[str] = None, synthetic_days: Optional[float] = None,
+                 sweep: Optional[Dict[str, List[float]]] = None, capital: float = 1000.0, fee_bps: float = 30.0,
+                 top: int = 10, seed: int = 42) -> Dict[str, Any]:
+    """
+    Backtest against a CSV in BACKTEST_DATA_DIR (`data` is its file name) or a
+    simulated series, and return the summary. Raises ValueError on bad input.
+    """
+    if data:
+        root = os.path.realpath(BACKTEST_DATA_DIR)
+        path = os.path.realpath(os.path.join(root, data))
+        if os.path.dirname(path) != root or not os.path.isfile(path):
+            raise ValueError(f"No price file '{data}' in the backtest data directory")
+        ohlcv = load_ohlcv(path)
+    elif synthetic_days:
+        ohlcv = synthetic_ohlcv(synthetic_days, seed=seed)
+    else:
+        raise ValueError("Pass a price file name or synthetic_days")
+    print(f"📈 Backtesting {spec.get('base_token')}/{spec.get('quote_token')} spec…")
+    summary = summarize(backtest(spec, ohlcv, sweep, capital, fee_bps), top)
+    print(f"✅ Backtest finished: {summary['combinations']} combination(s) in {summary['elapsed_s']:.2f}s")
+    return summary
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(f"📊 {summary['combinations']} combination(s) over {summary['steps']} checks "
+          f"({summary['check_grid_seconds']}s grid) in {summary['elapsed_s']:.2f}s")
+    print(f"   Buy and hold:  {summary['buy_and_hold_return_pct']:+.2f}%")
+    print(f"   Profitable:    {summary['profitable_fraction']:.1%}")
+    for key, unit in (("pnl_usd", "$"), ("max_drawdown_pct", "%"), ("trades", "")):
+        stats = summary[key]
+        print(f"   {key:<14} min={stats['min']}{unit} median={stats['median']}{unit} max={stats['max']}{unit}")
+    print("   Best:")
+    for row in summary["best"]:
+        params = ", ".join(f"{k}={v:g}" for k, v in row["params"].items()) or "spec as generated"
+        print(f"     {row['pnl_usd']:+10.2f}$ dd={row['max_drawdown_pct']:5.2f}% trades={row['trades']:<5} {params}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("spec_file", help="JSON file with a strategy spec (or a /code response containing one)")
+    parser.add_argument("prices", nargs="?", help="OHLCV CSV file")
+    parser.add_argument("--synthetic-days", type=float, help="Use a simulated price series of this many days instead")
+    parser.add_argument("--sweep", action="append", default=[], metavar="PATH=VALUES",
+                        help="Parameter to sweep, e.g. interval_seconds=600,3600 or 'rules[0].threshold=-0.5:-5:10'")
+    parser.add_argument("--capital", type=float, default=1000.0, help="Starting quote balance (default: 1000)")
+    parser.add_argument("--fee-bps", type=float, default=30.0, help="Fee plus slippage per trade (default: 30)")
+    parser.add_argument("--top", type=int, default=10, help="Best combinations to show")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_out", help="Write the summary to this file")
+    args = parser.parse_args()
+
+    with open(args.spec_file) as f:
+        spec = json.load(f)
+    spec = spec.get("spec", spec)
+    if args.synthetic_days:
+        ohlcv = synthetic_ohlcv(args.synthetic_days, seed=args.seed)
+    elif args.prices:
+        ohlcv = load_ohlcv(args.prices)
+    else:
+        parser.error("pass a prices file or --synthetic-days")
+
+    try:
+        result = backtest(spec, ohlcv, parse_sweep(args.sweep), args.capital, args.fee_bps)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    summary = summarize(result, args.top)
+    print_summary(summary)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Fleet-wide balance watcher for agents waiting to be funded.
+
+Every freshly deployed agent sits in a funding loop until its wallet holds
+enough POL. Instead of each agent re-querying its balance every 30 seconds,
+agents register their wallet here. The watcher follows the chain head and,
+on each new block, reads the balances of all pending wallets with batched
+JSON-RPC eth_getBalance calls. A funded wallet is pushed to its agent: any
+long-poll waiting on it (GET /wallets/{address}/wait) returns at once, and a
+registered callback URL receives a POST.
+
+The /wallets routes require WATCHER_API_KEY. Callbacks are signed with an HMAC
+of the body keyed by the agents' API_KEY, which is never sent itself.
+
+Usage:
+    python balance_watcher.py
+    POLYGON_RPC_URL=http://localhost:8545 WATCHER_PORT=8100 python balance_watcher.py
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import time
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import Depends, FastAPI, Header, HTTPException
+from pydantic import BaseModel, Field
+
+from auth import check_api_key
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+POLYGON_RPC_URL = os.getenv("POLYGON_RPC_URL", "https://polygon-rpc.com")
+# Polygon produces a block about every 2s; polling the head faster than that
+# keeps detection inside one block
+WATCHER_POLL_INTERVAL = float(os.getenv("WATCHER_POLL_INTERVAL", "0.5"))
+# With nothing pending the head is only followed for /health
+WATCHER_IDLE_INTERVAL = float(os.getenv("WATCHER_IDLE_INTERVAL", "10"))
+# eth_getBalance calls per JSON-RPC batch request
+WATCHER_BATCH_SIZE = int(os.getenv("WATCHER_BATCH_SIZE", "200"))
+WATCHER_RPC_TIMEOUT = float(os.getenv("WATCHER_RPC_TIMEOUT", "10"))
+# Pending wallets not re-registered for this long are dropped
+WATCHER_WALLET_TTL = float(os.getenv("WATCHER_WALLET_TTL", str(7 * 86_400)))
+# Funded wallets are kept this long so late waiters still see the result
+WATCHER_FUNDED_RETENTION = float(os.getenv("WATCHER_FUNDED_RETENTION", "3600"))
+# Agents send this as x-api-key on /wallets; unset leaves the routes open (development mode)
+WATCHER_API_KEY = os.getenv("WATCHER_API_KEY")
+# Signs funded callbacks (the agents' API_KEY); the key itself is never sent
+AGENT_API_KEY = os.getenv("AGENT_API_KEY", "")
+# Hosts callbacks may go to, e.g. "*.awsapprunner.com,agents.example.com"; unset allows any
+WATCHER_CALLBACK_HOSTS = [h.strip().lower() for h in os.getenv("WATCHER_CALLBACK_HOSTS", "").split(",") if h.strip()]
+
+_ADDRESS = re.compile(r"^0x[0-9a-fA-F]{40}$")
+WEI_PER_POL = Decimal(10) ** 18
+
+
+def _check_callback(url: str) -> None:
+    """Raise ValueError unless `url` is http(s) on an allowed host."""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise ValueError(f"Invalid callback URL: {url}")
+    if WATCHER_CALLBACK_HOSTS and not any(
+        host.endswith(pattern[1:]) if pattern.startswith("*.") else host == pattern
+        for pattern in WATCHER_CALLBACK_HOSTS
+    ):
+        raise ValueError(f"Callback host not allowed: {host}")
+
+
+def sign_notification(body: bytes, key: str) -> str:
+    """Hex HMAC-SHA256 of a callback body, sent as x-watcher-signature."""
+    return hmac.new(key.encode(), body, hashlib.sha256).hexdigest()
+
+
+@dataclass
+class Wallet:
+    address: str
+    min_balance_wei: int
+    callback_url: Optional[str] = None
+    balance_wei: Optional[int] = None
+    funded_block: Optional[int] = None
+    funded_at: Optional[float] = None
+    last_seen: float = field(default_factory=time.time)
+    event: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def view(self) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "funded": self.funded_block is not None,
+            "balance": str(Decimal(self.balance_wei) / WEI_PER_POL) if self.balance_wei is not None else None,
+            "min_balance": str(Decimal(self.min_balance_wei) / WEI_PER_POL),
+            "funded_block": self.funded_block,
+        }
+
+
+class BalanceWatcher:
+    def __init__(self, rpc_url: str, batch_size: int = WATCHER_BATCH_SIZE):
+        self.rpc_url = rpc_url
+        self.batch_size = batch_size
+        self.wallets: Dict[str, Wallet] = {}
+        self.head: Optional[int] = None
+        self.head_seen_at: Optional[float] = None
+        self.client = httpx.AsyncClient(timeout=WATCHER_RPC_TIMEOUT)
+        self._notifications: set = set()
+        self.stats = {
+            "rpc_requests": 0,
+            "balance_reads": 0,
+            "rpc_errors": 0,
+            "blocks": 0,
+            "notifications": 0,
+            "notification_errors": 0,
+        }
+
+    # --- registry ---
+
+    def register(self, address: str, min_balance: float, callback_url: Optional[str] = None) -> Wallet:
+        if not _ADDRESS.match(address):
+            raise ValueError(f"Invalid address: {address}")
+        if callback_url:
+            _check_callback(callback_url)
+        key = address.lower()
+        min_wei = int(Decimal(str(min_balance)) * WEI_PER_POL)
+        wallet = self.wallets.get(key)
+        if wallet is None:
+            wallet = Wallet(key, min_wei, callback_url)
+            self.wallets[key] = wallet
+            logger.info(f"👛 Watching {key} for {min_balance} POL")
+        else:
+            wallet.last_seen = time.time()
+            if wallet.callback_url is None:
+                wallet.callback_url = callback_url
+            elif callback_url and callback_url != wallet.callback_url:
+                # First registration wins; a different agent can't redirect the notification
+                logger.warning(f"Ignoring new callback for {key}; one is already registered")
+            if min_wei != wallet.min_balance_wei:
+                wallet.min_balance_wei = min_wei
+                # A higher threshold may no longer be met
+                if wallet.funded_block is not None and (wallet.balance_wei or 0) < min_wei:
+                    wallet.funded_block = wallet.funded_at = None
+                    wallet.event = asyncio.Event()
+        return wallet
+
+    def unregister(self, address: str) -> bool:
+        return self.wallets.pop(address.lower(), None) is not None
+
+    def _prune(self) -> None:
+        now = time.time()
+        for key, wallet in list(self.wallets.items()):
+            if wallet.funded_at is not None and now - wallet.funded_at > WATCHER_FUNDED_RETENTION:
+                del self.wallets[key]
+            elif wallet.funded_at is None and now - wallet.last_seen > WATCHER_WALLET_TTL:
+                del self.wallets[key]
+
+    # --- chain reads ---
+
+    async def _rpc(self, payload: Any) -> Any:
+        self.stats["rpc_requests"] += 1
+        response = await self.client.post(self.rpc_url, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def _block_number(self) -> int:
+        reply = await self._rpc({"jsonrpc": "2.0", "id": 0, "method": "eth_blockNumber", "params": []})
+        return int(reply["result"], 16)
+
+    async def _balances(self, addresses: List[str]) -> Dict[str, int]:
+        """Read balances in batched JSON-RPC requests, the batches in parallel."""
+        async def batch(chunk: List[str]) -> Dict[str, int]:
+            payload = [
+                {"jsonrpc": "2.0", "id": i, "method": "eth_getBalance", "params": [address, "latest"]}
+                for i, address in enumerate(chunk)
+            ]
+            replies = await self._rpc(payload)
+            self.stats["balance_reads"] += len(chunk)
+            balances = {}
+            for reply in replies if isinstance(replies, list) else []:
+                if "result" in reply and isinstance(reply.get("id"), int) and reply["id"] < len(chunk):
+                    balances[chunk[reply["id"]]] = int(reply["result"], 16)
+                else:
+                    self.stats["rpc_errors"] += 1
+            return balances
+
+        chunks = [addresses[i:i + self.batch_size] for i in range(0, len(addresses), self.batch_size)]
+        results = await asyncio.gather(*(batch(chunk) for chunk in chunks), return_exceptions=True)
+        balances: Dict[str, int] = {}
+        for result in results:
+            if isinstance(result, Exception):
+                self.stats["rpc_errors"] += 1
+                logger.warning(f"Balance batch failed: {result}")
+            else:
+                balances.update(result)
+        return balances
+
+    async def poll_once(self) -> None:
+        """Check the head and, on a new block, read every pending wallet."""
+        block = await self._block_number()
+        if self.head is not None and block <= self.head:
+            return
+        self.head, self.head_seen_at = block, time.time()
+        self.stats["blocks"] += 1
+
+        self._prune()
+        pending = [w.address for w in self.wallets.values() if w.funded_block is None]
+        if not pending:
+            return
+
+        balances = await self._balances(pending)
+        for address, balance in balances.items():
+            wallet = self.wallets.get(address)
+            if wallet is None:
+                continue
+            wallet.balance_wei = balance
+            if wallet.funded_block is None and balance >= wallet.min_balance_wei:
+                self._mark_funded(wallet, block)
+
+    def _mark_funded(self, wallet: Wallet, block: int) -> None:
+        wallet.funded_block = block
+        wallet.funded_at = time.time()
+        wallet.event.set()
+        logger.info(f"💰 {wallet.address} funded at block {block}")
+        if wallet.callback_url:
+            task = asyncio.create_task(self._notify(wallet))
+            self._notifications.add(task)
+            task.add_done_callback(self._notifications.discard)
+
+    async def _notify(self, wallet: Wallet, attempts: int = 3) -> None:
+        """POST the funded wallet to its agent, signed, with exponential backoff."""
+        for attempt in range(1, attempts + 1):
+            # Agents reject stale notifications, so each attempt is signed afresh
+            body = json.dumps({**wallet.view(), "sent_at": int(time.time())}).encode()
+            headers = {"Content-Type": "application/json"}
+            if AGENT_API_KEY:
+                headers["x-watcher-signature"] = sign_notification(body, AGENT_API_KEY)
+            try:
+                response = await self.client.post(wallet.callback_url, content=body, headers=headers)
+                response.raise_for_status()
+                self.stats["notifications"] += 1
+                return
+            except httpx.HTTPError as e:
+                if attempt == attempts:
+                    self.stats["notification_errors"] += 1
+                    logger.warning(f"Funded callback to {wallet.callback_url} failed: {e}")
+                    return
+                await asyncio.sleep(2 ** (attempt - 1))
+
+    def _has_pending(self) -> bool:
+        return any(w.funded_block is None for w in self.wallets.values())
+
+    async def run(self, interval: float = WATCHER_POLL_INTERVAL) -> None:
+        backoff = interval
+        while True:
+            try:
+                await self.poll_once()
+                backoff = interval
+            except (httpx.HTTPError, KeyError, ValueError) as e:
+                self.stats["rpc_errors"] += 1
+                logger.warning(f"Head poll failed: {e}")
+                backoff = min(backoff * 2, 30)
+            # Sleep in short steps while idle so a new registration is picked up promptly
+            waited = 0.0
+            while waited < backoff or (waited < WATCHER_IDLE_INTERVAL and not self._has_pending()):
+                await asyncio.sleep(interval)
+                waited += interval
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+watcher: Optional[BalanceWatcher] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start following the chain head before accepting registrations."""
+    global watcher
+    watcher = BalanceWatcher(POLYGON_RPC_URL)
+    task = asyncio.create_task(watcher.run())
+    logger.info(f"👀 Balance watcher following {POLYGON_RPC_URL}")
+    yield
+    task.cancel()
+    with suppress(asyncio.CancelledError):
+        await task
+    await watcher.close()
+
+
+app = FastAPI(
+    title="EVM Agent Balance Watcher",
+    description="Batched balance watching and funded notifications for deployed agents",
+    version="1.0.0",
+    lifespan=lifespan,
+)
+
+
+async def require_watcher_key(x_api_key: Optional[str] = Header(None)):
+    check_api_key(x_api_key, WATCHER_API_KEY)
+
+
+class WalletRequest(BaseModel):
+    address: str
+    min_balance: float = Field(default=0.01, ge=0)
+    # Agent endpoint to POST to once funded, e.g. https://agent.example.com/funded
+    callback_url: Optional[str] = None
+
+
+def _register(address: str, min_balance: float, callback_url: Optional[str] = None) -> Wallet:
+    try:
+        return watcher.register(address, min_balance, callback_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/wallets", summary="Watch a wallet until it is funded", dependencies=[Depends(require_watcher_key)])
+async def register_wallet(request: WalletRequest):
+    return _register(request.address, request.min_balance, request.callback_url).view()
+
+
+@app.get("/wallets/{address}", summary="Get a watched wallet's funding state", dependencies=[Depends(require_watcher_key)])
+async def get_wallet(address: str):
+    wallet = watcher.wallets.get(address.lower())
+    if wallet is None:
+        raise HTTPException(status_code=404, detail="Wallet is not being watched")
+    return wallet.view()
+
+
+@app.delete("/wallets/{address}", summary="Stop watching a wallet", dependencies=[Depends(require_watcher_key)])
+async def delete_wallet(address: str):
+    return {"removed": watcher.unregister(address)}
+
+
+@app.get("/wallets/{address}/wait", summary="Long-poll until a wallet is funded", dependencies=[Depends(require_watcher_key)])
+async def wait_for_wallet(address: str, min_balance: float = 0.01, timeout: float = 25):
+    """
+    Register the wallet if needed and hold the request until it is funded or
+    `timeout` seconds pass. Returns the wallet state either way.
+    """
+    wallet = _register(address, min_balance)
+    with suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(wallet.event.wait(), timeout=min(max(timeout, 0), 60))
+    return wallet.view()
+
+
+@app.get("/health", summary="Watcher health")
+async def health():
+    pending = sum(1 for w in watcher.wallets.values() if w.funded_block is None)
+    head_age = time.time() - watcher.head_seen_at if watcher.head_seen_at else None
+    return {
+        "status": "healthy" if head_age is not None and head_age < 30 else "degraded",
+        "head": watcher.head,
+        "head_age_s": round(head_age, 1) if head_age is not None else None,
+        "wallets": len(watcher.wallets),
+        "pending": pending,
+        "stats": watcher.stats,
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    if not WATCHER_API_KEY:
+        logger.warning("⚠️  WATCHER_API_KEY not set; /wallets is unprotected")
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("WATCHER_PORT", "8100")))
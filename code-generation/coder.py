@@ -1,13 +1,39 @@
 import os
-import json
-import re
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import HumanMessage, SystemMessage
-import esprima
 from dotenv import load_dotenv
-from variables import TRANSACTIONS_CODE, TRANSACTIONS_USAGE, HELPER_FUNCTIONS, BASELINE_JS, CODER_PROMPT, STATUS_FORMAT
+from variables import (
+    TRANSACTIONS_CODE,
+    TRANSACTIONS_USAGE,
+    HELPER_FUNCTIONS,
+    BASELINE_JS,
+    CODER_PROMPT,
+    EDITOR_PROMPT,
+    STATUS_FORMAT,
+    FULL_OUTPUT_RULE,
+    FULL_OUTPUT_FORMAT,
+    STRATEGY_OUTPUT_RULE,
+    STRATEGY_OUTPUT_FORMAT,
+    SPEC_OUTPUT_FORMAT,
+    CODE_OUTPUT_SCHEMA,
+    CODER_OUTPUT_SCHEMA,
+    EDIT_OUTPUT_SCHEMA,
+    STRATEGY_OUTPUT_SCHEMA,
+)
+from extraction import StreamingExtractor
+from patching import apply_edits
+from cost import analyze_cost
+from validation import (
+    parse_model_output,
+    parse_strategy_output,
+    run_checks,
+    run_stage,
+    validate_code_output,
+    validate_deployment_compatibility,
+    validate_strategy_spec,
+)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -21,65 +47,42 @@ if not api_key:
     )
 os.environ["OPENAI_API_KEY"] = api_key
 
+# Request schema-constrained JSON (OpenAI structured outputs) rather than relying on the prompt alone
+STRUCTURED_OUTPUT = os.getenv("CODER_STRUCTURED_OUTPUT", "false").lower() == "true"
+# Reject (rather than just report) agents whose estimated call rate is over budget
+COST_ENFORCE = os.getenv("COST_ENFORCE", "true").lower() == "true"
+# "full": the model writes the whole baselineFunction(). "strategy": it writes only the
+# ENTER AI CODE section and the service splices it into BASELINE_JS, which cuts output tokens.
+CODER_MODE = os.getenv("CODER_MODE", "full")
 
-def _syntax_check(js_code: str) -> str | None:
-    """Parse with esprima to catch syntax errors."""
-    print("🔍 Running syntax check…")
-    try:
-        esprima.parseScript(js_code)
-        print("✅ Syntax looks good")
-        return None
-    except Exception as e:
-        err = str(e).split("\n")[0]
-        print(f"❌ Syntax error: {err}")
-        return err
-    
-def _lint_check(js_code: str) -> str | None:
-    """
-    Shallow lint via regex:
-      - const reassignment
-      - missing await in async functions
-      - suspicious comparison operators
-    """
-    print("🔍 Running lint check…")
-    errors = []
-
-    # 1) const reassignment
-    for const_match in re.finditer(r'\bconst\s+([A-Za-z_$][0-9A-Za-z_$]*)', js_code):
-        name = const_match.group(1)
-        # look for a second assignment to that name
-        # ignore the declaration line
-        rest = js_code[const_match.end():]
-        if re.search(rf'\b{name}\s*=', rest):
-            errors.append(f"Cannot reassign const `{name}`")
-
-    # 2) missing await for async calls
-    async_funcs = re.findall(r'async function\s+([A-Za-z_$][0-9A-Za-z_$]*)', js_code)
-    for fn in async_funcs:
-        # if the function is invoked but never awaited
-        calls = re.findall(rf'\b{fn}\(', js_code)
-        awaited = re.findall(rf'await\s+{fn}\(', js_code)
-        if calls and not awaited:
-            errors.append(f"Missing `await` for `{fn}()` call")
-
-    # 3) wrong comparison direction (e.g. `>` instead of `<`) — heuristic
-    # If both `price > number` and `price < number` appear, warn
-    if "price" in js_code:
-        gt = bool(re.search(r'\bprice\W*>\W*\d', js_code))
-        lt = bool(re.search(r'\bprice\W*<\W*\d', js_code))
-        if gt and lt:
-            errors.append("Suspicious: both `price > x` and `price < y` found")
-
-    if errors:
-        print(f"❌ Lint issues found ({len(errors)}):", errors)
-        return "\n".join(errors)
-    print("✅ Lint looks good (shallow checks)")
-    return None
+# mode -> (output rule, output format, output key, schema name, schema)
+OUTPUT_MODES = {
+    "full": (FULL_OUTPUT_RULE, FULL_OUTPUT_FORMAT, "code", "baseline_code", CODER_OUTPUT_SCHEMA),
+    "strategy": (STRATEGY_OUTPUT_RULE, STRATEGY_OUTPUT_FORMAT, "strategy", "strategy_block", STRATEGY_OUTPUT_SCHEMA),
+}
+
+
+def _with_output_schema(model: ChatOpenAI, name: str, schema: dict):
+    if not STRUCTURED_OUTPUT:
+        return model
+    return model.bind(response_format={
+        "type": "json_schema",
+        "json_schema": {"name": name, "strict": True, "schema": schema},
+    })
+
+
+def _stream_output(model, messages, required_keys=("code",)) -> str:
+    """Stream a completion, stopping as soon as the JSON output object closes."""
+    extractor = StreamingExtractor(required_keys)
+    for chunk in model.stream(messages):
+        if extractor.feed(chunk.content):
+            break
+    return extractor.text
 
 
 def _invoke_guardrail(original: dict, syntax_err: str | None, lint_err: str | None) -> dict:
     print("🤖 Invoking guardrail model…")
-    guard = ChatOpenAI(model="gpt-4o")
+    guard = _with_output_schema(ChatOpenAI(model="gpt-4o"), "baseline_code", CODE_OUTPUT_SCHEMA)
     system = SystemMessage(
 """
 You are a JavaScript code specialist whose sole job is to correct and refine trading-agent snippets for EVM blockchains.
@@ -116,118 +119,22 @@ Output Format:
         f"Syntax errors: {syntax_err or 'None'}\n"
         f"Lint errors: {lint_err or 'None'}\n\n"
     )
-    resp = guard.invoke([system, human]).content.strip()
-    # strip markdown fences if present
-    if resp.startswith("```"):
-        resp = resp.strip("```json").strip("```").strip()
-    return json.loads(resp)
-
-
-def parse_model_output(output_content):
-    """
-    Parse the model output to extract JSON response.
-    Handles various output formats including markdown code blocks.
-    """
-    try:
-        # Remove markdown code block formatting if present
-        content = output_content.strip()
-        
-        # Check if content is wrapped in markdown code blocks
-        if content.startswith('```json'):
-            # Extract content between ```json and ```
-            start_idx = content.find('```json') + 7
-            end_idx = content.rfind('```')
-            if end_idx > start_idx:
-                content = content[start_idx:end_idx].strip()
-        elif content.startswith('```'):
-            # Extract content between ``` and ```
-            start_idx = content.find('```') + 3
-            end_idx = content.rfind('```')
-            if end_idx > start_idx:
-                content = content[start_idx:end_idx].strip()
-        
-        # Parse JSON
-        parsed_json = json.loads(content)
-        return parsed_json
-        
-    except json.JSONDecodeError as e:
-        print(f"JSON parsing error: {e}")
-        print(f"Raw content: {output_content}")
-        return None
-    except Exception as e:
-        print(f"Unexpected error parsing output: {e}")
-        print(f"Raw content: {output_content}")
-        return None
-
-def validate_code_output(parsed_output):
-    """
-    Validate that the parsed output contains the expected structure.
-    """
-    if not parsed_output:
-        return False, "No output to validate"
-    
-    if not isinstance(parsed_output, dict):
-        return False, "Output is not a dictionary"
-    
-    if 'code' not in parsed_output:
-        return False, "Missing 'code' key in output"
-    
-    if not parsed_output['code']:
-        return False, "Code field is empty"
-    
-    # Basic validation that it's JavaScript code
-    code = parsed_output['code']
-    if not code.strip().startswith('//') and not code.strip().startswith('export'):
-        return False, "Code doesn't appear to be valid JavaScript"
-    
-    return True, "Output validation passed"
-
-
-def _validate_deployment_compatibility(code: str) -> Tuple[bool, str]:
-    """
-    Validate that generated code is compatible with deployment system.
-    Checks for common issues that would cause deployment failures.
-    """
-    print("🔍 Validating deployment compatibility...")
-    
-    # Check 1: Correct export signature
-    if 'export async function baselineFunction(ownerAddress)' not in code:
-        return False, "Missing required export: 'export async function baselineFunction(ownerAddress)'"
-    
-    # Check 2: No default exports
-    if 'export default' in code:
-        return False, "Default exports not supported by deployment system"
-    
-    # Check 3: No ethers v5 API usage
-    if 'ethers.utils' in code:
-        return False, "Code uses ethers v5 API (ethers.utils.*). Use ethers v6 API instead (ethers.Interface)"
-    
-    # Check 4: Hex values for transaction amounts
-    if re.search(r'value:\s*["\']0["\'](?![x])', code):
-        return False, "Transaction value should be '0x0' (hex), not '0' (decimal)"
-    
-    # Check 5: Status updates present
-    if 'updateStatus' not in code:
-        return False, "Missing updateStatus() calls for monitoring"
-    
-    # Check 6: Logging present
-    if 'log(' not in code:
-        return False, "Missing log() calls for debugging"
-    
-    # Check 7: Correct trades array reference
-    if re.search(r'trades:\s*\[.*?Array\.isArray\(trades\)', code):
-        return False, "Using undefined 'trades' variable. Should use 'currentStatus.trades'"
-    
-    print("✅ Deployment compatibility validated")
-    return True, "Code is deployment-ready"
+    resp = _stream_output(guard, [system, human])
+    corrected = parse_model_output(resp)
+    if not corrected:
+        raise ValueError("Guardrail model returned unparseable output")
+    return corrected
 
 
-def code(prompt: str) -> Dict[str, Any]:
-    model = ChatOpenAI(model="gpt-4o-mini")
+def generate(prompt: str, mode: str | None = None) -> str:
+    """Run the coder model on a prompt and return its raw response."""
+    output_rule, output_format, output_key, schema_name, schema = OUTPUT_MODES[mode or CODER_MODE]
+    model = _with_output_schema(ChatOpenAI(model="gpt-4o-mini"), schema_name, schema)
 
     prompt_template = ChatPromptTemplate.from_messages([
         ("system", CODER_PROMPT),
-        ("human", prompt)
+        # Escape braces so prompts that quote code aren't read as template variables
+        ("human", prompt.replace("{", "{{").replace("}", "}}"))
     ])
 
     formatted_prompt = prompt_template.format(
@@ -236,17 +143,17 @@ def code(prompt: str) -> Dict[str, Any]:
         BASELINE_JS=BASELINE_JS,
         HELPER_FUNCTIONS=HELPER_FUNCTIONS,
         STATUS_FORMAT=STATUS_FORMAT,
+        OUTPUT_RULE=output_rule,
+        OUTPUT_FORMAT=output_format,
+        SPEC_FORMAT=SPEC_OUTPUT_FORMAT,
     )
 
     print("🔄 Generating trading strategy...")
-    response = model.invoke(formatted_prompt).content
+    return _stream_output(model, formatted_prompt, required_keys=(output_key,))
 
-    print("📝 Parsing model response...")
-    result = parse_model_output(response)
-    
-    if not result:
-        return {"error": "Failed to parse model output", "raw": response}
 
+def _finalize(result: Dict[str, Any], response: str) -> Dict[str, Any]:
+    """Validate parsed model output, run the guardrail if needed and check deployability."""
     print("✅ Validating generated code...")
     is_valid, validation_message = validate_code_output(result)
     
@@ -255,10 +162,16 @@ def code(prompt: str) -> Dict[str, Any]:
 
     code_str = result.get("code", "")
 
-    # 1. Syntax check
-    syntax_err = _syntax_check(code_str)
-    # 2. Shallow lint
-    lint_err = _lint_check(code_str)
+    # The spec is advisory (it feeds backtest.py); a bad one is dropped, not fatal
+    spec = result.pop("spec", None)
+    if spec is not None:
+        spec_ok, spec_message = validate_strategy_spec(spec)
+        if not spec_ok:
+            print(f"⚠️  Dropping invalid strategy spec: {spec_message}")
+            spec = None
+
+    # 1. Syntax check and 2. shallow lint (offloaded to the validation pool for large outputs)
+    syntax_err, lint_err = run_checks(code_str)
     
     # 3. Only run guardrail if there are actual errors
     if syntax_err or lint_err:
@@ -269,7 +182,7 @@ def code(prompt: str) -> Dict[str, Any]:
         final = result
     
     # 4. Validate deployment compatibility
-    is_valid, validation_msg = _validate_deployment_compatibility(final['code'])
+    is_valid, validation_msg = run_stage(validate_deployment_compatibility, final['code'])
     if not is_valid:
         print(f"❌ Deployment validation failed: {validation_msg}")
         return {
@@ -278,5 +191,80 @@ def code(prompt: str) -> Dict[str, Any]:
             "validation_error": validation_msg
         }
     
+    # 5. Estimate steady-state API call rates against the per-upstream budgets
+    cost_report = run_stage(analyze_cost, final['code'])
+    final["cost_report"] = cost_report
+    if COST_ENFORCE and not cost_report["within_budget"]:
+        errors = [issue["message"] for issue in cost_report["issues"] if issue["severity"] == "error"]
+        print(f"❌ Cost analysis failed: {errors}")
+        return {
+            "error": f"Generated code exceeds runtime cost budget: {'; '.join(errors)}",
+            "code": final['code'],
+            "cost_report": cost_report,
+        }
+    
+    if spec is not None:
+        final["spec"] = spec
     print("🎉 Strategy generation completed successfully!")
-    return final 
\ No newline at end of file
+    return final
+
+
+def code(prompt: str, mode: str | None = None) -> Dict[str, Any]:
+    mode = mode or CODER_MODE
+    response = generate(prompt, mode)
+
+    print("📝 Parsing model response...")
+    result = parse_strategy_output(response) if mode == "strategy" else parse_model_output(response)
+    
+    if not result:
+        return {"error": "Failed to parse model output", "raw": response}
+
+    return _finalize(result, response)
+
+
+def _request_edits(previous_code: str, instruction: str, history: List[str]) -> str:
+    model = _with_output_schema(ChatOpenAI(model="gpt-4o-mini"), "code_edits", EDIT_OUTPUT_SCHEMA)
+    system = SystemMessage(EDITOR_PROMPT.format(
+        HELPER_FUNCTIONS=HELPER_FUNCTIONS,
+        TRANSACTIONS_USAGE=TRANSACTIONS_USAGE,
+    ))
+    context = "\n".join(history[-6:]) if history else "No previous conversation"
+    human = HumanMessage(
+        f"Previous conversation:\n{context}\n\n"
+        f"Existing code:\n```js\n{previous_code}\n```\n\n"
+        f"Instruction: {instruction}"
+    )
+    return _stream_output(model, [system, human], required_keys=("edits",))
+
+
+def edit(previous_code: str, instruction: str, history: List[str] | None = None) -> Dict[str, Any]:
+    """
+    Revise a previously validated strategy by asking the model for a minimal
+    search/replace patch instead of a full rewrite. Falls back to full
+    regeneration when the patch can't be parsed or doesn't apply.
+    """
+    print("✏️  Requesting patch for existing strategy...")
+    response = _request_edits(previous_code, instruction, history or [])
+
+    print("📝 Parsing patch...")
+    patch = parse_model_output(response, required_keys=("edits",))
+    if patch:
+        patched, reason = apply_edits(previous_code, patch["edits"])
+    else:
+        patched, reason = None, "Failed to parse model output"
+
+    if patched is None:
+        print(f"⚠️  Patch not applied ({reason}), regenerating full strategy...")
+        result = code(
+            f"{instruction}\n\n"
+            f"Apply this change to the following existing strategy and keep everything else the same:\n"
+            f"{previous_code}"
+        )
+        result["mode"] = "regenerated"
+        result["fallback_reason"] = reason
+        return result
+
+    print(f"🩹 Applied {len(patch['edits'])} edit(s)")
+    result = _finalize({"code": patched}, response)
+    result["mode"] = "edit"
+    return result
@@ -0,0 +1,457 @@
+import json
+import os
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from validation import parse_js
+
+# Helpers that leave the container, and the upstream each one hits
+EXTERNAL_HELPERS = {
+    "getTokenMarketData": "mobula",
+    "getBalances": "mobula",
+    "checkBalance": "mobula",
+    "getTokenInfo": "lifi",
+    "swap": "lifi",
+    "sendTransaction": "rpc",
+}
+
+# Steady-state calls per minute, per upstream, for a single agent
+DEFAULT_BUDGETS = {
+    "mobula": {"warn": 6, "reject": 30},
+    "lifi": {"warn": 2, "reject": 12},
+    "rpc": {"warn": 2, "reject": 12},
+}
+COST_BUDGETS = {**DEFAULT_BUDGETS, **json.loads(os.getenv("COST_BUDGETS", "{}"))}
+
+# Intervals shorter than this are flagged even when the call budget holds
+MIN_INTERVAL_MS = int(os.getenv("COST_MIN_INTERVAL_MS", "10000"))
+
+# Helpers the baseline's wait-for-funding loop calls; that loop ends once the
+# wallet is funded, so it is the one breaking loop that isn't steady state
+FUNDING_HELPERS = {"checkBalance", "waitForFunding"}
+
+# Assumed iterations for loops whose bound can't be read from the code
+DEFAULT_LOOP_FACTOR = 10
+# Assumed period when a timer's delay can't be evaluated statically
+DEFAULT_PERIOD_MS = 60_000
+
+_FUNCTION_TYPES = {"FunctionDeclaration", "FunctionExpression", "ArrowFunctionExpression"}
+_LOOP_TYPES = {"WhileStatement", "DoWhileStatement", "ForStatement", "ForOfStatement", "ForInStatement"}
+_ARRAY_ITERATORS = {"map", "forEach", "filter", "reduce", "some", "every", "flatMap", "find"}
+
+
+def _children(node):
+    for key, value in node.items():
+        if key == "loc":
+            continue
+        if isinstance(value, dict) and "type" in value:
+            yield value
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict) and "type" in item:
+                    yield item
+
+
+def _walk(node, into_functions=True):
+    yield node
+    for child in _children(node):
+        if not into_functions and child["type"] in _FUNCTION_TYPES:
+            continue
+        yield from _walk(child, into_functions)
+
+
+def _line(node) -> Optional[int]:
+    return node.get("loc", {}).get("start", {}).get("line")
+
+
+class _Context:
+    """How often the code being visited runs: `amount` times in total, or `amount` times a minute if steady."""
+
+    def __init__(self, steady: bool, amount: float):
+        self.steady = steady
+        self.amount = amount
+
+    def scaled(self, factor: float) -> "_Context":
+        return _Context(self.steady, self.amount * factor)
+
+
+class _Analyzer:
+    def __init__(self, ast: dict):
+        self.ast = ast
+        self.functions: Dict[str, dict] = {}
+        self.constants: Dict[str, float] = {}
+        self.array_lengths: Dict[str, int] = {}
+        self.steady_calls: Dict[str, float] = defaultdict(float)
+        self.setup_calls: Dict[str, float] = defaultdict(float)
+        self.schedules: List[Dict[str, Any]] = []
+        self.issues: List[Dict[str, Any]] = []
+        self._active: List[str] = []
+        self._recurring: set = set()
+        # name -> (parameter names, parameter defaults, delay expression) of
+        # helpers like `const sleep = ms => new Promise(r => setTimeout(r, ms))`
+        self.sleep_helpers: Dict[str, Tuple[List[str], List[Optional[dict]], dict]] = {}
+
+        for node in _walk(ast):
+            if node["type"] == "FunctionDeclaration" and node.get("id"):
+                self.functions[node["id"]["name"]] = node
+            elif node["type"] == "VariableDeclarator" and node["id"]["type"] == "Identifier" and node.get("init"):
+                init = node["init"]
+                if init["type"] in _FUNCTION_TYPES:
+                    self.functions[node["id"]["name"]] = init
+                elif init["type"] == "ArrayExpression":
+                    self.array_lengths[node["id"]["name"]] = len(init["elements"])
+                else:
+                    value = self._evaluate(init)
+                    if value is not None:
+                        self.constants[node["id"]["name"]] = value
+
+        for name, fn in self.functions.items():
+            delay = self._promise_delay(fn["body"])
+            if delay is not None:
+                params, defaults = [], []
+                for param in fn["params"]:
+                    if param["type"] == "AssignmentPattern" and param["left"]["type"] == "Identifier":
+                        params.append(param["left"]["name"])
+                        defaults.append(param["right"])
+                    else:
+                        params.append(param["name"] if param["type"] == "Identifier" else None)
+                        defaults.append(None)
+                self.sleep_helpers[name] = (params, defaults, delay)
+
+    def issue(self, severity: str, message: str, node: dict) -> None:
+        self.issues.append({"severity": severity, "message": message, "line": _line(node)})
+
+    def _evaluate(self, node: dict, env: Optional[Dict[str, Optional[float]]] = None) -> Optional[float]:
+        """
+        Evaluate simple constant numeric expressions such as `20 * 60 * 1000`.
+        `env` binds names first, e.g. a helper's parameters to its call-site arguments.
+        """
+        kind = node["type"]
+        if kind == "Literal" and isinstance(node.get("value"), (int, float)) and not isinstance(node["value"], bool):
+            return float(node["value"])
+        if kind == "Identifier":
+            if env is not None and node["name"] in env:
+                return env[node["name"]]
+            return self.constants.get(node["name"])
+        if kind == "UnaryExpression" and node["operator"] == "-":
+            value = self._evaluate(node["argument"], env)
+            return None if value is None else -value
+        if kind == "BinaryExpression":
+            left, right = self._evaluate(node["left"], env), self._evaluate(node["right"], env)
+            if left is None or right is None:
+                return None
+            op = node["operator"]
+            if op == "*":
+                return left * right
+            if op == "+":
+                return left + right
+            if op == "-":
+                return left - right
+            if op == "/" and right:
+                return left / right
+        return None
+
+    def _period(self, call: dict, kind: str) -> float:
+        args = call["arguments"]
+        period = self._evaluate(args[1]) if len(args) > 1 else 0.0
+        if period is None:
+            self.issue("warning", f"Could not determine {kind} delay; assuming {DEFAULT_PERIOD_MS} ms", call)
+            return DEFAULT_PERIOD_MS
+        return max(period, 1.0)
+
+    def run(self) -> None:
+        entry = self.functions.get("baselineFunction")
+        if entry is None:
+            self.issue("warning", "baselineFunction not found; analyzing module body", self.ast)
+            self.visit(self.ast, _Context(False, 1))
+            return
+        self._active.append("baselineFunction")
+        self.visit(entry["body"], _Context(False, 1))
+        self._active.pop()
+
+    # --- traversal -----------------------------------------------------------
+
+    def visit(self, node: dict, ctx: _Context) -> None:
+        kind = node["type"]
+        if kind in _FUNCTION_TYPES:
+            # Definitions run when called; calls to them are followed below
+            return
+        if kind in _LOOP_TYPES:
+            self.visit_loop(node, ctx)
+            return
+        if kind in ("CallExpression", "NewExpression"):
+            self.visit_call(node, ctx)
+            return
+        for child in _children(node):
+            self.visit(child, ctx)
+
+    def visit_function_body(self, fn: dict, ctx: _Context) -> None:
+        self.visit(fn["body"], ctx)
+
+    def visit_call(self, call: dict, ctx: _Context) -> None:
+        callee = call["callee"]
+        name = callee["name"] if callee["type"] == "Identifier" else None
+        args = call.get("arguments", [])
+
+        if name in EXTERNAL_HELPERS:
+            bucket = self.steady_calls if ctx.steady else self.setup_calls
+            bucket[name] += ctx.amount
+        elif name == "setInterval" and args:
+            self.visit_interval(call, ctx)
+            return
+        elif name == "setTimeout" and args:
+            self.visit_timeout(call, ctx)
+            return
+        elif name in self.functions and name not in self._active:
+            self._active.append(name)
+            self.visit_function_body(self.functions[name], ctx)
+            self._active.pop()
+
+        if callee["type"] == "MemberExpression":
+            self.visit(callee["object"], ctx)
+            prop = callee.get("property", {})
+            if not callee.get("computed") and prop.get("name") in _ARRAY_ITERATORS:
+                for arg in args:
+                    if arg["type"] in _FUNCTION_TYPES:
+                        self.visit_function_body(arg, ctx.scaled(DEFAULT_LOOP_FACTOR))
+                    else:
+                        self.visit(arg, ctx)
+                return
+
+        for arg in args:
+            if arg["type"] in _FUNCTION_TYPES:
+                # Promise executors, .then() handlers and the like run inline
+                self.visit_function_body(arg, ctx)
+            else:
+                self.visit(arg, ctx)
+
+    def _callback_body(self, callback: dict, ctx: _Context) -> None:
+        if callback["type"] in _FUNCTION_TYPES:
+            self.visit_function_body(callback, ctx)
+        elif callback["type"] == "Identifier" and callback["name"] in self.functions:
+            name = callback["name"]
+            if name not in self._active:
+                self._active.append(name)
+                self.visit_function_body(self.functions[name], ctx)
+                self._active.pop()
+
+    def _calls_active_function(self, callback: dict) -> Optional[str]:
+        if callback["type"] == "Identifier" and callback["name"] in self._active:
+            return callback["name"]
+        if callback["type"] in _FUNCTION_TYPES:
+            for node in _walk(callback["body"]):
+                if node["type"] == "CallExpression" and node["callee"]["type"] == "Identifier" \
+                        and node["callee"]["name"] in self._active:
+                    return node["callee"]["name"]
+        return None
+
+    def visit_interval(self, call: dict, ctx: _Context) -> None:
+        period = self._period(call, "setInterval")
+        per_minute = 60_000 / period
+        self.schedules.append({"kind": "setInterval", "period_ms": period, "line": _line(call)})
+        if period < MIN_INTERVAL_MS:
+            self.issue("warning", f"setInterval every {period / 1000:g}s is below the {MIN_INTERVAL_MS / 1000:g}s minimum", call)
+        if ctx.steady:
+            # The rate below is only a lower bound: it grows with every tick
+            self.issue("error", "setInterval is created inside recurring code, so intervals pile up without bound", call)
+        self._callback_body(call["arguments"][0], _Context(True, per_minute * ctx.amount))
+
+    def visit_timeout(self, call: dict, ctx: _Context) -> None:
+        callback = call["arguments"][0]
+        recursive = self._calls_active_function(callback)
+        if recursive and recursive not in self._recurring:
+            # setTimeout(run, P) from inside run(): a hand-rolled interval
+            period = self._period(call, "setTimeout")
+            self.schedules.append({"kind": "setTimeout (recurring)", "period_ms": period, "line": _line(call)})
+            if period < MIN_INTERVAL_MS:
+                self.issue("warning", f"Recurring setTimeout every {period / 1000:g}s is below the {MIN_INTERVAL_MS / 1000:g}s minimum", call)
+            self._recurring.add(recursive)
+            self._active.remove(recursive)
+            self._callback_body({"type": "Identifier", "name": recursive}, _Context(True, 60_000 / period))
+            self._active.append(recursive)
+            return
+        if not recursive:
+            self._callback_body(callback, ctx)
+
+    # --- loops ---------------------------------------------------------------
+
+    def _has_own_break(self, loop: dict) -> bool:
+        """True if a `break` exits this loop (not an inner loop or switch)."""
+        def search(node):
+            for child in _children(node):
+                kind = child["type"]
+                if kind == "BreakStatement" and not child.get("label"):
+                    return True
+                if kind in _LOOP_TYPES or kind in _FUNCTION_TYPES or kind == "SwitchStatement":
+                    continue
+                if search(child):
+                    return True
+            return False
+        return search(loop["body"])
+
+    def _is_funding_wait(self, loop: dict, ctx: _Context) -> bool:
+        """True for the baseline's wait-for-funding loop, directly in baselineFunction."""
+        if ctx.steady or self._active != ["baselineFunction"] or not self._has_own_break(loop):
+            return False
+
+        def search(node):
+            for child in _children(node):
+                kind = child["type"]
+                if kind == "CallExpression" and child["callee"].get("name") in FUNDING_HELPERS:
+                    return True
+                if kind in _LOOP_TYPES or kind in _FUNCTION_TYPES:
+                    continue
+                if search(child):
+                    return True
+            return False
+        return search(loop["body"])
+
+    @staticmethod
+    def _promise_delay(node: dict) -> Optional[dict]:
+        """The delay expression of the first `new Promise(... setTimeout(r, P) ...)` in node."""
+        for promise in _walk(node):
+            if promise["type"] == "NewExpression" and promise["callee"].get("name") == "Promise":
+                for inner in _walk(promise):
+                    if inner["type"] == "CallExpression" and inner["callee"].get("name") == "setTimeout" \
+                            and len(inner["arguments"]) > 1:
+                        return inner["arguments"][1]
+        return None
+
+    def _helper_delay(self, call: dict) -> Optional[float]:
+        """Delay of a call to a sleep helper, from its call-site arguments."""
+        params, defaults, delay = self.sleep_helpers[call["callee"]["name"]]
+        args = call["arguments"]
+        env: Dict[str, Optional[float]] = {}
+        for i, name in enumerate(params):
+            if name is None:
+                continue
+            if i < len(args):
+                env[name] = self._evaluate(args[i])
+            else:
+                env[name] = self._evaluate(defaults[i]) if defaults[i] is not None else None
+        return self._evaluate(delay, env)
+
+    def _sleep_ms(self, loop: dict) -> Optional[float]:
+        """
+        Total delay per iteration from `await new Promise(r => setTimeout(r, P))`,
+        written inline or through a sleep helper such as `await sleep(P)`, if any.
+        """
+        total = 0.0
+        found = False
+        for node in _walk(loop["body"]):
+            value = None
+            if node["type"] == "NewExpression" and node["callee"].get("name") == "Promise":
+                delay = self._promise_delay(node)
+                if delay is None:
+                    continue
+                value = self._evaluate(delay)
+            elif node["type"] == "CallExpression" and node["callee"]["type"] == "Identifier" \
+                    and node["callee"]["name"] in self.sleep_helpers:
+                value = self._helper_delay(node)
+            else:
+                continue
+            total += DEFAULT_PERIOD_MS if value is None else value
+            found = True
+        return total if found else None
+
+    def _static_iterations(self, loop: dict) -> Optional[float]:
+        kind = loop["type"]
+        if kind == "ForStatement":
+            test = loop.get("test")
+            if test and test["type"] == "BinaryExpression" and test["operator"] in ("<", "<="):
+                bound = self._evaluate(test["right"])
+                if bound is not None:
+                    return max(bound + (1 if test["operator"] == "<=" else 0), 0)
+        if kind in ("ForOfStatement", "ForInStatement"):
+            right = loop["right"]
+            if right["type"] == "ArrayExpression":
+                return len(right["elements"])
+            if right["type"] == "Identifier" and right["name"] in self.array_lengths:
+                return self.array_lengths[right["name"]]
+        return None
+
+    def visit_loop(self, loop: dict, ctx: _Context) -> None:
+        kind = loop["type"]
+        test = loop.get("test")
+        unbounded = kind in ("WhileStatement", "DoWhileStatement", "ForStatement") and (
+            test is None or (test["type"] == "Literal" and test.get("value") is True)
+        )
+        sleep = self._sleep_ms(loop) if kind in ("WhileStatement", "DoWhileStatement", "ForStatement") else None
+
+        if self._is_funding_wait(loop, ctx):
+            # Runs until the wallet is funded: not steady state
+            body_ctx = _Context(False, ctx.amount)
+        elif sleep is not None and not ctx.steady:
+            # A polling loop: one iteration per sleep, for as long as the agent
+            # runs, even if it breaks out once its condition is met
+            per_minute = 60_000 / max(sleep, 1.0)
+            self.schedules.append({"kind": "polling loop", "period_ms": sleep, "line": _line(loop)})
+            if sleep < MIN_INTERVAL_MS:
+                self.issue("warning", f"Polling loop sleeps {sleep / 1000:g}s, below the {MIN_INTERVAL_MS / 1000:g}s minimum", loop)
+            body_ctx = _Context(True, per_minute * ctx.amount)
+        elif self._has_own_break(loop):
+            # Runs until a condition is met, with no delay to pace it
+            body_ctx = _Context(False, ctx.amount) if not ctx.steady else ctx.scaled(DEFAULT_LOOP_FACTOR)
+        elif unbounded:
+            self.issue("error", "Infinite loop without a delay polls as fast as the APIs respond", loop)
+            body_ctx = _Context(True, ctx.amount * DEFAULT_LOOP_FACTOR * 60)
+        else:
+            iterations = self._static_iterations(loop)
+            body_ctx = ctx.scaled(DEFAULT_LOOP_FACTOR if iterations is None else iterations)
+
+        for key in ("init", "test", "update", "right"):
+            if loop.get(key):
+                self.visit(loop[key], ctx)
+        self.visit(loop["body"], body_ctx)
+
+
+def analyze_cost(js_code: str) -> Dict[str, Any]:
+    """
+    Statically estimate a generated agent's steady-state call rate to each
+    external helper, and check it against the per-upstream budgets.
+    """
+    print("🔍 Estimating runtime cost…")
+    try:
+        ast = parse_js(js_code, {"loc": True}).toDict()
+    except Exception as e:
+        return {
+            "calls_per_minute": {},
+            "calls_per_minute_by_upstream": {},
+            "setup_calls": {},
+            "schedules": [],
+            "issues": [{"severity": "warning", "message": f"Could not parse code for cost analysis: {str(e).splitlines()[0]}", "line": None}],
+            "within_budget": True,
+        }
+
+    analyzer = _Analyzer(ast)
+    analyzer.run()
+
+    by_upstream: Dict[str, float] = defaultdict(float)
+    for helper, rate in analyzer.steady_calls.items():
+        by_upstream[EXTERNAL_HELPERS[helper]] += rate
+
+    for upstream, rate in sorted(by_upstream.items()):
+        budget = COST_BUDGETS.get(upstream)
+        if not budget:
+            continue
+        if rate > budget["reject"]:
+            analyzer.issues.append({"severity": "error", "line": None, "message":
+                f"{rate:.2f} {upstream} calls/min exceeds the budget of {budget['reject']}/min"})
+        elif rate > budget["warn"]:
+            analyzer.issues.append({"severity": "warning", "line": None, "message":
+                f"{rate:.2f} {upstream} calls/min is above the recommended {budget['warn']}/min"})
+
+    within_budget = not any(issue["severity"] == "error" for issue in analyzer.issues)
+    if within_budget:
+        print("✅ Runtime cost within budget")
+    else:
+        print(f"❌ Runtime cost over budget: {[i['message'] for i in analyzer.issues if i['severity'] == 'error']}")
+
+    return {
+        "calls_per_minute": {k: round(v, 4) for k, v in sorted(analyzer.steady_calls.items())},
+        "calls_per_minute_by_upstream": {k: round(v, 4) for k, v in sorted(by_upstream.items())},
+        "setup_calls": {k: round(v, 4) for k, v in sorted(analyzer.setup_calls.items())},
+        "schedules": analyzer.schedules,
+        "issues": analyzer.issues,
+        "within_budget": within_budget,
+    }
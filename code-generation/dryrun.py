@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Dry-run a generated agent locally before deployment.
+
+Runs the baselineFunction() under Node with stubbed wallet, market-data and
+transaction helpers and a virtual clock (see dryrun_harness.mjs), so a
+simulated day of the strategy runs in a few seconds of wall time. Reports
+time to first trade, external call counts and status transitions.
+
+The code is untrusted, so Node runs under its permission model: the agent may
+read only the harness and its temporary directory, write only the latter, and
+cannot spawn processes or workers. Its environment holds nothing but PATH.
+The permission model doesn't cover sockets, so the harness disables Node's
+networking modules, and Node runs in an empty network namespace where
+`unshare` allows it. The report comes back on stdout behind a per-run token
+the agent never sees, rather than through a file it could overwrite.
+
+Usage:
+    python dryrun.py agent.js --hours 24 --funded-after 120
+"""
+
+import argparse
+import json
+import os
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+HARNESS_PATH = Path(__file__).with_name("dryrun_harness.mjs")
+NODE_BINARY = os.getenv("NODE_BINARY", "node")
+# Wall-clock limit for one dry run; a strategy that loops without ever
+# awaiting a timer never yields to the virtual clock and is killed here
+DRY_RUN_TIMEOUT = float(os.getenv("DRY_RUN_TIMEOUT", "30"))
+
+
+@lru_cache(maxsize=None)
+def _permission_flag(node: str) -> Optional[str]:
+    """The flag enabling Node's permission model, or None if this Node lacks it."""
+    try:
+        version = subprocess.run([node, "--version"], capture_output=True, text=True, timeout=10).stdout
+        major, minor = (int(part) for part in version.strip().lstrip("v").split(".")[:2])
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+    if (major, minor) >= (22, 13):
+        return "--permission"
+    if major >= 20:
+        return "--experimental-permission"
+    return None
+
+
+@lru_cache(maxsize=None)
+def _network_namespace() -> List[str]:
+    """Command prefix running a process with no network interfaces, or [] where namespaces aren't available."""
+    unshare = shutil.which("unshare")
+    if not unshare:
+        return []
+    prefix = [unshare, "--net", "--map-root-user"]
+    try:
+        available = subprocess.run(prefix + ["true"], capture_output=True, timeout=10).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        available = False
+    if not available:
+        print("⚠️ Network namespaces unavailable; dry runs rely on the harness to block network access")
+        return []
+    return prefix
+
+
+def _sandboxed_command(node: str, flag: str, tmp: str, config: Dict[str, Any], agent_path: Path) -> List[str]:
+    """Node command line granting fs access to the harness and tmp dir only, without network."""
+    harness = os.path.realpath(HARNESS_PATH)
+    tmp = os.path.realpath(tmp)
+    return _network_namespace() + [
+        node,
+        flag,
+        f"--allow-fs-read={harness}",
+        f"--allow-fs-read={tmp}",
+        f"--allow-fs-write={tmp}",
+        harness,
+        json.dumps(config),
+        str(agent_path),
+    ]
+
+
+def dry_run(
+    code: str,
+    simulated_seconds: int = 86_400,
+    funded_after_seconds: int = 0,
+    prices: Optional[Dict[str, float]] = None,
+    volatility: float = 0.001,
+    seed: int = 42,
+    balance_watcher: bool = False,
+    timeout: float = DRY_RUN_TIMEOUT,
+) -> Dict[str, Any]:
+    """
+    Run a generated baselineFunction() under the virtual-clock harness.
+
+    Args:
+        code: The generated module source (must export baselineFunction)
+        simulated_seconds: How much virtual time to simulate
+        funded_after_seconds: Virtual time at which the wallet becomes funded
+        prices: Starting USD prices by symbol, overriding the defaults
+        volatility: Per-minute log-price volatility of the simulated market
+        seed: Seed for the simulated market
+        balance_watcher: Simulate BALANCE_WATCHER_URL being set, so the funding
+            loop wakes when the wallet is funded instead of on its next poll
+        timeout: Wall-clock limit in seconds
+
+    Returns:
+        Dict with success flag and the harness report
+    """
+    print("🧪 Starting dry run…")
+    node = shutil.which(NODE_BINARY)
+    if not node:
+        return {"success": False, "error": f"Node.js binary '{NODE_BINARY}' not found"}
+    flag = _permission_flag(node)
+    if not flag:
+        return {"success": False, "error": "Dry runs need Node.js 20 or later for its permission model"}
+
+    with tempfile.TemporaryDirectory(prefix="evm-dryrun-") as tmp:
+        agent_path = Path(tmp) / "agent.mjs"
+        report_token = secrets.token_hex(16)
+        agent_path.write_text(code)
+        config = {
+            "simulatedSeconds": simulated_seconds,
+            "fundedAfterSeconds": funded_after_seconds,
+            "prices": prices or {},
+            "volatility": volatility,
+            "seed": seed,
+            "balanceWatcher": balance_watcher,
+            "reportToken": report_token,
+        }
+
+        start = time.perf_counter()
+        try:
+            proc = subprocess.run(
+                _sandboxed_command(node, flag, tmp, config, agent_path),
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                cwd=tmp,
+                # Nothing from the service's environment (API keys) reaches the agent
+                env={"PATH": os.environ.get("PATH", os.defpath)},
+            )
+        except subprocess.TimeoutExpired:
+            print("❌ Dry run timed out")
+            return {
+                "success": False,
+                "error": f"Dry run exceeded {timeout:g}s of wall time; the strategy likely loops without awaiting a timer",
+            }
+        wall = time.perf_counter() - start
+
+        report_line = next(
+            (line for line in proc.stdout.splitlines() if line.startswith(report_token + " ")), None
+        )
+        if report_line is None:
+            lines = (proc.stderr or proc.stdout).strip().splitlines()
+            errors = [line for line in lines if "Error" in line]
+            print("❌ Dry run failed")
+            return {
+                "success": False,
+                "error": (errors or lines or [f"Harness exited with code {proc.returncode}"])[0].strip(),
+                "stderr": proc.stderr[-4000:],
+            }
+        report = json.loads(report_line[len(report_token) + 1:])
+
+    report["wall_seconds_total"] = wall
+    success = not report["fatal_error"]
+    if success:
+        print(f"✅ Dry run finished: {report['trades']} trades over {report['simulated_seconds'] / 3600:.1f}h simulated in {wall:.2f}s")
+    else:
+        print(f"❌ Dry run failed: {report['fatal_error']}")
+    return {"success": success, "report": report}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("code_file", help="File containing the generated baselineFunction() module")
+    parser.add_argument("--hours", type=float, default=24, help="Simulated hours (default: 24)")
+    parser.add_argument("--funded-after", type=int, default=0, help="Virtual seconds before the wallet is funded")
+    parser.add_argument("--price", action="append", default=[], metavar="SYMBOL=USD", help="Starting price override")
+    parser.add_argument("--volatility", type=float, default=0.001, help="Per-minute log-price volatility")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--balance-watcher", action="store_true", help="Simulate funded notifications from the balance watcher")
+    args = parser.parse_args()
+
+    prices = {}
+    for item in args.price:
+        symbol, value = item.split("=", 1)
+        prices[symbol.upper()] = float(value)
+
+    result = dry_run(
+        Path(args.code_file).read_text(),
+        simulated_seconds=int(args.hours * 3600),
+        funded_after_seconds=args.funded_after,
+        prices=prices,
+        volatility=args.volatility,
+        seed=args.seed,
+        balance_watcher=args.balance_watcher,
+    )
+    print(json.dumps(result, indent=2))
+    return 0 if result["success"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
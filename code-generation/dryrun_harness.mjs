@@ -0,0 +1,424 @@
+// Dry-run harness for generated agents (driven by dryrun.py).
+//
+// Runs a generated baselineFunction() against stubbed wallet, market-data and
+// transaction helpers under a virtual clock: setTimeout/setInterval/Date are
+// replaced so a simulated day of polling runs in a few seconds of wall time.
+//
+// Usage: node dryrun_harness.mjs '<config json>' /path/to/agent.mjs
+// Prints the report as one line, "<config.reportToken> <json>", on stdout.
+
+import { createRequire, syncBuiltinESMExports } from "module";
+import { pathToFileURL } from "url";
+
+const config = JSON.parse(process.argv[2]);
+const agentPath = process.argv[3];
+// The report goes to stdout behind this token, which the agent never sees, so
+// lines the agent prints can't pass for it
+const reportToken = config.reportToken;
+process.argv.length = 2;
+const stringify = JSON.stringify;
+const writeStdout = process.stdout.write.bind(process.stdout);
+
+// ======= No network =======
+// Node's permission model doesn't cover sockets, so the networking builtins
+// are disabled before the agent loads (dryrun.py also runs Node in an empty
+// network namespace where it can). Socket.prototype.connect is where every
+// TCP and TLS client connection ends up, including ones from kept references.
+const require = createRequire(import.meta.url);
+// stderr is a net.Socket when piped; create it while the constructor still works
+process.stderr;
+function networkDisabled() {
+  throw new Error("Network access is disabled in dry runs");
+}
+const net = require("net");
+const dgram = require("dgram");
+net.Socket.prototype.connect = networkDisabled;
+net.Server.prototype.listen = networkDisabled;
+for (const method of ["bind", "connect", "send"]) dgram.Socket.prototype[method] = networkDisabled;
+for (const name of ["net", "tls", "dgram", "http", "https", "http2", "dns", "dns/promises", "inspector"]) {
+  const builtin = require(name);
+  for (const key of Object.keys(builtin)) {
+    if (typeof builtin[key] !== "function") continue;
+    try {
+      builtin[key] = networkDisabled;
+    } catch {
+      // Read-only export
+    }
+  }
+}
+syncBuiltinESMExports();
+globalThis.fetch = async () => networkDisabled();
+
+// ======= Virtual clock =======
+const realSetImmediate = setImmediate;
+const RealDate = Date;
+const startTime = config.startTime ?? RealDate.UTC(2025, 0, 1);
+const endTime = startTime + config.simulatedSeconds * 1000;
+let now = startTime;
+
+const timers = new Map();
+let nextTimerId = 1;
+
+function schedule(fn, delay, args, repeat) {
+  const id = nextTimerId++;
+  const ms = Math.max(0, Number(delay) || 0);
+  timers.set(id, {
+    id,
+    at: now + ms,
+    seq: id,
+    fn,
+    args,
+    interval: repeat ? Math.max(ms, 1) : null,
+  });
+  return id;
+}
+
+globalThis.setTimeout = (fn, delay, ...args) => schedule(fn, delay, args, false);
+globalThis.setInterval = (fn, delay, ...args) => schedule(fn, delay, args, true);
+globalThis.clearTimeout = (id) => timers.delete(id);
+globalThis.clearInterval = (id) => timers.delete(id);
+
+class VirtualDate extends RealDate {
+  constructor(...args) {
+    if (args.length === 0) super(now);
+    else super(...args);
+  }
+  static now() {
+    return now;
+  }
+}
+globalThis.Date = VirtualDate;
+
+const elapsedSeconds = () => (now - startTime) / 1000;
+// Let every promise chain settle; stubs never do real I/O, so one macrotask turn drains them
+const settle = () => new Promise((resolve) => realSetImmediate(resolve));
+
+// ======= Simulated market =======
+const DEFAULT_PRICES = {
+  MATIC: 0.5, POL: 0.5, WMATIC: 0.5, BTC: 100000, WBTC: 100000, ETH: 3500, WETH: 3500,
+  USDC: 1, "USDC.E": 1, USDT: 1, DAI: 1,
+};
+const STABLES = new Set(["USDC", "USDC.E", "USDT", "DAI"]);
+const prices = { ...DEFAULT_PRICES, ...(config.prices || {}) };
+const volatility = config.volatility ?? 0.001;
+const TOKEN_ADDRESSES = {
+  POL: "0x0000000000000000000000000000000000000000",
+  MATIC: "0x0000000000000000000000000000000000000000",
+  USDC: "0x3c499c542cEF5E3811e1192ce70d8cC03d5c3359",
+  USDT: "0xc2132D05D31c914a87C6611C10748AEb04B58e8F",
+  DAI: "0x8f3Cf7ad23Cd3CaDbD9735AFf958023239c6A063",
+  WETH: "0x7ceB23fD6bC0adD59E62ac25578270cFf1b9f619",
+  WBTC: "0x1BFD67037B42Cf73acF2047067bd4F2C47D9BfD6",
+};
+const DECIMALS = { USDC: 6, USDT: 6, WBTC: 8 };
+
+function seededRandom(seed) {
+  let a = seed >>> 0;
+  return () => {
+    a = (a + 0x6d2b79f5) >>> 0;
+    let t = a;
+    t = Math.imul(t ^ (t >>> 15), t | 1);
+    t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+// One price per simulated minute, a seeded random walk per symbol
+const priceSeries = new Map();
+function priceAt(symbol, minute) {
+  const key = String(symbol).toUpperCase();
+  const base = prices[key] ?? 1;
+  if (STABLES.has(key)) return base;
+  if (!priceSeries.has(key)) {
+    let seed = config.seed ?? 42;
+    for (const ch of key) seed = (seed * 31 + ch.charCodeAt(0)) >>> 0;
+    const random = seededRandom(seed);
+    const minutes = Math.ceil(config.simulatedSeconds / 60) + 1441;
+    const series = new Float64Array(minutes);
+    let logPrice = Math.log(base);
+    for (let i = 0; i < minutes; i++) {
+      // Box-Muller normal step
+      const z = Math.sqrt(-2 * Math.log(random() || 1e-12)) * Math.cos(2 * Math.PI * random());
+      logPrice += volatility * z;
+      series[i] = Math.exp(logPrice);
+    }
+    priceSeries.set(key, series);
+  }
+  const series = priceSeries.get(key);
+  // Offset by a day so price_change_24h has history from the start
+  return series[Math.min(series.length - 1, Math.max(0, minute + 1440))];
+}
+const currentMinute = () => Math.floor(elapsedSeconds() / 60);
+const currentPrice = (symbol) => priceAt(symbol, currentMinute());
+const changePct = (symbol, minutes) =>
+  ((currentPrice(symbol) - priceAt(symbol, currentMinute() - minutes)) /
+    priceAt(symbol, currentMinute() - minutes)) * 100;
+
+const symbolForAddress = (address) =>
+  Object.keys(TOKEN_ADDRESSES).find(
+    (symbol) => TOKEN_ADDRESSES[symbol].toLowerCase() === String(address).toLowerCase()
+  ) ?? "UNKNOWN";
+
+// ======= Recorded activity =======
+const calls = {};
+const trades = [];
+const transitions = [];
+const logCounts = {};
+const recentLogs = [];
+const uncaught = [];
+
+function record(name) {
+  calls[name] = (calls[name] || 0) + 1;
+}
+
+// ======= Stubbed agent environment =======
+const wallet = {
+  id: "dryrun-wallet",
+  address: "0xD2E5000000000000000000000000000000000001",
+};
+const portfolio = { POL: config.polBalance ?? 100, USDC: config.usdcBalance ?? 100 };
+const fundedAt = (config.fundedAfterSeconds ?? 0);
+
+globalThis.POLYGON_CHAIN_ID = "137";
+globalThis.LIFI_API_BASE = "https://li.quest/v1";
+globalThis.ERC20_ABI = [];
+globalThis.ethers = {
+  Interface: class {
+    encodeFunctionData() {
+      return "0x";
+    }
+  },
+  parseUnits: (value, decimals = 18) => BigInt(Math.round(Number(value) * 10 ** decimals)),
+  formatUnits: (value, decimals = 18) => String(Number(value) / 10 ** decimals),
+};
+
+globalThis.currentStatus = {
+  phase: "initializing",
+  walletAddress: null,
+  polBalance: 0,
+  lastMessage: "Starting...",
+  nextStep: "Creating wallet",
+  trades: [],
+  error: null,
+  isRunning: false,
+};
+
+globalThis.log = (message, level = "info") => {
+  logCounts[level] = (logCounts[level] || 0) + 1;
+  recentLogs.push({ t: elapsedSeconds(), level, message: String(message) });
+  if (recentLogs.length > (config.maxLogs ?? 200)) recentLogs.shift();
+};
+
+globalThis.updateStatus = (newStatus) => {
+  const previous = globalThis.currentStatus.phase;
+  globalThis.currentStatus = { ...globalThis.currentStatus, ...newStatus };
+  if (newStatus.phase && newStatus.phase !== previous) {
+    transitions.push({ t: elapsedSeconds(), phase: newStatus.phase, lastMessage: newStatus.lastMessage ?? null });
+  }
+};
+
+globalThis.createWallet = async () => {
+  record("createWallet");
+  return { ...wallet };
+};
+
+globalThis.checkBalance = async (address, amount = 0.01) => {
+  record("checkBalance");
+  const funded = elapsedSeconds() >= fundedAt;
+  const polBalance = funded ? portfolio.POL : 0;
+  return {
+    success: polBalance >= amount,
+    polBalance,
+    message: funded ? `Target achieved: ${polBalance} POL` : "Wallet has no token balances",
+  };
+};
+
+// With a balance watcher configured the funding wait ends once the wallet is
+// funded (capped by the 10-minute fallback); without one it is a plain sleep
+const WATCHER_FALLBACK_MS = 10 * 60 * 1000;
+globalThis.waitForFunding = async (address, amount = 0.01, timeoutMs = 30000) => {
+  record("waitForFunding");
+  let delay = timeoutMs;
+  if (config.balanceWatcher) {
+    const untilFunded = startTime + fundedAt * 1000 - now;
+    delay = untilFunded > 0 ? Math.min(untilFunded, Math.max(timeoutMs, WATCHER_FALLBACK_MS)) : Math.min(timeoutMs, 5000);
+  }
+  await new Promise((resolve) => setTimeout(resolve, delay));
+  return Boolean(config.balanceWatcher) && elapsedSeconds() >= fundedAt;
+};
+
+globalThis.getBalances = async (address) => {
+  record("getBalances");
+  if (elapsedSeconds() < fundedAt) return [];
+  return Object.entries(portfolio).map(([symbol, balance]) => ({
+    chain: "polygon-mainnet",
+    address,
+    balance: String(balance),
+    denominatedBalance: String(Math.round(balance * 10 ** (DECIMALS[symbol] ?? 18))),
+    decimals: DECIMALS[symbol] ?? 18,
+    type: symbol === "POL" ? "native" : "fungible",
+    tokenAddress: TOKEN_ADDRESSES[symbol],
+    symbol,
+    name: symbol,
+    logoURI: null,
+    priceUSD: currentPrice(symbol),
+  }));
+};
+
+globalThis.getTokenMarketData = async (symbol) => {
+  record("getTokenMarketData");
+  const key = String(symbol).toUpperCase();
+  return {
+    id: 1,
+    name: key,
+    symbol: key,
+    decimals: DECIMALS[key] ?? 18,
+    price: currentPrice(key),
+    price_change_1h: changePct(key, 60),
+    price_change_24h: changePct(key, 1440),
+    volume: 1_000_000,
+    liquidity: 10_000_000,
+    market_cap: 1_000_000_000,
+    contracts: [
+      {
+        address: TOKEN_ADDRESSES[key] ?? "0x0000000000000000000000000000000000000001",
+        blockchainId: "137",
+        blockchain: "Polygon",
+        decimals: DECIMALS[key] ?? 18,
+      },
+    ],
+  };
+};
+
+globalThis.getTokenInfo = async (token) => {
+  record("getTokenInfo");
+  const symbol = String(token).startsWith("0x") ? symbolForAddress(token) : String(token).toUpperCase();
+  return {
+    address: TOKEN_ADDRESSES[symbol] ?? token,
+    chainId: 137,
+    symbol,
+    decimals: DECIMALS[symbol] ?? 18,
+    name: symbol,
+    coinKey: symbol,
+    priceUSD: String(currentPrice(symbol)),
+  };
+};
+
+globalThis.getTokenDecimals = (chainId, token) => {
+  const symbol = String(token).startsWith("0x") ? symbolForAddress(token) : String(token).toUpperCase();
+  return DECIMALS[symbol] ?? 18;
+};
+globalThis.toWei = (amount, decimals) => (parseFloat(amount) * Math.pow(10, decimals)).toString();
+globalThis.fromWei = (raw, decimals) => (parseFloat(raw) / Math.pow(10, decimals)).toString();
+globalThis.weiToHex = (wei) => "0x" + BigInt(Math.floor(Number(wei))).toString(16);
+
+globalThis.swap = async (fromToken, toToken, fromAddress, fromAmount) => {
+  record("swap");
+  const fromSymbol = symbolForAddress(fromToken);
+  const toSymbol = symbolForAddress(toToken);
+  const amount = Number(fromAmount);
+  if (!Number.isFinite(amount) || amount <= 0) {
+    throw new Error(`Swap quote failed: invalid amount ${fromAmount}`);
+  }
+  const fromUSD = amount * currentPrice(fromSymbol);
+  const toAmount = (fromUSD * 0.997) / currentPrice(toSymbol);
+  return {
+    transactionRequest: {
+      to: "0x1231DEB6f5749EF6cE6943a275A1D3E7486F4EaE",
+      data: "0x",
+      value: fromSymbol === "POL" ? globalThis.weiToHex(amount * 1e18) : "0x0",
+      from: fromAddress,
+      chainId: 137,
+      gasPrice: "0x0",
+      gasLimit: "0x0",
+    },
+    estimate: {
+      tool: "dryrun",
+      approvalAddress: "0x1231DEB6f5749EF6cE6943a275A1D3E7486F4EaE",
+      fromAmount: String(amount),
+      toAmount: String(toAmount),
+      toAmountMin: String(toAmount * 0.99),
+      fromAmountUSD: String(fromUSD),
+      toAmountUSD: String(fromUSD * 0.997),
+    },
+    dryrun: { fromSymbol, toSymbol, amount, toAmount },
+  };
+};
+
+globalThis.sendTransaction = async (transaction) => {
+  record("sendTransaction");
+  const request = transaction?.transactionRequest ?? transaction;
+  const hash = "0x" + (trades.length + 1).toString(16).padStart(64, "0");
+  trades.push({ t: elapsedSeconds(), to: request?.to ?? null, value: request?.value ?? null, hash });
+  return { hash, caip2: "eip155:137" };
+};
+
+process.on("unhandledRejection", (error) => {
+  uncaught.push({ t: elapsedSeconds(), error: String(error?.message ?? error) });
+});
+
+// ======= Run =======
+const wallStart = performance.now();
+const maxSteps = config.maxSteps ?? 500_000;
+let steps = 0;
+let fatal = null;
+let finished = false;
+
+const agent = await import(pathToFileURL(agentPath).href);
+if (typeof agent.baselineFunction !== "function") {
+  fatal = "Module does not export baselineFunction";
+} else {
+  agent
+    .baselineFunction(config.ownerAddress ?? "0x0000000000000000000000000000000000000abc")
+    .then(() => (finished = true))
+    .catch((error) => (fatal = String(error?.message ?? error)));
+}
+await settle();
+
+while (!fatal && steps < maxSteps) {
+  let next = null;
+  for (const timer of timers.values()) {
+    if (!next || timer.at < next.at || (timer.at === next.at && timer.seq < next.seq)) next = timer;
+  }
+  if (!next || next.at > endTime) break;
+
+  now = next.at;
+  if (next.interval) {
+    next.at += next.interval;
+    next.seq = nextTimerId++;
+  } else {
+    timers.delete(next.id);
+  }
+  try {
+    const result = next.fn(...next.args);
+    if (result && typeof result.catch === "function") {
+      result.catch((error) => uncaught.push({ t: elapsedSeconds(), error: String(error?.message ?? error) }));
+    }
+  } catch (error) {
+    uncaught.push({ t: elapsedSeconds(), error: String(error?.message ?? error) });
+  }
+  steps++;
+  await settle();
+}
+if (!fatal && steps < maxSteps) now = Math.max(now, endTime);
+
+const report = {
+  simulated_seconds: elapsedSeconds(),
+  wall_seconds: (performance.now() - wallStart) / 1000,
+  timer_steps: steps,
+  step_limit_hit: steps >= maxSteps,
+  pending_timers: timers.size,
+  time_to_first_trade_s: trades.length ? trades[0].t : null,
+  trades: trades.length,
+  trade_log: trades.slice(0, 100),
+  calls,
+  status_transitions: transitions.slice(0, 200),
+  final_status: globalThis.currentStatus,
+  log_counts: logCounts,
+  recent_logs: recentLogs.slice(-50),
+  uncaught_errors: uncaught.slice(0, 50),
+  fatal_error: fatal,
+  returned: finished,
+};
+
+writeStdout(`${reportToken} ${stringify(report)}\n`, () => process.exit(0));
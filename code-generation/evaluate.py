@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Offline regression harness for the code-generation pipeline.
+
+Replays a corpus of recorded prompts and model responses through the same
+parsing, validation and cost-analysis stages `coder.code()` runs, spread across a process
+pool, and reports pass rate, guardrail rate and per-stage timings. Use it to
+gate edits to CODER_PROMPT or variables.py.
+
+Corpus files are JSONL, one case per line. `mode` is optional ("full", "strategy" or "edit"):
+    {"id": "dca-pol", "prompt": "Buy 2 DAI using POL...", "response": "```json\\n{...}\\n```", "mode": "full"}
+
+Edit cases replay an edit-mode response against the code it revised, as in coder.edit():
+    {"id": "dca-hourly", "mode": "edit", "previous_code": "...", "prompt": "Run hourly", "response": "{\\"edits\\": [...]}"}
+
+Regression cases can pin their outcome with `expect`: "pass", or the stage they
+must fail at (e.g. "deployment"), and the strategy spec they carry with
+`expect_spec`: "valid", "invalid" or "missing". Any case that doesn't meet its
+expectations fails the run, whatever the pass rate.
+
+Usage:
+    python evaluate.py eval_corpus/
+    python evaluate.py eval_corpus/ --workers 8 --json report.json --min-pass-rate 0.9
+    python evaluate.py --record prompts.txt --out eval_corpus/recorded.jsonl
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import string
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+import variables
+from cost import analyze_cost
+from patching import apply_edits
+from validation import (
+    syntax_check,
+    lint_check,
+    parse_model_output,
+    parse_strategy_output,
+    validate_code_output,
+    validate_deployment_compatibility,
+    validate_strategy_spec,
+)
+
+# Templates coder.py formats, and the variables it passes to each
+TEMPLATES = {
+    "CODER_PROMPT": [
+        "TRANSACTIONS_CODE",
+        "TRANSACTIONS_USAGE",
+        "BASELINE_JS",
+        "HELPER_FUNCTIONS",
+        "STATUS_FORMAT",
+        "OUTPUT_RULE",
+        "OUTPUT_FORMAT",
+        "SPEC_FORMAT",
+    ],
+    "EDITOR_PROMPT": [
+        "HELPER_FUNCTIONS",
+        "TRANSACTIONS_USAGE",
+    ],
+}
+
+# Placeholders filled from differently named variables, one per output mode
+FILLED_BY = {
+    "OUTPUT_RULE": ["FULL_OUTPUT_RULE", "STRATEGY_OUTPUT_RULE"],
+    "OUTPUT_FORMAT": ["FULL_OUTPUT_FORMAT", "STRATEGY_OUTPUT_FORMAT"],
+    "SPEC_FORMAT": ["SPEC_OUTPUT_FORMAT"],
+}
+
+STAGES = ["parse", "patch", "structure", "syntax", "lint", "deployment", "cost"]
+
+
+def check_template() -> List[str]:
+    """
+    Return template problems that would make coder.py raise before the model
+    is ever called (unknown placeholders, missing variables).
+    """
+    problems = []
+    for template_name, names in TEMPLATES.items():
+        template = getattr(variables, template_name, None)
+        if template is None:
+            problems.append(f"variables.py does not define {template_name}")
+            continue
+        try:
+            fields = {
+                field for _, field, _, _ in string.Formatter().parse(template)
+                if field is not None
+            }
+        except ValueError as e:
+            problems.append(f"{template_name} is not a valid template: {e}")
+            continue
+
+        for field in sorted(fields - set(names)):
+            problems.append(f"Unknown placeholder {{{field}}} in {template_name} (escape literal braces as {{{{ }}}})")
+        for name in names:
+            for source in FILLED_BY.get(name, [name]):
+                if not hasattr(variables, source):
+                    problems.append(f"variables.py does not define {source}")
+    return problems
+
+
+def load_corpus(paths: List[str]) -> List[Dict[str, Any]]:
+    """Load cases from JSONL files or directories of JSONL files."""
+    files = []
+    for p in paths:
+        path = Path(p)
+        files.extend(sorted(path.glob("*.jsonl")) if path.is_dir() else [path])
+
+    cases = []
+    for file in files:
+        with open(file) as f:
+            for lineno, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                case = json.loads(line)
+                if "response" not in case:
+                    raise ValueError(f"{file}:{lineno}: case has no 'response'")
+                case.setdefault("id", f"{file.stem}:{lineno}")
+                cases.append(case)
+    return cases
+
+
+def evaluate_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one recorded response through the validation stages, and check its `expect` and `expect_spec`."""
+    result = _run_stages(case)
+    expect = case.get("expect")
+    result["expect"] = expect
+    if expect is not None:
+        result["as_expected"] = result["passed"] if expect == "pass" else result["failed_stage"] == expect
+    expect_spec = case.get("expect_spec")
+    if expect_spec is not None:
+        result["expect_spec"] = expect_spec
+        result["as_expected"] = result.get("as_expected", True) and result["spec"] == expect_spec
+    return result
+
+
+def _run_stages(case: Dict[str, Any]) -> Dict[str, Any]:
+    result = {
+        "id": case["id"],
+        "passed": False,
+        "guardrail": False,
+        "failed_stage": None,
+        "error": None,
+        "spec": "missing",
+        "timings": {},
+    }
+
+    def timed(stage, fn, *args):
+        start = time.perf_counter()
+        value = fn(*args)
+        result["timings"][stage] = time.perf_counter() - start
+        return value
+
+    # The validators are chatty; keep worker output out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        if case.get("mode") == "edit":
+            # Edit responses are patches applied to the previous code, as in coder.edit()
+            patch = timed("parse", parse_model_output, case["response"], ("edits",))
+            if not patch:
+                result.update(failed_stage="parse", error="Failed to parse model output")
+                return result
+            patched, reason = timed("patch", apply_edits, case.get("previous_code", ""), patch["edits"])
+            if patched is None:
+                result.update(failed_stage="patch", error=reason)
+                return result
+            parsed = {"code": patched}
+        else:
+            # Strategy-mode responses are spliced into the baseline skeleton, as in coder.code()
+            parse = parse_strategy_output if case.get("mode") == "strategy" else parse_model_output
+            parsed = timed("parse", parse, case["response"])
+            if not parsed:
+                result.update(failed_stage="parse", error="Failed to parse model output")
+                return result
+
+        is_valid, message = timed("structure", validate_code_output, parsed)
+        if not is_valid:
+            result.update(failed_stage="structure", error=message)
+            return result
+
+        # A missing or invalid spec doesn't fail the case; coder.code() just omits it
+        if "spec" in parsed:
+            result["spec"] = "valid" if validate_strategy_spec(parsed["spec"])[0] else "invalid"
+
+        code_str = parsed["code"]
+        syntax_err = timed("syntax", syntax_check, code_str)
+        lint_err = timed("lint", lint_check, code_str)
+        # coder.code() hands these to the guardrail model, which we can't replay offline
+        result["guardrail"] = bool(syntax_err or lint_err)
+        result["syntax_error"] = syntax_err
+        result["lint_error"] = lint_err
+
+        is_valid, message = timed("deployment", validate_deployment_compatibility, code_str)
+        if not is_valid:
+            result.update(failed_stage="deployment", error=message)
+            return result
+
+        cost_report = timed("cost", analyze_cost, code_str)
+        result["calls_per_minute"] = cost_report["calls_per_minute_by_upstream"]
+        if not cost_report["within_budget"]:
+            errors = [i["message"] for i in cost_report["issues"] if i["severity"] == "error"]
+            result.update(failed_stage="cost", error="; ".join(errors))
+            return result
+
+    result["passed"] = True
+    return result
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(cases: List[Dict[str, Any]], workers: int) -> Dict[str, Any]:
+    """Evaluate all cases across a process pool and build the report."""
+    start = time.perf_counter()
+    if workers > 1 and len(cases) > 1:
+        chunksize = max(1, len(cases) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(evaluate_case, cases, chunksize=chunksize))
+    else:
+        results = [evaluate_case(case) for case in cases]
+    wall = time.perf_counter() - start
+
+    total = len(results)
+    passed = sum(r["passed"] for r in results)
+    guardrail = sum(r["guardrail"] for r in results)
+    specs = {state: sum(r["spec"] == state for r in results) for state in ("valid", "invalid", "missing")}
+    unexpected = [r["id"] for r in results if r.get("as_expected") is False]
+    failures: Dict[str, int] = {}
+    for r in results:
+        if r["failed_stage"]:
+            failures[r["failed_stage"]] = failures.get(r["failed_stage"], 0) + 1
+
+    stage_times = {}
+    for stage in STAGES:
+        samples = [r["timings"][stage] for r in results if stage in r["timings"]]
+        stage_times[stage] = {
+            "count": len(samples),
+            "total_s": sum(samples),
+            "mean_ms": 1000 * sum(samples) / len(samples) if samples else 0.0,
+            "p95_ms": 1000 * _percentile(samples, 95),
+        }
+
+    return {
+        "cases": total,
+        "workers": workers,
+        "wall_s": wall,
+        "template_problems": check_template(),
+        "pass_rate": passed / total if total else 0.0,
+        "guardrail_rate": guardrail / total if total else 0.0,
+        "failures_by_stage": failures,
+        "unexpected": unexpected,
+        "specs": specs,
+        "stage_times": stage_times,
+        "results": results,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    total = report["cases"]
+    print(f"📊 Evaluated {total} cases on {report['workers']} workers in {report['wall_s']:.2f}s")
+
+    if report["template_problems"]:
+        print("❌ Template problems:")
+        for problem in report["template_problems"]:
+            print(f"   - {problem}")
+    else:
+        print("✅ Prompt templates format cleanly")
+
+    passed = round(report["pass_rate"] * total)
+    guardrail = round(report["guardrail_rate"] * total)
+    print(f"   Pass rate:      {report['pass_rate']:.1%} ({passed}/{total})")
+    print(f"   Guardrail rate: {report['guardrail_rate']:.1%} ({guardrail}/{total})")
+    specs = report["specs"]
+    print(f"   Specs:          {specs['valid']} valid, {specs['invalid']} invalid, {specs['missing']} missing")
+
+    if report["failures_by_stage"]:
+        print("   Failures by stage:")
+        for stage, count in report["failures_by_stage"].items():
+            print(f"     {stage:<11} {count}")
+
+    print("   Stage timings:")
+    for stage, t in report["stage_times"].items():
+        print(f"     {stage:<11} n={t['count']:<6} total={t['total_s']:.3f}s "
+              f"mean={t['mean_ms']:.2f}ms p95={t['p95_ms']:.2f}ms")
+
+    for r in report["results"]:
+        if not r["passed"]:
+            print(f"   ❌ {r['id']}: [{r['failed_stage']}] {r['error']}")
+
+    if report["unexpected"]:
+        print("❌ Cases not meeting their expectation:")
+        for r in report["results"]:
+            if r.get("as_expected") is False:
+                outcome = "passed" if r["passed"] else f"failed at {r['failed_stage']}"
+                expected = r["expect"] or "any outcome"
+                if r.get("expect_spec"):
+                    expected += f" with a {r['expect_spec']} spec"
+                print(f"   - {r['id']}: expected {expected}, {outcome} with a {r['spec']} spec")
+
+
+def record(prompts_file: str, out_file: str, mode: str = "full") -> None:
+    """Call the live coder model for each prompt and append the responses as fixtures."""
+    # Imported lazily: coder needs OPENAI_API_KEY, replaying a corpus does not
+    from coder import generate
+
+    with open(prompts_file) as f:
+        prompts = [line.strip() for line in f if line.strip()]
+
+    with open(out_file, "a") as out:
+        for i, prompt in enumerate(prompts, 1):
+            print(f"🎙️  Recording {i}/{len(prompts)}: {prompt[:80]}")
+            response = generate(prompt, mode)
+            out.write(json.dumps({
+                "id": f"{Path(out_file).stem}-{i}",
+                "prompt": prompt,
+                "response": response,
+                "mode": mode,
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+            }) + "\n")
+    print(f"✅ Recorded {len(prompts)} responses to {out_file}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="*", default=["eval_corpus"], help="JSONL files or directories")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Process pool size (default: all cores)")
+    parser.add_argument("--json", dest="json_out", help="Write the full report to this file")
+    parser.add_argument("--min-pass-rate", type=float, default=None, help="Exit non-zero below this pass rate")
+    parser.add_argument("--max-guardrail-rate", type=float, default=None, help="Exit non-zero above this guardrail rate")
+    parser.add_argument("--record", metavar="PROMPTS", help="Record live responses for the prompts in this file")
+    parser.add_argument("--out", default="eval_corpus/recorded.jsonl", help="Fixture file for --record")
+    parser.add_argument("--mode", choices=["full", "strategy"], default="full", help="Output mode for --record")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, args.out, args.mode)
+        return 0
+
+    cases = load_corpus(args.corpus)
+    if not cases:
+        print("❌ No cases found")
+        return 1
+
+    report = run(cases, args.workers)
+    print_report(report)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = bool(report["template_problems"] or report["unexpected"])
+    if args.min_pass_rate is not None and report["pass_rate"] < args.min_pass_rate:
+        print(f"❌ Pass rate below {args.min_pass_rate:.1%}")
+        failed = True
+    if args.max_guardrail_rate is not None and report["guardrail_rate"] > args.max_guardrail_rate:
+        print(f"❌ Guardrail rate above {args.max_guardrail_rate:.1%}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+"""
+Batched ingestion of agent log and status events.
+
+Deployed agents used to rewrite their whole logs.json on every log line and
+broadcast every status change on its own. With EVENT_INGEST_URL set,
+baseline/logging.js buffers events and POSTs them here in gzip-compressed
+NDJSON batches instead.
+
+Each agent's events live in their own directory:
+
+- seg-NNNNNN.gz: append-only segments, one gzip member per batch
+- index.ndjson: one line per batch (segment, offset, length, seq and time range)
+- status.json: the agent's latest status event
+
+Appending a batch writes one gzip member and one index line, so ingestion
+cost per event doesn't grow with history. Queries read the index (cached
+per worker and read incrementally) and decompress only the batches they
+need. A per-agent file lock serializes writers across API workers.
+"""
+
+import fcntl
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+
+from auth import check_api_key, require_api_key
+
+logger = logging.getLogger(__name__)
+
+EVENTS_DIR = os.getenv("EVENTS_DIR", os.path.join(tempfile.gettempdir(), "evm-agents-events"))
+# A new segment is started once the current one reaches this size
+EVENT_SEGMENT_BYTES = int(os.getenv("EVENT_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+# Oldest segments beyond this many per agent are deleted (0 keeps everything)
+EVENT_MAX_SEGMENTS = int(os.getenv("EVENT_MAX_SEGMENTS", "64"))
+# Limits on one batch, compressed and decompressed
+EVENT_MAX_BATCH_BYTES = int(os.getenv("EVENT_MAX_BATCH_BYTES", str(1024 * 1024)))
+EVENT_MAX_BATCH_EVENTS = int(os.getenv("EVENT_MAX_BATCH_EVENTS", "5000"))
+# Master key for ingestion. Each agent sends its own derived key (agent_ingest_key)
+# as x-api-key, so one agent's key can't write another's events. Unset leaves
+# ingestion open (development mode)
+EVENT_INGEST_KEY = os.getenv("EVENT_INGEST_KEY")
+
+_AGENT_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def agent_ingest_key(agent_id: str, master: Optional[str] = None) -> str:
+    """The x-api-key agent `agent_id` ingests with: hex HMAC-SHA256 of its id under the master key."""
+    return hmac.new((master or EVENT_INGEST_KEY or "").encode(), agent_id.encode(), hashlib.sha256).hexdigest()
+
+
+def _parse_ts(value: Any) -> Optional[float]:
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class _Index:
+    """One agent's batch index, read incrementally from index.ndjson."""
+
+    def __init__(self):
+        self.entries: List[Dict[str, Any]] = []
+        self.offset = 0
+        self.inode: Optional[int] = None
+
+
+class EventStore:
+    def __init__(self, root: str = EVENTS_DIR, segment_bytes: int = EVENT_SEGMENT_BYTES,
+                 max_segments: int = EVENT_MAX_SEGMENTS):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self._indexes: Dict[str, _Index] = {}
+        # Queries and appends run in the threadpool and share the cached indexes
+        self._lock = threading.Lock()
+
+    def _dir(self, agent_id: str) -> str:
+        if not _AGENT_ID.match(agent_id):
+            raise ValueError(f"Invalid agent id: {agent_id}")
+        return os.path.join(self.root, agent_id)
+
+    def _segment_path(self, agent_dir: str, segment: int) -> str:
+        return os.path.join(agent_dir, f"seg-{segment:06d}.gz")
+
+    @contextmanager
+    def _locked(self, agent_dir: str) -> Iterator[None]:
+        os.makedirs(agent_dir, exist_ok=True)
+        with open(os.path.join(agent_dir, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _index(self, agent_id: str) -> _Index:
+        """Return the agent's index, reading any lines appended since the last call."""
+        path = os.path.join(self._dir(agent_id), "index.ndjson")
+        with self._lock:
+            return self._refresh(self._indexes.setdefault(agent_id, _Index()), path)
+
+    def _refresh(self, index: _Index, path: str) -> _Index:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            index.__init__()
+            return index
+        # Retention rewrites the file; start over when it is replaced
+        if stat.st_ino != index.inode or stat.st_size < index.offset:
+            index.__init__()
+            index.inode = stat.st_ino
+        if stat.st_size > index.offset:
+            with open(path, "rb") as f:
+                f.seek(index.offset)
+                data = f.read()
+            # Only consume complete lines; a writer may be mid-append
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                index.entries.append(json.loads(line))
+            index.offset += end
+        return index
+
+    def append(self, agent_id: str, events: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Store one batch, assigning each event the agent's next sequence number."""
+        agent_dir = self._dir(agent_id)
+        with self._locked(agent_dir):
+            entries = self._index(agent_id).entries
+            last = entries[-1] if entries else None
+            seq = last["seq"] + last["n"] if last else 0
+            segment = last["seg"] if last else 0
+
+            now = time.time()
+            times = []
+            status = None
+            for i, event in enumerate(events):
+                event["seq"] = seq + i
+                ts = _parse_ts(event.get("timestamp"))
+                if ts is None:
+                    ts = now
+                    event["timestamp"] = datetime.fromtimestamp(now, timezone.utc).isoformat()
+                times.append(ts)
+                if event.get("type") == "status":
+                    status = event
+
+            payload = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in events).encode()
+            member = gzip.compress(payload, compresslevel=6)
+            path = self._segment_path(agent_dir, segment)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            rolled = size > 0 and size + len(member) > self.segment_bytes
+            if rolled:
+                segment += 1
+                path = self._segment_path(agent_dir, segment)
+                size = 0
+            with open(path, "ab") as f:
+                f.write(member)
+
+            entry = {"seg": segment, "off": size, "len": len(member), "seq": seq, "n": len(events),
+                     "t0": min(times), "t1": max(times)}
+            with open(os.path.join(agent_dir, "index.ndjson"), "a") as f:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+            if status is not None:
+                tmp = os.path.join(agent_dir, "status.json.tmp")
+                with open(tmp, "w") as f:
+                    json.dump(status, f)
+                os.replace(tmp, os.path.join(agent_dir, "status.json"))
+            if rolled:
+                self._apply_retention(agent_id, agent_dir, segment)
+        return {"first_seq": seq, "last_seq": seq + len(events) - 1}
+
+    def _apply_retention(self, agent_id: str, agent_dir: str, current: int) -> None:
+        """Drop segments older than the newest `max_segments`. Runs only when a segment rolls."""
+        if self.max_segments <= 0 or current < self.max_segments:
+            return
+        keep_from = current - self.max_segments + 1
+        entries = [e for e in self._index(agent_id).entries if e["seg"] >= keep_from]
+        tmp = os.path.join(agent_dir, "index.ndjson.tmp")
+        with open(tmp, "w") as f:
+            f.writelines(json.dumps(e, separators=(",", ":")) + "\n" for e in entries)
+        os.replace(tmp, os.path.join(agent_dir, "index.ndjson"))
+        for name in os.listdir(agent_dir):
+            if name.startswith("seg-") and int(name[4:10]) < keep_from:
+                os.remove(os.path.join(agent_dir, name))
+        logger.info(f"🧹 Dropped {agent_id} event segments before {keep_from}")
+
+    def _read_batch(self, agent_dir: str, entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        try:
+            with open(self._segment_path(agent_dir, entry["seg"]), "rb") as f:
+                f.seek(entry["off"])
+                data = f.read(entry["len"])
+        except FileNotFoundError:
+            # Removed by retention after the index was read
+            return []
+        return [json.loads(line) for line in gzip.decompress(data).splitlines()]
+
+    def query(self, agent_id: str, limit: int = 100, after: Optional[int] = None,
+              since: Optional[float] = None, until: Optional[float] = None,
+              types: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Read events in sequence order.
+
+        With `after`, `since` or `until`, returns the first `limit` matching
+        events from that point on. Otherwise returns the last `limit` events.
+        """
+        agent_dir = self._dir(agent_id)
+        entries = self._index(agent_id).entries
+        last_seq = entries[-1]["seq"] + entries[-1]["n"] - 1 if entries else None
+
+        def matches(event: Dict[str, Any]) -> bool:
+            if after is not None and event["seq"] <= after:
+                return False
+            if types and event.get("type") not in types:
+                return False
+            if since is not None or until is not None:
+                ts = _parse_ts(event.get("timestamp"))
+                if ts is None or (since is not None and ts < since) or (until is not None and ts > until):
+                    return False
+            return True
+
+        events: List[Dict[str, Any]] = []
+        if after is None and since is None and until is None:
+            # Tail: walk batches newest first until enough events are found
+            for entry in reversed(entries):
+                batch = [e for e in self._read_batch(agent_dir, entry) if matches(e)]
+                events[:0] = batch
+                if len(events) >= limit:
+                    break
+            events = events[-limit:]
+        else:
+            for entry in entries:
+                if after is not None and entry["seq"] + entry["n"] - 1 <= after:
+                    continue
+                if (since is not None and entry["t1"] < since) or (until is not None and entry["t0"] > until):
+                    continue
+                events.extend(e for e in self._read_batch(agent_dir, entry) if matches(e))
+                if len(events) >= limit:
+                    break
+            events = events[:limit]
+        return {"agent_id": agent_id, "events": events, "last_seq": last_seq}
+
+    def status(self, agent_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self._dir(agent_id), "status.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+store = EventStore()
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+
+async def _read_body(request: Request, content_length: Optional[str]) -> bytes:
+    """Read the request body, refusing it once it exceeds EVENT_MAX_BATCH_BYTES."""
+    too_large = HTTPException(status_code=413, detail=f"Batch larger than {EVENT_MAX_BATCH_BYTES} bytes")
+    if content_length is not None:
+        try:
+            declared = int(content_length)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length")
+        if declared > EVENT_MAX_BATCH_BYTES:
+            raise too_large
+    # Chunked bodies carry no length; count as they arrive
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > EVENT_MAX_BATCH_BYTES:
+            raise too_large
+    return bytes(body)
+
+
+def _decode_batch(body: bytes, encoding: Optional[str]) -> List[Dict[str, Any]]:
+    """Decompress and parse an NDJSON batch, bounding its decompressed size."""
+    if len(body) > EVENT_MAX_BATCH_BYTES:
+        raise HTTPException(status_code=413, detail=f"Batch larger than {EVENT_MAX_BATCH_BYTES} bytes")
+    if encoding == "gzip":
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            body = decompressor.decompress(body, 16 * EVENT_MAX_BATCH_BYTES)
+        except zlib.error:
+            raise HTTPException(status_code=400, detail="Invalid gzip body")
+        if decompressor.unconsumed_tail:
+            raise HTTPException(status_code=413, detail="Decompressed batch too large")
+    elif encoding not in (None, "", "identity"):
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {encoding}")
+
+    events = []
+    for number, line in enumerate(body.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Line {number} is not valid JSON")
+        if not isinstance(event, dict):
+            raise HTTPException(status_code=400, detail=f"Line {number} is not a JSON object")
+        event.setdefault("type", "log")
+        events.append(event)
+    if len(events) > EVENT_MAX_BATCH_EVENTS:
+        raise HTTPException(status_code=413, detail=f"More than {EVENT_MAX_BATCH_EVENTS} events in one batch")
+    return events
+
+
+def _since(value: Optional[str], name: str) -> Optional[float]:
+    if value is None:
+        return None
+    ts = _parse_ts(value)
+    if ts is None:
+        raise HTTPException(status_code=400, detail=f"'{name}' must be an ISO-8601 timestamp")
+    return ts
+
+
+@router.post("/{agent_id}", summary="Ingest a batch of agent events")
+async def ingest(
+    agent_id: str,
+    request: Request,
+    content_encoding: Optional[str] = Header(None),
+    content_length: Optional[str] = Header(None),
+    x_api_key: Optional[str] = Header(None),
+):
+    """Append an NDJSON batch (optionally gzip-compressed) to the agent's event log."""
+    if not _AGENT_ID.match(agent_id):
+        raise HTTPException(status_code=400, detail="Invalid agent id")
+    if EVENT_INGEST_KEY:
+        check_api_key(x_api_key, agent_ingest_key(agent_id))
+    events = _decode_batch(await _read_body(request, content_length), content_encoding)
+    if not events:
+        return {"accepted": 0}
+    result = await run_in_threadpool(store.append, agent_id, events)
+    return {"accepted": len(events), **result}
+
+
+@router.get("/{agent_id}", summary="Tail or range query of an agent's events", dependencies=[Depends(require_api_key)])
+async def get_events(
+    agent_id: str,
+    limit: int = Query(100, ge=1, le=5000),
+    after: Optional[int] = Query(None, description="Only events with a higher sequence number"),
+    since: Optional[str] = Query(None, description="ISO-8601 start time"),
+    until: Optional[str] = Query(None, description="ISO-8601 end time"),
+    type: Optional[List[str]] = Query(None, description="Event types to include, e.g. log or status"),
+):
+    """Latest events by default; pass `after` to follow new events, or `since`/`until` for a time range."""
+    if not _AGENT_ID.match(agent_id):
+        raise HTTPException(status_code=400, detail="Invalid agent id")
+    return await run_in_threadpool(
+        store.query, agent_id, limit, after, _since(since, "since"), _since(until, "until"), type
+    )
+
+
+@router.get("/{agent_id}/status", summary="An agent's latest status", dependencies=[Depends(require_api_key)])
+async def get_agent_status(agent_id: str):
+    if not _AGENT_ID.match(agent_id):
+        raise HTTPException(status_code=400, detail="Invalid agent id")
+    status = await run_in_threadpool(store.status, agent_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="No status recorded for this agent")
+    return status
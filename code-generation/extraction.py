@@ -0,0 +1,190 @@
+import json
+import re
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Backslash escapes JSON accepts; anything else (`\d` in a JS regex, `\$` in a
+# template literal) makes json.loads fail and is repaired by doubling the backslash.
+_INVALID_ESCAPE = re.compile(r'(?<!\\)((?:\\\\)*)\\(?=[^"\\/bfnrtu])')
+_BASELINE_SIGNATURE = re.compile(r'export\s+async\s+function\s+baselineFunction\s*\(')
+
+
+def _loads(candidate: str) -> Tuple[Optional[Any], Optional[str]]:
+    """
+    json.loads with repairs for common model mistakes. strict=False accepts raw
+    newlines and tabs inside strings, which models emit in the `code` field.
+    """
+    try:
+        return json.loads(candidate, strict=False), None
+    except json.JSONDecodeError:
+        pass
+    repaired = _INVALID_ESCAPE.sub(r'\1\\\\', candidate)
+    try:
+        return json.loads(repaired, strict=False), "repaired_escapes"
+    except json.JSONDecodeError:
+        return None, None
+
+
+class StreamingExtractor:
+    """
+    Incrementally scan model output for the first JSON object that contains the
+    required keys. Feed chunks as they arrive; `result` is set as soon as the
+    object closes, so callers can stop reading before any trailing commentary.
+    """
+
+    def __init__(self, required_keys: Iterable[str] = ("code",)):
+        self.required_keys = tuple(required_keys)
+        self.text = ""
+        self.result: Optional[Dict[str, Any]] = None
+        self.method: Optional[str] = None
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        if self.done:
+            return self.result
+        self.text += chunk
+        self._scan()
+        return self.result
+
+    def _reset_from(self, index: int) -> None:
+        self._pos = index
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def _scan(self) -> None:
+        text = self.text
+        while self._pos < len(text):
+            ch = text[self._pos]
+            self._pos += 1
+            if self._start is None:
+                if ch == "{":
+                    self._start = self._pos - 1
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    start = self._start
+                    parsed, repair = _loads(text[start:self._pos])
+                    if isinstance(parsed, dict) and all(k in parsed for k in self.required_keys):
+                        self.result = parsed
+                        self.method = "json" if repair is None else repair
+                        return
+                    # Not the object we're after (an example in prose, or unparseable);
+                    # look for another one starting just past this brace
+                    self._reset_from(start + 1)
+                    text = self.text
+
+
+def _match_js_block(src: str, open_idx: int) -> Optional[int]:
+    """
+    Return the index just past the `}` matching the `{` at open_idx, skipping
+    strings, template literals and comments. None if the block never closes.
+    """
+    depth = 0
+    # Stack of contexts: "code" for braces, "template" inside backtick strings
+    stack = []
+    i = open_idx
+    n = len(src)
+    while i < n:
+        ch = src[i]
+        context = stack[-1] if stack else "code"
+        if context == "template":
+            if ch == "\\":
+                i += 2
+                continue
+            if ch == "`":
+                stack.pop()
+            elif src.startswith("${", i):
+                stack.append("code")
+                depth += 1
+                i += 2
+                continue
+            i += 1
+            continue
+        if ch in "'\"":
+            i += 1
+            while i < n and src[i] != ch and src[i] != "\n":
+                i += 2 if src[i] == "\\" else 1
+        elif ch == "`":
+            stack.append("template")
+        elif src.startswith("//", i):
+            newline = src.find("\n", i)
+            i = n if newline == -1 else newline
+            continue
+        elif src.startswith("/*", i):
+            end = src.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        elif ch == "{":
+            depth += 1
+            if stack:
+                stack.append("code")
+        elif ch == "}":
+            depth -= 1
+            if stack:
+                stack.pop()
+            if depth == 0:
+                return i + 1
+        i += 1
+    return None
+
+
+def extract_baseline_function(text: str) -> Optional[str]:
+    """Pull a complete `export async function baselineFunction` block out of arbitrary text."""
+    match = _BASELINE_SIGNATURE.search(text)
+    if not match:
+        return None
+    body = text[match.start():]
+
+    # Code that was sitting inside a broken JSON string still carries its escapes
+    if "\n" not in body[:500] and "\\n" in body:
+        body = body.replace('\\"', '"').replace("\\n", "\n").replace("\\t", "\t").replace("\\\\", "\\")
+
+    open_idx = body.find("{", body.find(")"))
+    if open_idx == -1:
+        return None
+    end = _match_js_block(body, open_idx)
+    if end is None:
+        return None
+    return body[:end]
+
+
+def extract_output(text: str, required_keys: Iterable[str] = ("code",)) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Recover the structured output from a model response. Returns the parsed
+    object and how it was recovered ("json", "repaired_escapes" or
+    "baseline_function"), or (None, None).
+    """
+    extractor = StreamingExtractor(required_keys)
+    extractor.feed(text)
+    if extractor.done:
+        return extractor.result, extractor.method
+
+    required_keys = tuple(required_keys)
+    if required_keys == ("code",):
+        code = extract_baseline_function(text)
+        if code:
+            return {"code": code}, "baseline_function"
+    return None, None
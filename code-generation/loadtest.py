@@ -0,0 +1,714 @@
+#!/usr/bin/env python3
+"""
+Concurrent load generator for the code-generation API.
+
+Starts a stand-in OpenAI-compatible model server with configurable latency and
+error injection, launches api.py against it (or targets a running server with
+--url), and drives an endpoint at a fixed request rate or concurrency. Reports
+throughput, latency percentiles, errors and the API's event-loop lag.
+
+The stand-in model streams a recorded response from the evaluation corpus, so
+/code runs the real parsing, validation and cost stages. A stand-in Mobula/LiFi
+upstream backs the /market cache, to check how many upstream calls a given
+agent load turns into. The events scenario posts gzip log batches from many
+simulated agents to /events. The watcher scenario funds simulated agent wallets on a
+stand-in JSON-RPC node and measures how quickly balance_watcher.py reports
+them, and with how many RPC requests.
+
+Usage:
+    python loadtest.py --concurrency 32 --duration 30
+    python loadtest.py --rate 20 --duration 60 --api-workers 4 --llm-latency-ms 1500
+    python loadtest.py --endpoint dryrun --concurrency 8 --json report.json --max-p99-ms 5000
+    python loadtest.py --endpoint market --rate 500 --symbols POL,WETH,USDC
+    python loadtest.py --endpoint events --rate 200 --agents 1000 --batch-events 50
+    python loadtest.py --url http://localhost:8000 --endpoint status --rate 500
+    python loadtest.py --endpoint watcher --wallets 500 --duration 60
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from events import agent_ingest_key
+
+HERE = Path(__file__).parent
+DEFAULT_FIXTURE = HERE / "eval_corpus" / "baseline.jsonl"
+DEFAULT_PROMPT = "Every 10 minutes, buy 1 USDC worth of POL if the price dropped more than 1% since the last check"
+# Roughly one token per this many characters when streaming the stand-in response
+CHARS_PER_TOKEN = 4
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def load_fixture(path: Path, case_id: Optional[str]) -> Dict[str, Any]:
+    """Pick the recorded case the stand-in model replays (the first full-mode case by default)."""
+    with open(path) as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    for case in cases:
+        if case["id"] == case_id or (case_id is None and case.get("mode", "full") == "full"):
+            return case
+    raise ValueError(f"No matching case in {path}")
+
+
+# --- Stand-in model ---
+
+class FakeLLM:
+    """
+    OpenAI-compatible /v1/chat/completions that replays one response.
+
+    Time to first token is log-normal around `latency_ms`; the rest streams at
+    `tokens_per_s`. A fraction `error_rate` of calls fail with `error_status`.
+    """
+
+    def __init__(self, response: str, latency_ms: float, latency_sigma: float,
+                 tokens_per_s: float, error_rate: float, error_status: int, seed: int):
+        self.response = response
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_s = tokens_per_s
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.injected_errors = 0
+        self.app = FastAPI()
+        self.app.post("/v1/chat/completions")(self.completions)
+
+    def _ttft(self) -> float:
+        return self.latency_ms / 1000 * self.rng.lognormvariate(0, self.latency_sigma)
+
+    def _chunk(self, model: str, created: int, delta: Dict[str, Any], finish: Optional[str] = None) -> str:
+        body = {
+            "id": "chatcmpl-loadtest",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+        return f"data: {json.dumps(body)}\n\n"
+
+    async def completions(self, request: Request):
+        body = await request.json()
+        model = body.get("model", "stand-in")
+        self.calls += 1
+        if self.rng.random() < self.error_rate:
+            self.injected_errors += 1
+            await asyncio.sleep(self._ttft())
+            return JSONResponse(
+                status_code=self.error_status,
+                content={"error": {"message": "Injected failure", "type": "server_error", "code": None}},
+            )
+
+        ttft = self._ttft()
+        # Stream a handful of tokens per chunk so the server isn't dominated by sleeps
+        step = CHARS_PER_TOKEN * 16
+        chunk_delay = 16 / self.tokens_per_s if self.tokens_per_s > 0 else 0.0
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + chunk_delay * (len(self.response) // step))
+            return {
+                "id": "chatcmpl-loadtest",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.response}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+
+        async def stream():
+            await asyncio.sleep(ttft)
+            yield self._chunk(model, created, {"role": "assistant", "content": ""})
+            for i in range(0, len(self.response), step):
+                yield self._chunk(model, created, {"content": self.response[i:i + step]})
+                await asyncio.sleep(chunk_delay)
+            yield self._chunk(model, created, {}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+class FakeUpstream:
+    """
+    Stand-in for Mobula's /market/data and LiFi's /token, with a fixed
+    latency and error rate. Counts calls so cache fan-out can be checked.
+    """
+
+    def __init__(self, latency_ms: float, error_rate: float, seed: int):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls: Dict[str, int] = {}
+        self.injected_errors = 0
+        self.app = FastAPI()
+        self.app.get("/mobula/market/data")(self.market_data)
+        self.app.get("/lifi/token")(self.token)
+
+    async def _respond(self, route: str, body: Dict[str, Any]):
+        self.calls[route] = self.calls.get(route, 0) + 1
+        await asyncio.sleep(self.latency_ms / 1000)
+        if self.rng.random() < self.error_rate:
+            self.injected_errors += 1
+            return JSONResponse(status_code=500, content={"error": "Injected failure"})
+        return body
+
+    async def market_data(self, symbol: str, chain: str = "137"):
+        price = 1.0 + self.rng.random()
+        return await self._respond("mobula", {"data": {"symbol": symbol, "price": price, "price_change_24h": 0.0}})
+
+    async def token(self, token: str, chain: str = "137"):
+        return await self._respond("lifi", {"address": token, "chainId": int(chain), "symbol": token, "decimals": 18})
+
+
+class FakeRPC:
+    """
+    Stand-in JSON-RPC node (eth_blockNumber, eth_getBalance, batches) that
+    mines a block every `block_time_ms`. fund() credits a wallet in the next
+    block.
+    """
+
+    def __init__(self, block_time_ms: float):
+        self.block_time = block_time_ms / 1000
+        self.genesis = time.time()
+        self.funded_block: Dict[str, int] = {}
+        self.requests = 0
+        self.balance_reads = 0
+        self.app = FastAPI()
+        self.app.post("/")(self.handle)
+
+    def block(self) -> int:
+        return int((time.time() - self.genesis) / self.block_time)
+
+    def block_time_of(self, block: int) -> float:
+        return self.genesis + block * self.block_time
+
+    def fund(self, address: str) -> int:
+        block = self.block() + 1
+        self.funded_block[address.lower()] = block
+        return block
+
+    def _call(self, call: Dict[str, Any]) -> Dict[str, Any]:
+        reply = {"jsonrpc": "2.0", "id": call.get("id")}
+        if call.get("method") == "eth_blockNumber":
+            reply["result"] = hex(self.block())
+        elif call.get("method") == "eth_getBalance":
+            self.balance_reads += 1
+            funded = self.funded_block.get(call["params"][0].lower())
+            reply["result"] = hex(10 ** 18 if funded is not None and self.block() >= funded else 0)
+        else:
+            reply["error"] = {"code": -32601, "message": "Method not found"}
+        return reply
+
+    async def handle(self, request: Request):
+        self.requests += 1
+        body = await request.json()
+        return [self._call(call) for call in body] if isinstance(body, list) else self._call(body)
+
+
+def serve_in_thread(app: FastAPI) -> str:
+    """Serve a stand-in app from a background thread and return its base URL."""
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def start_api(llm_url: str, upstream_url: str, workers: int, cache: bool, log_path: str,
+              events_key: Optional[str] = None, api_key: Optional[str] = None) -> tuple[subprocess.Popen, str]:
+    """Launch api.py pointed at the stand-in model and upstream, and wait until every worker is ready."""
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PORT": str(port),
+        "API_WORKERS": str(workers),
+        "OPENAI_API_KEY": "loadtest",
+        "OPENAI_BASE_URL": llm_url,
+        "MOBULA_API_BASE": f"{upstream_url}/mobula",
+        "LIFI_API_BASE": f"{upstream_url}/lifi",
+        "STATE_DB_PATH": os.path.join(tempfile.mkdtemp(prefix="evm-loadtest-"), "state.db"),
+        "EVENTS_DIR": tempfile.mkdtemp(prefix="evm-loadtest-events-"),
+        "CODE_CACHE_TTL": os.getenv("CODE_CACHE_TTL", "600") if cache else "0",
+        "RATE_LIMIT_PER_MINUTE": "0",
+        "HEARTBEAT_INTERVAL": "1",
+    }
+    # The launched API checks the same keys the driver sends
+    if events_key:
+        env["EVENT_INGEST_KEY"] = events_key
+    if api_key:
+        env["API_KEY"] = api_key
+    log = open(log_path, "w")
+    proc = subprocess.Popen([sys.executable, "api.py"], cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"api.py exited with code {proc.returncode}; see {log_path}")
+        try:
+            health = httpx.get(f"{url}/health/workers", timeout=1).json()
+            if health["alive_workers"] >= workers and all(w["ready"] for w in health["workers"] if w["alive"]):
+                return proc, url
+        except (httpx.HTTPError, ValueError, KeyError):
+            pass
+        time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError(f"api.py did not become ready; see {log_path}")
+
+
+# --- Load driver ---
+
+def _event_batch(size: int) -> bytes:
+    """A gzip NDJSON batch shaped like the log lines agents send."""
+    now = time.time()
+    lines = [
+        json.dumps({
+            "type": "log",
+            "level": "info",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now)) + f".{i % 1000:03d}Z",
+            "message": f"Status updated: monitoring - POL price {random.uniform(0.2, 0.3):.5f} | Next: Fetching market data",
+        })
+        for i in range(size)
+    ]
+    return gzip.compress("\n".join(lines).encode())
+
+
+def build_request(endpoint: str, fixture_code: str, simulated_seconds: int, unique: bool, symbols: List[str],
+                  agents: int = 100, batch_events: int = 50, events_key: Optional[str] = None,
+                  api_key: Optional[str] = None):
+    """Return a factory for (method, path, body, headers) per request. Bytes bodies are sent gzip-encoded."""
+    def make():
+        if endpoint == "events":
+            agent_id = f"agent-{random.randrange(agents)}"
+            # Each agent ingests with its own key derived from the master key
+            headers = {"x-api-key": agent_ingest_key(agent_id, events_key)} if events_key else {}
+            return "POST", f"/events/{agent_id}", _event_batch(batch_events), headers
+        if endpoint == "market":
+            return "GET", f"/market/data?symbol={random.choice(symbols)}", None, {}
+        if endpoint == "code":
+            # A unique suffix keeps identical prompts from being served by the shared cache
+            prompt = f"{DEFAULT_PROMPT} [{uuid.uuid4().hex[:8]}]" if unique else DEFAULT_PROMPT
+            return "POST", "/code", {"prompt": prompt, "history": []}, {}
+        if endpoint == "dryrun":
+            headers = {"x-api-key": api_key} if api_key else {}
+            return "POST", "/dryrun", {"code": fixture_code, "simulated_seconds": simulated_seconds}, headers
+        return "GET", f"/{endpoint}", None, {}
+    return make
+
+
+async def _send(client: httpx.AsyncClient, make, scheduled: float, results: List[Dict[str, Any]]) -> None:
+    method, path, body, headers = make()
+    outcome = "ok"
+    status = None
+    try:
+        if isinstance(body, bytes):
+            response = await client.request(method, path, content=body, headers={**headers, "Content-Encoding": "gzip"})
+        else:
+            response = await client.request(method, path, json=body, headers=headers)
+        status = response.status_code
+        if status >= 400:
+            outcome = f"http_{status}"
+        elif path in ("/code", "/dryrun"):
+            data = response.json()
+            if "error" in data or data.get("success") is False:
+                outcome = "app_error"
+    except httpx.TimeoutException:
+        outcome = "timeout"
+    except httpx.HTTPError as e:
+        outcome = type(e).__name__
+    # Latency counts from the scheduled start, so a backed-up client doesn't hide queueing
+    results.append({"latency": time.perf_counter() - scheduled, "outcome": outcome, "status": status})
+
+
+async def _sample_metrics(client: httpx.AsyncClient, stop: asyncio.Event, samples: Dict[int, List[Dict[str, Any]]]) -> None:
+    while not stop.is_set():
+        try:
+            data = (await client.get("/metrics", timeout=5)).json()
+            samples.setdefault(data["pid"], []).append(data["loop_lag_ms"])
+        except (httpx.HTTPError, ValueError, KeyError):
+            pass
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(stop.wait(), timeout=1)
+
+
+async def drive(url: str, make, duration: float, rate: Optional[float], concurrency: Optional[int],
+                poisson: bool, timeout: float, seed: int) -> Dict[str, Any]:
+    """Run the load for `duration` seconds, open-loop at `rate` or closed-loop at `concurrency`."""
+    results: List[Dict[str, Any]] = []
+    lag_samples: Dict[int, List[Dict[str, Any]]] = {}
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client, \
+            httpx.AsyncClient(base_url=url, timeout=5) as metrics_client:
+        sampler = asyncio.create_task(_sample_metrics(metrics_client, stop, lag_samples))
+        start = time.perf_counter()
+        deadline = start + duration
+
+        if rate:
+            rng = random.Random(seed)
+            tasks = []
+            next_at = start
+            while next_at < deadline:
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(_send(client, make, next_at, results)))
+                next_at += rng.expovariate(rate) if poisson else 1 / rate
+            await asyncio.gather(*tasks)
+        else:
+            async def user():
+                while time.perf_counter() < deadline:
+                    await _send(client, make, time.perf_counter(), results)
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await sampler
+
+    return {"results": results, "elapsed_s": elapsed, "loop_lag": lag_samples}
+
+
+def summarize(run: Dict[str, Any], config: Dict[str, Any], llm: Optional[FakeLLM],
+              upstream: Optional[FakeUpstream]) -> Dict[str, Any]:
+    results = run["results"]
+    total = len(results)
+    ok = [r["latency"] for r in results if r["outcome"] == "ok"]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if r["outcome"] != "ok":
+            errors[r["outcome"]] = errors.get(r["outcome"], 0) + 1
+    latencies = [r["latency"] for r in results]
+
+    loop_lag = {
+        str(pid): {
+            "samples": len(samples),
+            "p99_ms": max(s["p99"] for s in samples),
+            "max_ms": max(s["max"] for s in samples),
+        }
+        for pid, samples in run["loop_lag"].items()
+    }
+
+    report = {
+        "config": config,
+        "requests": total,
+        "succeeded": len(ok),
+        "elapsed_s": run["elapsed_s"],
+        "throughput_rps": len(ok) / run["elapsed_s"] if run["elapsed_s"] else 0.0,
+        "error_rate": (total - len(ok)) / total if total else 0.0,
+        "errors": errors,
+        "latency_ms": {
+            "p50": 1000 * percentile(latencies, 50),
+            "p95": 1000 * percentile(latencies, 95),
+            "p99": 1000 * percentile(latencies, 99),
+            "max": 1000 * max(latencies, default=0.0),
+        },
+        "loop_lag_by_worker": loop_lag,
+    }
+    if llm:
+        report["llm"] = {"calls": llm.calls, "injected_errors": llm.injected_errors}
+    if upstream:
+        report["upstream"] = {"calls": upstream.calls, "injected_errors": upstream.injected_errors}
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    config = report["config"]
+    load = f"{config['rate']} req/s" if config["rate"] else f"{config['concurrency']} concurrent"
+    print(f"📊 {config['endpoint']}: {report['requests']} requests at {load} over {report['elapsed_s']:.1f}s")
+    print(f"   Throughput:  {report['throughput_rps']:.2f} successful req/s")
+    if config.get("batch_events"):
+        print(f"   Events:      {report['throughput_rps'] * config['batch_events']:.0f} ingested/s "
+              f"({config['batch_events']} per batch, {config['agents']} agents)")
+    lat = report["latency_ms"]
+    print(f"   Latency:     p50={lat['p50']:.0f}ms p95={lat['p95']:.0f}ms p99={lat['p99']:.0f}ms max={lat['max']:.0f}ms")
+    print(f"   Error rate:  {report['error_rate']:.2%}")
+    for outcome, count in sorted(report["errors"].items()):
+        print(f"     {outcome:<16} {count}")
+    if "llm" in report:
+        print(f"   Model calls: {report['llm']['calls']} ({report['llm']['injected_errors']} injected errors)")
+    if report.get("upstream", {}).get("calls"):
+        calls = ", ".join(f"{route}={count}" for route, count in report["upstream"]["calls"].items())
+        print(f"   Upstream calls: {calls} ({report['upstream']['injected_errors']} injected errors)")
+    print("   Event-loop lag:")
+    if not report["loop_lag_by_worker"]:
+        print("     no /metrics samples")
+    for pid, lag in report["loop_lag_by_worker"].items():
+        print(f"     worker {pid:<8} p99={lag['p99_ms']:.1f}ms max={lag['max_ms']:.1f}ms ({lag['samples']} samples)")
+
+
+def start_watcher(rpc_url: str, log_path: str) -> tuple[subprocess.Popen, str]:
+    """Launch balance_watcher.py against the stand-in node and wait for its first block."""
+    port = _free_port()
+    env = {**os.environ, "POLYGON_RPC_URL": rpc_url, "WATCHER_PORT": str(port)}
+    log = open(log_path, "w")
+    proc = subprocess.Popen([sys.executable, "balance_watcher.py"], cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"balance_watcher.py exited with code {proc.returncode}; see {log_path}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).json()["head"] is not None:
+                return proc, url
+        except (httpx.HTTPError, ValueError, KeyError):
+            pass
+        time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError(f"balance_watcher.py did not start; see {log_path}")
+
+
+async def watch_wallets(url: str, rpc: FakeRPC, wallets: int, duration: float, seed: int) -> Dict[str, Any]:
+    """
+    Long-poll the watcher for `wallets` simulated agents, funding each at a
+    random time in the first 80% of the run, and time each notification.
+    """
+    rng = random.Random(seed)
+    addresses = ["0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40)) for _ in range(wallets)]
+    funded: Dict[str, float] = {}
+    funding_block: Dict[str, int] = {}
+    notified: Dict[str, float] = {}
+    errors: Dict[str, int] = {}
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+
+    async def agent(client: httpx.AsyncClient, address: str) -> None:
+        while time.perf_counter() < deadline:
+            try:
+                response = await client.get(f"/wallets/{address}/wait", params={"timeout": 10})
+                if response.json().get("funded"):
+                    notified[address] = time.time()
+                    return
+            except (httpx.HTTPError, ValueError) as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                await asyncio.sleep(1)
+
+    async def funder() -> None:
+        schedule = sorted((rng.uniform(0, duration * 0.8), address) for address in addresses)
+        start = time.perf_counter()
+        for at, address in schedule:
+            await asyncio.sleep(max(0.0, start + at - time.perf_counter()))
+            # Latency counts from when the funding block is mined
+            funding_block[address] = rpc.fund(address)
+            funded[address] = rpc.block_time_of(funding_block[address])
+
+    rpc_before = rpc.requests
+    headers = {"x-api-key": os.environ["WATCHER_API_KEY"]} if os.getenv("WATCHER_API_KEY") else {}
+    async with httpx.AsyncClient(base_url=url, timeout=30, limits=limits, headers=headers) as client:
+        await asyncio.gather(funder(), *(agent(client, address) for address in addresses))
+        stats = (await client.get("/health")).json()["stats"]
+        # Blocks between funding and the watcher seeing it, independent of client-side delays
+        views = await asyncio.gather(*(client.get(f"/wallets/{address}") for address in funding_block))
+        detection_blocks = [
+            view.json()["funded_block"] - funding_block[address]
+            for address, view in zip(funding_block, views)
+            if view.status_code == 200 and view.json()["funded_block"] is not None
+        ]
+
+    return {
+        "funded": funded,
+        "notified": notified,
+        "detection_blocks": detection_blocks,
+        "errors": errors,
+        "rpc_requests": rpc.requests - rpc_before,
+        "balance_reads": rpc.balance_reads,
+        "watcher_stats": stats,
+    }
+
+
+def run_watcher(args) -> Dict[str, Any]:
+    rpc = FakeRPC(args.block_time_ms)
+    rpc_url = serve_in_thread(rpc.app)
+    print(f"⛓️  Stand-in JSON-RPC node at {rpc_url} ({args.block_time_ms:g}ms blocks)")
+    log_path = os.path.join(tempfile.gettempdir(), "evm-loadtest-watcher.log")
+    proc, url = start_watcher(rpc_url, log_path)
+    print(f"👀 Balance watcher at {url}, logs in {log_path}")
+    try:
+        run = asyncio.run(watch_wallets(url, rpc, args.wallets, args.duration, args.seed))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    reaction = [max(0.0, run["notified"][a] - t) for a, t in run["funded"].items() if a in run["notified"]]
+    # Agents' own checkBalance calls: every 30s without the watcher; with it, one
+    # after each notification plus the 10-minute fallback
+    polling_calls = args.wallets * args.duration / 30
+    watcher_calls = args.wallets * (1 + args.duration / 600)
+    return {
+        "config": {"endpoint": "watcher", "wallets": args.wallets, "duration_s": args.duration,
+                   "block_time_ms": args.block_time_ms},
+        "funded": len(run["funded"]),
+        "notified": len(run["notified"]),
+        "missed": len(run["funded"]) - len(run["notified"]),
+        "client_errors": run["errors"],
+        "reaction_ms": {
+            "p50": 1000 * percentile(reaction, 50),
+            "p95": 1000 * percentile(reaction, 95),
+            "max": 1000 * max(reaction, default=0.0),
+        },
+        "reaction_blocks_p95": percentile(reaction, 95) * 1000 / args.block_time_ms,
+        # 0 means the watcher read the balance in the same block the funds landed
+        "detection_blocks_max": max(run["detection_blocks"], default=None),
+        "rpc_requests": run["rpc_requests"],
+        "balance_reads": run["balance_reads"],
+        "agent_balance_calls_polling": polling_calls,
+        "agent_balance_calls_watcher": watcher_calls,
+        "watcher_stats": run["watcher_stats"],
+    }
+
+
+def print_watcher_report(report: Dict[str, Any]) -> None:
+    config = report["config"]
+    print(f"📊 watcher: {config['wallets']} wallets over {config['duration_s']:g}s, {config['block_time_ms']:g}ms blocks")
+    print(f"   Notified:    {report['notified']}/{report['funded']} funded wallets")
+    r = report["reaction_ms"]
+    print(f"   Reaction:    p50={r['p50']:.0f}ms p95={r['p95']:.0f}ms max={r['max']:.0f}ms "
+          f"(p95 = {report['reaction_blocks_p95']:.2f} blocks)")
+    print(f"   Detection:   within {report['detection_blocks_max']} block(s) of funding, watcher-side")
+    print(f"   RPC:         {report['rpc_requests']} requests, {report['balance_reads']} balance reads")
+    print(f"   Agent balance checks: ~{report['agent_balance_calls_polling']:.0f} with 30s polling, "
+          f"~{report['agent_balance_calls_watcher']:.0f} with the watcher")
+    for outcome, count in sorted(report["client_errors"].items()):
+        print(f"     {outcome:<16} {count}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rate", type=float, help="Open-loop target rate in requests/s")
+    load.add_argument("--concurrency", type=int, help="Closed-loop number of concurrent clients (default: 8)")
+    parser.add_argument("--arrivals", choices=["poisson", "uniform"], default="poisson", help="Arrival process for --rate")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load (default: 30)")
+    parser.add_argument("--endpoint", choices=["code", "dryrun", "market", "events", "watcher", "status", "ready"], default="code")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    parser.add_argument("--url", help="Target a running API instead of starting one (no stand-in model)")
+    parser.add_argument("--api-workers", type=int, default=1, help="API_WORKERS for the launched API")
+    parser.add_argument("--cache", action="store_true", help="Repeat one prompt and leave the /code cache on")
+    parser.add_argument("--fixture", default=str(DEFAULT_FIXTURE), help="Corpus file with the response to replay")
+    parser.add_argument("--case", help="Corpus case id to replay (default: first full-mode case)")
+    parser.add_argument("--dryrun-seconds", type=int, default=3600, help="simulated_seconds for --endpoint dryrun")
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="Median time to first token")
+    parser.add_argument("--llm-latency-sigma", type=float, default=0.5, help="Log-normal spread of time to first token")
+    parser.add_argument("--llm-tokens-per-s", type=float, default=400, help="Streaming rate after the first token")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of model calls that fail")
+    parser.add_argument("--llm-error-status", type=int, default=500, help="HTTP status of injected failures (e.g. 429)")
+    parser.add_argument("--symbols", default="POL,WETH,USDC,WBTC", help="Comma-separated symbols for --endpoint market")
+    parser.add_argument("--upstream-latency-ms", type=float, default=150, help="Stand-in Mobula/LiFi latency")
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0, help="Fraction of upstream calls that fail")
+    parser.add_argument("--agents", type=int, default=100, help="Simulated agents for --endpoint events")
+    parser.add_argument("--batch-events", type=int, default=50, help="Events per batch for --endpoint events")
+    parser.add_argument("--events-key", default=os.getenv("EVENT_INGEST_KEY"),
+                        help="x-api-key for --endpoint events (default: EVENT_INGEST_KEY)")
+    parser.add_argument("--api-key", default=os.getenv("API_KEY"),
+                        help="x-api-key for privileged routes such as /dryrun (default: API_KEY)")
+    parser.add_argument("--wallets", type=int, default=200, help="Simulated agent wallets for --endpoint watcher")
+    parser.add_argument("--block-time-ms", type=float, default=2000, help="Stand-in node block time for --endpoint watcher")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_out", help="Write the report to this file")
+    parser.add_argument("--max-p99-ms", type=float, help="Exit non-zero above this p99 latency")
+    parser.add_argument("--max-error-rate", type=float, help="Exit non-zero above this error rate")
+    args = parser.parse_args()
+    if not args.rate and not args.concurrency:
+        args.concurrency = 8
+
+    if args.endpoint == "watcher":
+        report = run_watcher(args)
+        print_watcher_report(report)
+        if args.json_out:
+            with open(args.json_out, "w") as f:
+                json.dump(report, f, indent=2)
+        return 1 if report["missed"] else 0
+
+    case = load_fixture(Path(args.fixture), args.case)
+    from validation import parse_model_output
+    fixture_code = (parse_model_output(case["response"]) or {}).get("code", "")
+
+    llm = None
+    upstream = None
+    proc = None
+    url = args.url
+    if not url:
+        llm = FakeLLM(case["response"], args.llm_latency_ms, args.llm_latency_sigma, args.llm_tokens_per_s,
+                      args.llm_error_rate, args.llm_error_status, args.seed)
+        llm_url = serve_in_thread(llm.app) + "/v1"
+        print(f"🤖 Stand-in model at {llm_url} (replaying '{case['id']}')")
+        upstream = FakeUpstream(args.upstream_latency_ms, args.upstream_error_rate, args.seed)
+        upstream_url = serve_in_thread(upstream.app)
+        print(f"📈 Stand-in Mobula/LiFi at {upstream_url}")
+        log_path = os.path.join(tempfile.gettempdir(), "evm-loadtest-api.log")
+        proc, url = start_api(llm_url, upstream_url, args.api_workers, args.cache, log_path,
+                              events_key=args.events_key, api_key=args.api_key)
+        print(f"🚀 API at {url} with {args.api_workers} worker(s), logs in {log_path}")
+
+    config = {
+        "endpoint": args.endpoint,
+        "rate": args.rate,
+        "concurrency": args.concurrency,
+        "arrivals": args.arrivals if args.rate else None,
+        "duration_s": args.duration,
+        "api_workers": None if args.url else args.api_workers,
+        "llm_latency_ms": None if args.url else args.llm_latency_ms,
+        "llm_error_rate": None if args.url else args.llm_error_rate,
+    }
+    if args.endpoint == "events":
+        config.update(agents=args.agents, batch_events=args.batch_events)
+    try:
+        symbols = [s.strip() for s in args.symbols.split(",") if s.strip()]
+        make = build_request(args.endpoint, fixture_code, args.dryrun_seconds, unique=not args.cache, symbols=symbols,
+                             agents=args.agents, batch_events=args.batch_events,
+                             events_key=args.events_key, api_key=args.api_key)
+        run = asyncio.run(drive(url, make, args.duration, args.rate, args.concurrency,
+                                args.arrivals == "poisson", args.timeout, args.seed))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    report = summarize(run, config, llm, upstream)
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = False
+    if args.max_p99_ms is not None and report["latency_ms"]["p99"] > args.max_p99_ms:
+        print(f"❌ p99 latency above {args.max_p99_ms:.0f}ms")
+        failed = True
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        print(f"❌ Error rate above {args.max_error_rate:.1%}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
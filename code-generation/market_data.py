@@ -0,0 +1,271 @@
+"""
+Shared market-data cache for deployed agents.
+
+Agents call getTokenMarketData (Mobula) and getTokenInfo (LiFi) on every
+strategy tick. With MARKET_DATA_URL set, baseline/utils.js reads through this
+service instead, so the fleet makes one upstream call per symbol per freshness
+window no matter how many agents watch it:
+
+- fresh entries are served from memory
+- stale entries are served immediately while one background refresh runs
+- concurrent misses for the same key share a single upstream request
+- workers share entries through shared_state, so a symbol fetched by one
+  API worker is served by the others
+- only the chains, symbols and addresses in the agents' tokens.json (plus a
+  few aliases) are looked up, so the route is not an open proxy on our keys
+
+Responses keep the upstream shapes, so agents parse them unchanged.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+import httpx
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+
+import shared_state
+
+logger = logging.getLogger(__name__)
+
+MOBULA_API_BASE = os.getenv("MOBULA_API_BASE", "https://api.mobula.io/api/1")
+LIFI_API_BASE = os.getenv("LIFI_API_BASE", "https://li.quest/v1")
+MOBULA_API_KEY = os.getenv("MOBULA_API_KEY")
+UPSTREAM_TIMEOUT = float(os.getenv("MARKET_UPSTREAM_TIMEOUT", "10"))
+# Prices go stale quickly; token metadata hardly ever changes
+MARKET_DATA_FRESH_S = float(os.getenv("MARKET_DATA_FRESH_S", "10"))
+MARKET_DATA_STALE_S = float(os.getenv("MARKET_DATA_STALE_S", "300"))
+TOKEN_INFO_FRESH_S = float(os.getenv("TOKEN_INFO_FRESH_S", "3600"))
+TOKEN_INFO_STALE_S = float(os.getenv("TOKEN_INFO_STALE_S", "86400"))
+# Entries kept in memory per cache; least recently used are dropped first
+MARKET_CACHE_MAX_ENTRIES = max(1, int(os.getenv("MARKET_CACHE_MAX_ENTRIES", "10000")))
+# The agents' token list; lookups outside it are rejected
+MARKET_TOKENS_PATH = os.getenv(
+    "MARKET_TOKENS_PATH",
+    str(Path(__file__).resolve().parent.parent / "agent-deployer" / "baseline" / "tokens.json"),
+)
+# Symbols accepted on every listed chain although tokens.json doesn't carry them
+MARKET_EXTRA_SYMBOLS = os.getenv("MARKET_EXTRA_SYMBOLS", "MATIC,WMATIC,BTC,ETH")
+
+_SYMBOL = re.compile(r"^[A-Za-z0-9.$_+-]{1,32}$")
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _load_allowed(path: str) -> Optional[Dict[str, Tuple[Set[str], Set[str]]]]:
+    """Chain id -> (upper-case symbols, lower-case addresses) from tokens.json, or None if unreadable."""
+    try:
+        with open(path) as f:
+            tokens = json.load(f)["tokens"]
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"⚠️  Could not load {path} ({e}); market symbols are only pattern-checked")
+        return None
+    extra = {s.strip().upper() for s in MARKET_EXTRA_SYMBOLS.split(",") if s.strip()}
+    return {
+        str(chain): (
+            {t["symbol"].upper() for t in listed} | extra,
+            {t["address"].lower() for t in listed},
+        )
+        for chain, listed in tokens.items()
+    }
+
+
+_allowed = _load_allowed(MARKET_TOKENS_PATH)
+
+
+def _check_token(chain: str, token: str) -> None:
+    """Reject lookups of chains, symbols or addresses the agents can't trade."""
+    if _allowed is None:
+        if not _SYMBOL.match(token) or not chain.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid token or chain")
+        return
+    if chain not in _allowed:
+        raise HTTPException(status_code=400, detail=f"Unsupported chain '{chain}'")
+    symbols, addresses = _allowed[chain]
+    if token.upper() not in symbols and token.lower() not in addresses:
+        raise HTTPException(status_code=400, detail=f"Unsupported token '{token}'")
+
+
+def _http() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=UPSTREAM_TIMEOUT)
+    return _client
+
+
+async def close() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class SWRCache:
+    """
+    Stale-while-revalidate cache with coalesced fetches.
+
+    Entries younger than `fresh_s` are served as-is. Entries up to
+    `fresh_s + stale_s` old are served while a background refresh runs. Older
+    entries, and misses, wait on the fetch. At most one fetch per key is in
+    flight in this worker.
+    """
+
+    def __init__(self, name: str, fetch: Callable[[str], Awaitable[Any]], fresh_s: float, stale_s: float):
+        self.name = name
+        self.fetch = fetch
+        self.fresh_s = fresh_s
+        self.stale_s = stale_s
+        self.entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self.inflight: Dict[str, asyncio.Task] = {}
+        self._background: set = set()
+        self.stats = {"fresh": 0, "stale": 0, "miss": 0, "upstream": 0, "upstream_errors": 0}
+
+    def _shared_key(self, key: str) -> str:
+        return f"market:{self.name}:{key}"
+
+    def _remember(self, key: str, entry: Tuple[Any, float]) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > MARKET_CACHE_MAX_ENTRIES:
+            self.entries.popitem(last=False)
+
+    async def _read_shared(self, key: str) -> Optional[Tuple[Any, float]]:
+        shared = await run_in_threadpool(shared_state.cache_get, self._shared_key(key))
+        return None if shared is None else (shared["value"], shared["fetched_at"])
+
+    async def _load(self, key: str) -> Tuple[Any, float]:
+        try:
+            value = await self.fetch(key)
+        except httpx.HTTPError:
+            self.stats["upstream_errors"] += 1
+            raise
+        fetched_at = time.time()
+        self._remember(key, (value, fetched_at))
+        await run_in_threadpool(
+            shared_state.cache_set,
+            self._shared_key(key),
+            {"value": value, "fetched_at": fetched_at},
+            self.fresh_s + self.stale_s,
+        )
+        return value, fetched_at
+
+    async def _refresh(self, key: str) -> Tuple[Any, float]:
+        """Fetch `key` from upstream, joining a fetch already in flight."""
+        task = self.inflight.get(key)
+        if task is None:
+            self.stats["upstream"] += 1
+            task = asyncio.create_task(self._load(key))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # Shielded so one cancelled caller doesn't cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    def _revalidate(self, key: str) -> None:
+        async def run():
+            try:
+                await self._refresh(key)
+            except Exception as e:
+                logger.warning(f"Background refresh of {self.name} '{key}' failed: {e}")
+        if key not in self.inflight:
+            # Keep a reference so the task isn't garbage-collected mid-flight
+            task = asyncio.create_task(run())
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    async def get(self, key: str) -> Tuple[Any, str, float]:
+        """Return (value, cache state, age in seconds)."""
+        entry = self.entries.get(key)
+        if entry is None or time.time() - entry[1] >= self.fresh_s:
+            # Another worker may already have fetched or refreshed it
+            shared = await self._read_shared(key)
+            if shared is not None and (entry is None or shared[1] > entry[1]):
+                entry = shared
+        if entry is not None:
+            self._remember(key, entry)
+            value, fetched_at = entry
+            age = time.time() - fetched_at
+            if age < self.fresh_s:
+                self.stats["fresh"] += 1
+                return value, "fresh", age
+            if age < self.fresh_s + self.stale_s:
+                self.stats["stale"] += 1
+                self._revalidate(key)
+                return value, "stale", age
+
+        self.stats["miss"] += 1
+        value, fetched_at = await self._refresh(key)
+        return value, "miss", time.time() - fetched_at
+
+
+async def _fetch_market_data(key: str) -> Any:
+    chain, symbol = key.split(":", 1)
+    headers = {"accept": "application/json"}
+    if MOBULA_API_KEY:
+        headers["Authorization"] = MOBULA_API_KEY
+    response = await _http().get(
+        f"{MOBULA_API_BASE}/market/data",
+        params={"symbol": symbol, "chain": chain},
+        headers=headers,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def _fetch_token_info(key: str) -> Any:
+    chain, token = key.split(":", 1)
+    response = await _http().get(f"{LIFI_API_BASE}/token", params={"chain": chain, "token": token})
+    response.raise_for_status()
+    return response.json()
+
+
+market_data_cache = SWRCache("market_data", _fetch_market_data, MARKET_DATA_FRESH_S, MARKET_DATA_STALE_S)
+token_info_cache = SWRCache("token_info", _fetch_token_info, TOKEN_INFO_FRESH_S, TOKEN_INFO_STALE_S)
+
+router = APIRouter(prefix="/market", tags=["market"])
+
+
+async def _serve(cache: SWRCache, key: str, response: Response) -> Any:
+    try:
+        value, state, age = await cache.get(key)
+    except httpx.HTTPStatusError as e:
+        # Pass upstream client errors (e.g. unknown symbol) through; anything else is a bad gateway
+        status = e.response.status_code if e.response.status_code < 500 else 502
+        raise HTTPException(status_code=status, detail=f"Upstream returned {e.response.status_code}")
+    except httpx.HTTPError as e:
+        logger.error(f"Upstream {cache.name} request failed: {e}")
+        raise HTTPException(status_code=502, detail=f"Upstream request failed: {type(e).__name__}")
+    response.headers["X-Cache"] = state
+    response.headers["Age"] = str(int(age))
+    return value
+
+
+@router.get("/data", summary="Cached Mobula market data for a token")
+async def get_market_data(response: Response, symbol: str = Query(..., min_length=1), chain: str = "137"):
+    """Same response as Mobula's /market/data, served from the shared cache."""
+    _check_token(chain, symbol)
+    # Symbols are case-insensitive upstream; normalise them so `pol` and `POL` share an entry
+    return await _serve(market_data_cache, f"{chain}:{symbol.upper()}", response)
+
+
+@router.get("/token", summary="Cached LiFi token info")
+async def get_token_info(response: Response, token: str = Query(..., min_length=1), chain: str = "137"):
+    """Same response as LiFi's /token, served from the shared cache."""
+    _check_token(chain, token)
+    # Addresses are case-insensitive; normalise them so checksummed and lower-case share an entry
+    key = token.lower() if token.startswith("0x") else token
+    return await _serve(token_info_cache, f"{chain}:{key}", response)
+
+
+@router.get("/stats", summary="Market-data cache hit rates for this worker")
+async def cache_stats():
+    return {
+        cache.name: {**cache.stats, "entries": len(cache.entries)}
+        for cache in (market_data_cache, token_info_cache)
+    }
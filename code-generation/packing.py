@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Packing planner for deploying many agents per container.
+
+A deployed agent spends nearly all its time waiting in setTimeout/setInterval
+between trades, yet each one gets its own App Runner service (0.5 vCPU, 1 GB).
+In a packed deployment one container runs many agents, each in its own worker
+thread with its own module state, environment, data directory and heap limit
+(agent-deployer/baseline/host.js).
+
+This module turns generated code into agent modules with standard start()/stop()
+exports (build_agent_module), and assigns agents to hosts (plan_packing). Each
+agent is sized by its heap limit (its memory estimate plus headroom) and by the
+steady-state call rate per upstream from cost.py, since packed agents share the
+host's event loop and egress. Hosts are filled first-fit, largest agents first, without exceeding any
+host limit.
+
+Usage:
+    python packing.py agents.json
+    python packing.py agents.json --json plan.json
+
+agents.json is a list of {"agent_id", "owner_address", "code"} objects, where
+"code" is the code returned by /code ("cost_report" and "memory_mb" are optional).
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional
+
+from cost import analyze_cost
+from validation import parse_js
+from variables import AGENT_MODULE_INTERFACE
+
+# Instance size of a packed host, matching PACK_INSTANCE_CPU/PACK_INSTANCE_MEMORY in agent-deployer
+PACK_HOST_MEMORY_MB = int(os.getenv("PACK_HOST_MEMORY_MB", "2048"))
+PACK_HOST_VCPU = float(os.getenv("PACK_HOST_VCPU", "1"))
+# Memory kept for the host process itself (HTTP server, worker bookkeeping)
+PACK_HOST_RESERVED_MB = int(os.getenv("PACK_HOST_RESERVED_MB", "256"))
+# Typical memory of one agent's worker
+PACK_AGENT_MEMORY_MB = int(os.getenv("PACK_AGENT_MEMORY_MB", "96"))
+# Hard heap limit of one agent's worker in the host. A worker that reaches it is
+# killed and restarted, so it sits above the estimate: at least
+# PACK_AGENT_HEAP_LIMIT_MB, and PACK_AGENT_HEAP_HEADROOM times the agent's
+# estimate. Hosts are filled by these limits, so even with every agent at its
+# limit a leak takes down only its own worker, never the container.
+PACK_AGENT_HEAP_LIMIT_MB = int(os.getenv("PACK_AGENT_HEAP_LIMIT_MB", "128"))
+PACK_AGENT_HEAP_HEADROOM = float(os.getenv("PACK_AGENT_HEAP_HEADROOM", "1.5"))
+PACK_MAX_AGENTS_PER_HOST = int(os.getenv("PACK_MAX_AGENTS_PER_HOST", "32"))
+# Steady-state calls per minute one host may make to each upstream; its agents share one egress IP
+DEFAULT_HOST_CALL_BUDGETS = {"mobula": 120, "lifi": 60, "rpc": 60}
+PACK_HOST_CALL_BUDGETS = {**DEFAULT_HOST_CALL_BUDGETS, **json.loads(os.getenv("PACK_HOST_CALL_BUDGETS", "{}"))}
+
+# Size of an unpacked agent's App Runner service (deploy.js)
+SINGLE_AGENT_MEMORY_MB = 1024
+SINGLE_AGENT_VCPU = 0.5
+
+# host.js uses agent ids in file names
+_AGENT_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+# Top-level names AGENT_MODULE_INTERFACE declares
+_INTERFACE_NAMES = {
+    "start", "stop", "setTimeout", "setInterval", "clearTimeout", "clearInterval",
+    "agentTimers", "agentStopped",
+}
+_INTERFACE_MARKER = "// ======= AGENT MODULE INTERFACE ======="
+
+
+def _top_level_names(ast: dict) -> set:
+    names = set()
+    for node in ast["body"]:
+        if node["type"] in ("ExportNamedDeclaration", "ExportDefaultDeclaration") and node.get("declaration"):
+            node = node["declaration"]
+        if node["type"] in ("FunctionDeclaration", "ClassDeclaration") and node.get("id"):
+            names.add(node["id"]["name"])
+        elif node["type"] == "VariableDeclaration":
+            for declarator in node["declarations"]:
+                if declarator["id"]["type"] == "Identifier":
+                    names.add(declarator["id"]["name"])
+    return names
+
+
+def build_agent_module(code: str) -> str:
+    """
+    Append the start()/stop() interface to a generated baselineFunction().
+
+    Raises:
+        ValueError: If the code doesn't parse, has no top-level baselineFunction,
+            or already declares one of the interface's names
+    """
+    if _INTERFACE_MARKER in code:
+        return code
+    try:
+        ast = parse_js(code).toDict()
+    except Exception as e:
+        raise ValueError(f"Could not parse agent code: {str(e).splitlines()[0]}")
+    names = _top_level_names(ast)
+    if "baselineFunction" not in names:
+        raise ValueError("Agent code has no top-level baselineFunction()")
+    clashes = sorted(names & _INTERFACE_NAMES)
+    if clashes:
+        raise ValueError(f"Agent code declares names reserved for the module interface: {', '.join(clashes)}")
+    return code.rstrip() + "\n" + AGENT_MODULE_INTERFACE
+
+
+def estimate_agent(agent: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Memory, heap limit and per-upstream call rate of one agent, from its
+    cost_report (computed from code if missing).
+    """
+    agent_id = str(agent.get("agent_id", ""))
+    if not _AGENT_ID.match(agent_id):
+        raise ValueError(f"Invalid agent_id {agent_id!r}: use letters, digits, '-' and '_'")
+
+    report = agent.get("cost_report")
+    if report is None and agent.get("code"):
+        report = analyze_cost(agent["code"])
+    rates = dict((report or {}).get("calls_per_minute_by_upstream", {}))
+    memory_mb = float(agent.get("memory_mb") or PACK_AGENT_MEMORY_MB)
+    return {
+        "agent_id": agent_id,
+        "owner_address": agent.get("owner_address"),
+        "memory_mb": memory_mb,
+        "heap_limit_mb": max(PACK_AGENT_HEAP_LIMIT_MB, math.ceil(memory_mb * PACK_AGENT_HEAP_HEADROOM)),
+        "calls_per_minute_by_upstream": rates,
+    }
+
+
+def _host_id(agent_ids: List[str]) -> str:
+    # Named after its members, so re-planning the same agents gives the same service
+    return "pack-" + hashlib.sha1(",".join(sorted(agent_ids)).encode()).hexdigest()[:10]
+
+
+def plan_packing(
+    agents: List[Dict[str, Any]],
+    host_memory_mb: int = PACK_HOST_MEMORY_MB,
+    max_agents_per_host: int = PACK_MAX_AGENTS_PER_HOST,
+    call_budgets: Optional[Dict[str, float]] = None,
+    include_modules: bool = True,
+) -> Dict[str, Any]:
+    """
+    Assign agents to as few hosts as fit their memory and call rates.
+
+    Args:
+        agents: Dicts with agent_id and code or cost_report; optionally owner_address and memory_mb
+        host_memory_mb: Memory of one host, of which PACK_HOST_RESERVED_MB goes to the host process
+            and the rest bounds the sum of its agents' heap limits
+        max_agents_per_host: Upper bound on agents sharing a host
+        call_budgets: Per-upstream calls per minute one host may make (default PACK_HOST_CALL_BUDGETS)
+        include_modules: Add each agent's module source (code plus start/stop interface)
+
+    Returns:
+        Dict with the hosts, their agents and load, and the memory and vCPU saved
+    """
+    budgets = call_budgets if call_budgets is not None else PACK_HOST_CALL_BUDGETS
+    memory_capacity = host_memory_mb - PACK_HOST_RESERVED_MB
+    if memory_capacity <= 0:
+        raise ValueError(f"host_memory_mb must exceed the {PACK_HOST_RESERVED_MB}MB reserved for the host process")
+    if max_agents_per_host < 1:
+        raise ValueError("max_agents_per_host must be at least 1")
+
+    estimates = [estimate_agent(agent) for agent in agents]
+    seen = set()
+    for estimate in estimates:
+        if estimate["agent_id"] in seen:
+            raise ValueError(f"Duplicate agent_id {estimate['agent_id']!r}")
+        seen.add(estimate["agent_id"])
+    print(f"📦 Packing {len(estimates)} agent(s) into {host_memory_mb}MB hosts…")
+
+    def share(estimate: Dict[str, Any]) -> float:
+        # The agent's largest fraction of any host limit
+        shares = [estimate["heap_limit_mb"] / memory_capacity, 1 / max_agents_per_host]
+        for upstream, rate in estimate["calls_per_minute_by_upstream"].items():
+            if budgets.get(upstream):
+                shares.append(rate / budgets[upstream])
+        return max(shares)
+
+    hosts: List[Dict[str, Any]] = []
+    warnings: List[str] = []
+    for estimate in sorted(estimates, key=lambda e: (-share(e), e["agent_id"])):
+        rates = estimate["calls_per_minute_by_upstream"]
+        for host in hosts:
+            if host["oversized"] or len(host["agents"]) >= max_agents_per_host:
+                continue
+            if host["heap_limit_mb"] + estimate["heap_limit_mb"] > memory_capacity:
+                continue
+            if any(host["calls_per_minute_by_upstream"].get(u, 0) + r > budgets[u] for u, r in rates.items() if budgets.get(u)):
+                continue
+            break
+        else:
+            host = {"agents": [], "memory_mb": 0.0, "heap_limit_mb": 0, "calls_per_minute_by_upstream": {}, "oversized": False}
+            hosts.append(host)
+            if share(estimate) > 1:
+                # Doesn't fit any host: give it one to itself rather than refusing to deploy it
+                host["oversized"] = True
+                warnings.append(f"Agent {estimate['agent_id']} exceeds a host's limits on its own and gets a dedicated host")
+
+        host["agents"].append(estimate)
+        host["memory_mb"] += estimate["memory_mb"]
+        host["heap_limit_mb"] += estimate["heap_limit_mb"]
+        for upstream, rate in rates.items():
+            host["calls_per_minute_by_upstream"][upstream] = host["calls_per_minute_by_upstream"].get(upstream, 0) + rate
+
+    if include_modules:
+        codes = {str(agent.get("agent_id")): agent.get("code") for agent in agents}
+        for estimate in estimates:
+            if codes.get(estimate["agent_id"]):
+                estimate["module"] = build_agent_module(codes[estimate["agent_id"]])
+
+    for host in hosts:
+        host["host_id"] = _host_id([a["agent_id"] for a in host["agents"]])
+        host["memory_mb"] = round(host["memory_mb"], 1)
+        host["calls_per_minute_by_upstream"] = {u: round(r, 4) for u, r in sorted(host["calls_per_minute_by_upstream"].items())}
+        utilization = {"memory": host["heap_limit_mb"] / memory_capacity, "agents": len(host["agents"]) / max_agents_per_host}
+        for upstream, rate in host["calls_per_minute_by_upstream"].items():
+            if budgets.get(upstream):
+                utilization[upstream] = rate / budgets[upstream]
+        host["utilization"] = {k: round(v, 3) for k, v in utilization.items()}
+
+    n, k = len(estimates), len(hosts)
+    summary = {
+        "agents": n,
+        "hosts": k,
+        "memory_mb": {"unpacked": n * SINGLE_AGENT_MEMORY_MB, "packed": k * host_memory_mb},
+        "vcpu": {"unpacked": n * SINGLE_AGENT_VCPU, "packed": k * PACK_HOST_VCPU},
+        "memory_mb_per_agent": round(k * host_memory_mb / n, 1) if n else 0,
+    }
+    print(f"✅ {n} agent(s) on {k} host(s): {summary['memory_mb_per_agent']}MB per agent instead of {SINGLE_AGENT_MEMORY_MB}MB")
+    for warning in warnings:
+        print(f"⚠️ {warning}")
+
+    return {
+        "hosts": [
+            {key: host[key] for key in ("host_id", "agents", "memory_mb", "heap_limit_mb", "calls_per_minute_by_upstream", "utilization", "oversized")}
+            for host in hosts
+        ],
+        "summary": summary,
+        "warnings": warnings,
+    }
+
+
+def print_plan(plan: Dict[str, Any]) -> None:
+    summary = plan["summary"]
+    print(f"📦 {summary['agents']} agent(s) on {summary['hosts']} host(s)")
+    print(f"   Memory: {summary['memory_mb']['packed']}MB packed vs {summary['memory_mb']['unpacked']}MB unpacked "
+          f"({summary['memory_mb_per_agent']}MB per agent)")
+    print(f"   vCPU:   {summary['vcpu']['packed']:g} packed vs {summary['vcpu']['unpacked']:g} unpacked")
+    for host in plan["hosts"]:
+        load = ", ".join(f"{key} {value:.0%}" for key, value in host["utilization"].items())
+        print(f"   {host['host_id']}: {len(host['agents'])} agent(s), {load}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("agents_file", help="JSON list of agents with agent_id, owner_address and code")
+    parser.add_argument("--host-memory-mb", type=int, default=PACK_HOST_MEMORY_MB)
+    parser.add_argument("--max-agents-per-host", type=int, default=PACK_MAX_AGENTS_PER_HOST)
+    parser.add_argument("--json", dest="json_out", help="Write the plan, with agent modules, to this file")
+    args = parser.parse_args()
+
+    with open(args.agents_file) as f:
+        agents = json.load(f)
+    try:
+        plan = plan_packing(
+            agents,
+            host_memory_mb=args.host_memory_mb,
+            max_agents_per_host=args.max_agents_per_host,
+            include_modules=bool(args.json_out),
+        )
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    print_plan(plan)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(plan, f, indent=2)
+        print(f"💾 Plan written to {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import re
+from typing import Any, Dict, List, Tuple
+
+from variables import BASELINE_JS
+
+AI_CODE_START = "// ======= ENTER AI CODE ======="
+AI_CODE_END = "// ======= END AI CODE ======="
+
+
+def _baseline_skeleton() -> str:
+    body = BASELINE_JS.strip()
+    body = body.removeprefix("[CODE]").removesuffix("[/CODE]").strip()
+    return body + "\n"
+
+
+# The canonical baselineFunction that strategy-only output is spliced into
+BASELINE_SKELETON = _baseline_skeleton()
+
+
+def _fuzzy_pattern(search: str) -> re.Pattern:
+    """Match `search` with any run of whitespace standing in for any other."""
+    parts = [re.escape(part) for part in search.split()]
+    return re.compile(r"\s+".join(parts))
+
+
+def apply_edits(code: str, edits: List[Dict[str, Any]]) -> Tuple[str | None, str | None]:
+    """
+    Apply search/replace edits to code, in order.
+
+    Each edit's `search` text must occur exactly once. Exact matches are tried
+    first, then a whitespace-insensitive match to absorb re-indentation by the
+    model. Returns (patched_code, None), or (None, reason) if any edit doesn't
+    apply, in which case nothing is applied.
+    """
+    if not isinstance(edits, list) or not edits:
+        return None, "No edits provided"
+
+    patched = code
+    for i, edit in enumerate(edits, 1):
+        if not isinstance(edit, dict) or not isinstance(edit.get("search"), str) or not isinstance(edit.get("replace"), str):
+            return None, f"Edit {i} must have string 'search' and 'replace' fields"
+        search, replace = edit["search"], edit["replace"]
+        if not search.strip():
+            return None, f"Edit {i} has an empty 'search'"
+
+        count = patched.count(search)
+        if count == 1:
+            patched = patched.replace(search, replace, 1)
+            continue
+        if count > 1:
+            return None, f"Edit {i} 'search' matches {count} places; it must be unique"
+
+        matches = list(_fuzzy_pattern(search).finditer(patched))
+        if len(matches) != 1:
+            reason = "matches nothing" if not matches else f"matches {len(matches)} places"
+            return None, f"Edit {i} 'search' {reason}"
+        match = matches[0]
+        patched = patched[:match.start()] + replace + patched[match.end():]
+
+    return patched, None
+
+
+def _template_lines(code: str) -> set:
+    """
+    Indexes of the lines of code that start inside a multi-line template
+    literal, whose leading whitespace is part of the string.
+    """
+    inside = set()
+    # Stack of contexts: "code" inside ${...}, "template" inside backtick strings
+    stack = []
+    line = 0
+    i, n = 0, len(code)
+    while i < n:
+        ch = code[i]
+        context = stack[-1] if stack else "code"
+        if ch == "\n":
+            line += 1
+            if context == "template":
+                inside.add(line)
+        elif context == "template":
+            if ch == "\\" and code[i + 1:i + 2] != "\n":
+                i += 1
+            elif ch == "`":
+                stack.pop()
+            elif code.startswith("${", i):
+                stack.append("code")
+                i += 1
+        elif ch in "'\"":
+            i += 1
+            while i < n and code[i] != ch and code[i] != "\n":
+                i += 2 if code[i] == "\\" else 1
+            if i < n and code[i] == ch:
+                i += 1
+            continue
+        elif ch == "`":
+            stack.append("template")
+        elif code.startswith("//", i):
+            newline = code.find("\n", i)
+            i = n if newline == -1 else newline
+            continue
+        elif code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            line += code.count("\n", i, n if end == -1 else end)
+            i = n if end == -1 else end + 2
+            continue
+        elif ch == "{" and stack:
+            stack.append("code")
+        elif ch == "}" and stack:
+            stack.pop()
+        i += 1
+    return inside
+
+
+def _reindent(code: str, indent: str) -> str:
+    """Dedent code and indent it by `indent`, leaving lines inside template literals as written."""
+    lines = code.split("\n")
+    protected = _template_lines(code)
+    movable = [i for i, line in enumerate(lines) if i not in protected and line.strip()]
+    common = min((len(lines[i]) - len(lines[i].lstrip()) for i in movable), default=0)
+    for i in movable:
+        lines[i] = indent + lines[i][common:]
+    for i, line in enumerate(lines):
+        if i not in protected and not line.strip():
+            lines[i] = ""
+    return "\n".join(lines)
+
+
+def splice_strategy(strategy: str, skeleton: str = BASELINE_SKELETON) -> str:
+    """
+    Insert a strategy block between the ENTER/END AI CODE markers of the
+    baseline skeleton, re-indented to match. Everything between the markers in
+    the skeleton (its placeholder separator comments) is replaced.
+    """
+    start = skeleton.index(AI_CODE_START)
+    end = skeleton.index(AI_CODE_END)
+    line_start = skeleton.rfind("\n", 0, start) + 1
+    indent = skeleton[line_start:start]
+
+    # Drop the markers if the model echoed them back
+    lines = [
+        line for line in strategy.strip("\n").splitlines()
+        if AI_CODE_START not in line and AI_CODE_END not in line and line.strip() != "// ============================="
+    ]
+    block = _reindent("\n".join(lines).strip("\n"), indent)
+
+    end_line_start = skeleton.rfind("\n", 0, end) + 1
+    return (
+        skeleton[:start] + AI_CODE_START + "\n"
+        + block + "\n"
+        + skeleton[end_line_start:]
+    )
@@ -0,0 +1,177 @@
+"""
+State shared between API worker processes.
+
+With API_WORKERS > 1 uvicorn forks several copies of the app, so anything kept
+in process memory (the /code result cache, in-flight request tracking, rate
+limit counters, worker health) would be split per worker. This module keeps
+that state in one SQLite database in WAL mode: readers never block the single
+writer, and each operation is a single short statement, so contention stays
+low even with a worker per core.
+
+Connections are cached per thread, since the API runs blocking work in a
+threadpool.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", os.path.join(tempfile.gettempdir(), "evm-agents-state.db"))
+# A worker that hasn't written a heartbeat for this many intervals is reported dead
+HEARTBEAT_INTERVAL = float(os.getenv("HEARTBEAT_INTERVAL", "5"))
+HEARTBEAT_MISSES = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS inflight (
+    key TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rate (
+    key TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (key, bucket)
+);
+CREATE TABLE IF NOT EXISTS workers (
+    pid INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    inflight INTEGER NOT NULL,
+    ready INTEGER NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        # Autocommit: every statement below is atomic on its own
+        conn = sqlite3.connect(STATE_DB_PATH, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        _local.conn = conn
+    return conn
+
+
+def init() -> None:
+    """Create the schema. Safe to call from every worker."""
+    _conn().executescript(_SCHEMA)
+
+
+def request_key(*parts: Any) -> str:
+    """Stable cache key for a request's parameters."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# --- TTL key/value cache ---
+
+def cache_get(key: str) -> Optional[Any]:
+    row = _conn().execute(
+        "SELECT value FROM kv WHERE key = ? AND expires_at > ?", (key, time.time())
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def cache_set(key: str, value: Any, ttl: float) -> None:
+    if ttl <= 0:
+        return
+    _conn().execute(
+        "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+        (key, json.dumps(value), time.time() + ttl),
+    )
+
+
+# --- In-flight tracking ---
+
+def claim(key: str, ttl: float) -> bool:
+    """
+    Mark `key` as being computed by this worker. Returns False if another
+    worker holds an unexpired claim. Claims expire after `ttl` seconds so a
+    crashed worker can't block the key forever.
+    """
+    now = time.time()
+    cur = _conn().execute(
+        "INSERT INTO inflight (key, pid, expires_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET pid = excluded.pid, expires_at = excluded.expires_at "
+        "WHERE inflight.expires_at <= ?",
+        (key, os.getpid(), now + ttl, now),
+    )
+    return cur.rowcount == 1
+
+
+def release(key: str) -> None:
+    _conn().execute("DELETE FROM inflight WHERE key = ? AND pid = ?", (key, os.getpid()))
+
+
+# --- Rate limiting ---
+
+def hit(key: str, limit: int, window: int = 60) -> Optional[int]:
+    """
+    Count a request against a fixed-window limit shared by all workers.
+    Returns None if allowed, otherwise the seconds until the window resets.
+    """
+    now = time.time()
+    current = int(now // window)
+    (count,) = _conn().execute(
+        "INSERT INTO rate (key, bucket, count) VALUES (?, ?, 1) "
+        "ON CONFLICT(key, bucket) DO UPDATE SET count = count + 1 RETURNING count",
+        (key, current),
+    ).fetchone()
+    if count > limit:
+        return max(1, int((current + 1) * window - now))
+    return None
+
+
+# --- Worker heartbeats ---
+
+def heartbeat(started_at: float, inflight: int, ready: bool) -> None:
+    """Record that this worker is alive, and sweep expired rows."""
+    now = time.time()
+    conn = _conn()
+    conn.execute(
+        "INSERT OR REPLACE INTO workers (pid, started_at, last_seen, inflight, ready) VALUES (?, ?, ?, ?, ?)",
+        (os.getpid(), started_at, now, inflight, int(ready)),
+    )
+    conn.execute("DELETE FROM kv WHERE expires_at <= ?", (now,))
+    conn.execute("DELETE FROM inflight WHERE expires_at <= ?", (now,))
+    conn.execute("DELETE FROM rate WHERE bucket < ?", (int(now // 60) - 1,))
+    # Forget workers that have been gone for a while (e.g. after a restart)
+    conn.execute("DELETE FROM workers WHERE last_seen < ?", (now - 60 * HEARTBEAT_INTERVAL,))
+
+
+def deregister() -> None:
+    _conn().execute("DELETE FROM workers WHERE pid = ?", (os.getpid(),))
+
+
+def workers() -> List[Dict[str, Any]]:
+    """Every worker seen recently, with an `alive` flag from its heartbeat age."""
+    now = time.time()
+    rows = _conn().execute(
+        "SELECT pid, started_at, last_seen, inflight, ready FROM workers ORDER BY pid"
+    ).fetchall()
+    return [
+        {
+            "pid": pid,
+            "uptime_s": round(now - started_at, 1),
+            "last_seen_s": round(now - last_seen, 1),
+            "inflight": inflight,
+            "ready": bool(ready),
+            "alive": now - last_seen < HEARTBEAT_MISSES * HEARTBEAT_INTERVAL,
+        }
+        for pid, started_at, last_seen, inflight, ready in rows
+    ]
@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+# Modules import each other by name, as when run from code-generation/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# coder.py builds its client at import time; tests never call the model
+os.environ.setdefault("OPENAI_API_KEY", "test")
@@ -0,0 +1,66 @@
+import asyncio
+import importlib
+import sys
+import time
+
+import anyio
+import pytest
+from fastapi.concurrency import run_in_threadpool
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    # api.py logs to evm_trader.log in the working directory
+    monkeypatch.chdir(tmp_path)
+    import shared_state
+    monkeypatch.setattr(shared_state, "STATE_DB_PATH", str(tmp_path / "state.db"))
+    monkeypatch.setattr(shared_state, "_local", type(shared_state._local)())
+    shared_state.init()
+    module = sys.modules.get("api") or importlib.import_module("api")
+    calls = []
+
+    def fake_generate(request):
+        calls.append(request.prompt)
+        time.sleep(0.3)
+        return {"code": f"// {len(calls)}"}
+
+    monkeypatch.setattr(module, "_generate", fake_generate)
+    monkeypatch.setattr(module, "calls", calls, raising=False)
+    return module
+
+
+def test_generations_do_not_hold_the_default_threadpool(api):
+    async def scenario():
+        anyio.to_thread.current_default_thread_limiter().total_tokens = 1
+        tasks = [asyncio.create_task(api._generate_shared(api.CodeRequest(prompt=f"p{i}"))) for i in range(4)]
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        await run_in_threadpool(lambda: None)
+        waited = time.perf_counter() - start
+        await asyncio.gather(*tasks)
+        return waited
+
+    assert asyncio.run(scenario()) < 0.2
+    assert len(api.calls) == 4
+
+
+def test_duplicate_waits_for_the_shared_result(api, monkeypatch):
+    monkeypatch.setattr(api, "CODE_CACHE_TTL", 60)
+
+    async def scenario():
+        anyio.to_thread.current_default_thread_limiter().total_tokens = 2
+        request = api.CodeRequest(prompt="same")
+        return await asyncio.gather(api._generate_shared(request), api._generate_shared(request))
+
+    results = asyncio.run(scenario())
+    assert api.calls == ["same"]
+    assert sorted(results, key=len) == [{"code": "// 1"}, {"code": "// 1", "cached": True}]
+
+
+def test_use_cache_false_bypasses_a_cached_result(api, monkeypatch):
+    monkeypatch.setattr(api, "CODE_CACHE_TTL", 60)
+    asyncio.run(api._generate_shared(api.CodeRequest(prompt="same")))
+    result = asyncio.run(api._generate_shared(api.CodeRequest(prompt="same", use_cache=False)))
+    assert result == {"code": "// 2"}
+    assert len(api.calls) == 2
+
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+import backtest
+from backtest import _check_grid, backtest as run
+
+
+def _series(closes, bar_seconds=60):
+    return {"timestamp": np.arange(len(closes), dtype=np.float64) * bar_seconds,
+            "close": np.asarray(closes, dtype=np.float64)}
+
+
+def _spec(*rules, **extra):
+    return {"base_token": "WMATIC", "quote_token": "USDC", "interval_seconds": 60, "rules": list(rules),
+            "take_profit_pct": None, "stop_loss_pct": None, "max_trades": None, **extra}
+
+
+def _rule(action="buy", trigger="schedule", amount_usd=100, **extra):
+    return {"action": action, "trigger": trigger, "threshold": None, "lookback_seconds": None,
+            "amount_usd": amount_usd, **extra}
+
+
+def test_grid_is_gcd_of_intervals():
+    step, idx, interval_steps = _check_grid(np.arange(0, 3601, 60.0), np.array([600.0, 900.0]))
+    assert step == 300
+    assert len(idx) == 13
+    assert interval_steps.tolist() == [2, 3]
+
+
+def test_grid_is_never_finer_than_the_bars():
+    step, idx, interval_steps = _check_grid(np.arange(0, 601, 60.0), np.array([30.0]))
+    assert step == 60
+    assert idx.tolist() == list(range(11))
+    assert interval_steps.tolist() == [1]
+
+
+def test_intervals_snap_to_bar_multiples():
+    # 90s on minute bars would otherwise give a 30s grid with every close repeated
+    step, _, interval_steps = _check_grid(np.arange(0, 601, 60.0), np.array([90.0, 180.0]))
+    assert step == 60
+    assert interval_steps.tolist() == [2, 3]
+
+
+def test_gaps_use_the_last_close():
+    timestamps = np.array([0.0, 60.0, 120.0, 600.0, 660.0])
+    step, idx, _ = _check_grid(timestamps, np.array([60.0]))
+    assert step == 60
+    assert idx.tolist() == [0, 1, 2, 2, 2, 2, 2, 2, 2, 2, 3, 4]
+
+
+def test_too_many_steps_is_rejected_before_simulating(monkeypatch):
+    monkeypatch.setattr(backtest, "BACKTEST_MAX_STEPS", 100)
+    with pytest.raises(ValueError, match="BACKTEST_MAX_STEPS"):
+        run(_spec(_rule()), _series(np.ones(200)))
+
+
+def test_scheduled_buys_fill_at_each_check():
+    result = run(_spec(_rule()), _series([1, 2, 1, 2]), fee_bps=0)
+    # 100 + 50 + 100 + 50 units for 400 quote
+    assert result["final_equity"][0] == pytest.approx(600 + 300 * 2)
+    assert result["trades"].tolist() == [4]
+
+
+def test_buys_are_limited_by_cash():
+    result = run(_spec(_rule(amount_usd=600)), _series([1, 1, 1]), fee_bps=0)
+    assert result["trades"].tolist() == [2]
+    assert result["final_equity"][0] == pytest.approx(1000)
+
+
+def test_fee_is_charged_per_swap():
+    result = run(_spec(_rule(), max_trades=1), _series([1, 1]), fee_bps=100)
+    assert result["final_equity"][0] == pytest.approx(900 + 99)
+    assert result["trades"].tolist() == [1]
+
+
+def test_take_profit_exits_from_entry_price():
+    spec = _spec(_rule(trigger="price_below", threshold=1.5), take_profit_pct=50)
+    result = run(spec, _series([1, 1.6, 2]), fee_bps=0)
+    assert result["trades"].tolist() == [2]
+    assert result["final_equity"][0] == pytest.approx(900 + 160)
+
+
+def test_sells_never_exceed_holdings():
+    spec = _spec(_rule(amount_usd=50), _rule(action="sell", trigger="price_above", threshold=1.5, amount_usd=500))
+    result = run(spec, _series([1, 2]), fee_bps=0)
+    # Buy 50 units at 1; at 2 buy 25 more, then sell all 75
+    assert result["final_equity"][0] == pytest.approx(900 + 75 * 2)
+
+
+def test_sweep_simulates_each_interval():
+    result = run(_spec(_rule()), _series(np.ones(5)), sweep={"interval_seconds": [60, 120]}, fee_bps=0)
+    assert result["check_grid_seconds"] == 60
+    assert result["trades"].tolist() == [5, 3]
+
+
+def test_max_drawdown():
+    result = run(_spec(_rule(amount_usd=1000), max_trades=1), _series([1, 0.5, 1]), fee_bps=0)
+    assert result["max_drawdown_pct"][0] == pytest.approx(50)
+    assert result["pnl_usd"][0] == pytest.approx(0)
+
+
+def test_minimal_spec_omits_optional_fields():
+    spec = {"base_token": "WMATIC", "quote_token": "USDC", "interval_seconds": 60,
+            "rules": [{"action": "buy", "trigger": "schedule", "amount_usd": 10}]}
+    result = run(spec, _series([1, 1, 1]), fee_bps=0)
+    assert result["trades"].tolist() == [3]
+    swept = run(spec, _series([1, 1, 1]), sweep={"take_profit_pct": [5, 10], "rules[0].lookback_seconds": [60]})
+    assert swept["combinations"] == 2
@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import balance_watcher
+from balance_watcher import BalanceWatcher, sign_notification
+
+ADDRESS = "0x" + "ab" * 20
+
+
+def _watcher(handler):
+    watcher = BalanceWatcher("http://rpc.test")
+    watcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return watcher
+
+
+def _rpc(balances, block=100):
+    """A JSON-RPC stand-in answering eth_blockNumber and batched eth_getBalance."""
+    def handler(request):
+        payload = json.loads(request.content)
+        if isinstance(payload, dict):
+            return httpx.Response(200, json={"id": 0, "result": hex(block)})
+        return httpx.Response(200, json=[
+            {"id": call["id"], "result": hex(balances.get(call["params"][0], 0))} for call in payload
+        ])
+    return handler
+
+
+def test_wallet_is_funded_on_the_next_block():
+    async def scenario():
+        watcher = _watcher(_rpc({ADDRESS: 2 * 10 ** 16}))
+        wallet = watcher.register(ADDRESS.upper().replace("0X", "0x"), 0.01)
+        await watcher.poll_once()
+        return wallet
+
+    wallet = asyncio.run(scenario())
+    assert wallet.event.is_set()
+    assert wallet.view()["funded_block"] == 100
+
+
+def test_reregistration_keeps_the_first_callback():
+    async def scenario():
+        watcher = _watcher(_rpc({}))
+        watcher.register(ADDRESS, 0.01, "https://agent-a.example.com/funded")
+        return watcher.register(ADDRESS, 0.01, "https://attacker.example.net/funded")
+
+    assert asyncio.run(scenario()).callback_url == "https://agent-a.example.com/funded"
+
+
+def test_callback_hosts_allow_list(monkeypatch):
+    monkeypatch.setattr(balance_watcher, "WATCHER_CALLBACK_HOSTS", ["*.awsapprunner.com", "agents.example.com"])
+
+    async def scenario():
+        watcher = _watcher(_rpc({}))
+        watcher.register(ADDRESS, 0.01, "https://abc.us-east-1.awsapprunner.com/funded")
+        watcher.register("0x" + "cd" * 20, 0.01, "https://agents.example.com/agents/a/funded")
+        for url in ("https://evil.example.net/funded", "file:///etc/passwd", "https://awsapprunner.com.evil.net/"):
+            with pytest.raises(ValueError):
+                watcher.register("0x" + "ef" * 20, 0.01, url)
+
+    asyncio.run(scenario())
+
+
+def test_callback_is_signed_and_carries_no_key(monkeypatch):
+    monkeypatch.setattr(balance_watcher, "AGENT_API_KEY", "agent-secret")
+    sent = []
+
+    def handler(request):
+        if request.url.host == "agent.example.com":
+            sent.append(request)
+            return httpx.Response(200, json={"success": True})
+        return _rpc({ADDRESS: 10 ** 18})(request)
+
+    async def scenario():
+        watcher = _watcher(handler)
+        watcher.register(ADDRESS, 0.01, "https://agent.example.com/funded")
+        await watcher.poll_once()
+        await asyncio.gather(*watcher._notifications)
+
+    asyncio.run(scenario())
+    request, = sent
+    assert "x-api-key" not in request.headers
+    assert request.headers["x-watcher-signature"] == sign_notification(request.content, "agent-secret")
+    assert json.loads(request.content)["address"] == ADDRESS
+
+
+def test_wallet_routes_require_the_watcher_key(monkeypatch):
+    monkeypatch.setattr(balance_watcher, "WATCHER_API_KEY", "watcher-secret")
+    asyncio.run(balance_watcher.require_watcher_key("watcher-secret"))
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(balance_watcher.require_watcher_key(None))
+    assert error.value.status_code == 401
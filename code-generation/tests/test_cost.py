@@ -0,0 +1,109 @@
+import pytest
+
+from cost import analyze_cost
+from patching import splice_strategy
+
+
+def _errors(report):
+    return [issue["message"] for issue in report["issues"] if issue["severity"] == "error"]
+
+
+def _agent(body, before=""):
+    return before + "export async function baselineFunction(ownerAddress) {\n" + body + "\n}\n"
+
+
+def test_set_interval_rate():
+    report = analyze_cost(_agent('setInterval(async () => { await getTokenMarketData("POL"); }, 20 * 60 * 1000);'))
+    assert report["calls_per_minute_by_upstream"] == {"mobula": pytest.approx(0.05)}
+    assert report["schedules"][0]["period_ms"] == 1_200_000
+    assert report["within_budget"]
+
+
+def test_inline_sleep_in_loop():
+    report = analyze_cost(_agent(
+        'while (true) { await getTokenMarketData("POL"); await new Promise(r => setTimeout(r, 60000)); }'))
+    assert report["calls_per_minute_by_upstream"] == {"mobula": pytest.approx(1.0)}
+    assert _errors(report) == []
+
+
+@pytest.mark.parametrize("helper", [
+    "const sleep = ms => new Promise(r => setTimeout(r, ms));\n",
+    "function sleep(ms) {\n  return new Promise((resolve) => { setTimeout(resolve, ms); });\n}\n",
+])
+def test_sleep_helper_delay_comes_from_call_site(helper):
+    code = _agent('while (true) { await getTokenMarketData("POL"); await sleep(60000); }', before=helper)
+    report = analyze_cost(code)
+    assert report["calls_per_minute_by_upstream"] == {"mobula": pytest.approx(1.0)}
+    assert report["schedules"] == [{"kind": "polling loop", "period_ms": 60000.0, "line": report["schedules"][0]["line"]}]
+    assert _errors(report) == []
+
+
+def test_sleep_helper_expression_and_default_parameter():
+    code = _agent(
+        "const wait = (seconds = 30) => new Promise(r => setTimeout(r, seconds * 1000));\n"
+        'while (true) { await getTokenMarketData("POL"); await wait(); }')
+    assert analyze_cost(code)["schedules"][0]["period_ms"] == 30_000
+
+
+def test_polling_loop_with_conditional_break_is_steady():
+    code = _agent(
+        "while (true) {\n"
+        '  const d = await getTokenMarketData("POL");\n'
+        '  if (d.price < 0.2) { await swap("USDC", "POL", 10); break; }\n'
+        "  await new Promise(r => setTimeout(r, 1000));\n"
+        "}")
+    report = analyze_cost(code)
+    assert report["calls_per_minute"]["getTokenMarketData"] == pytest.approx(60)
+    assert report["schedules"][0]["kind"] == "polling loop"
+    assert not report["within_budget"]
+
+
+def test_funding_wait_is_not_steady_state():
+    strategy = 'while (true) { await getTokenMarketData("POL"); await new Promise(r => setTimeout(r, 60000)); }'
+    report = analyze_cost(splice_strategy(strategy))
+    # checkBalance runs until the wallet is funded; only the strategy's loop recurs
+    assert "checkBalance" not in report["calls_per_minute"]
+    assert report["calls_per_minute_by_upstream"] == {"mobula": pytest.approx(1.0)}
+    assert [s["period_ms"] for s in report["schedules"]] == [60000.0]
+
+
+def test_breaking_loop_in_a_helper_is_not_the_funding_wait():
+    code = _agent("await waitForPrice();", before=(
+        "async function waitForPrice() {\n"
+        "  while (true) {\n"
+        '    const ok = await checkBalance("0x1", 1);\n'
+        "    if (ok.success) break;\n"
+        "    await new Promise(r => setTimeout(r, 2000));\n"
+        "  }\n"
+        "}\n"))
+    assert analyze_cost(code)["calls_per_minute"]["checkBalance"] == pytest.approx(30)
+
+
+def test_loop_without_delay_is_rejected():
+    report = analyze_cost(_agent('while (true) { await getTokenMarketData("POL"); }'))
+    assert "Infinite loop without a delay polls as fast as the APIs respond" in _errors(report)
+    assert not report["within_budget"]
+
+
+def test_unrelated_helper_is_not_a_sleep():
+    code = _agent('while (true) { await getTokenMarketData("POL"); await refresh(60000); }',
+                  before="async function refresh(ms) { return ms; }\n")
+    assert not analyze_cost(code)["within_budget"]
+
+
+def test_recurring_set_timeout_counts_as_a_schedule():
+    code = _agent(
+        "async function tick() {\n"
+        '  await getTokenMarketData("POL");\n'
+        "  setTimeout(tick, 120000);\n"
+        "}\n"
+        "tick();")
+    report = analyze_cost(code)
+    assert report["calls_per_minute_by_upstream"]["mobula"] == pytest.approx(0.5)
+    assert report["within_budget"]
+
+
+def test_unparseable_code_is_only_a_warning():
+    report = analyze_cost("export async function baselineFunction( {")
+    assert report["within_budget"]
+    assert report["issues"][0]["severity"] == "warning"
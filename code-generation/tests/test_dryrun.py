@@ -0,0 +1,131 @@
+import asyncio
+import shutil
+import socket
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+import auth
+import dryrun
+from dryrun import dry_run
+
+pytestmark = pytest.mark.skipif(not shutil.which("node"), reason="needs Node.js")
+
+
+def _agent(body):
+    return "export async function baselineFunction(ownerAddress) {\n" + body + "\n}\n"
+
+
+def test_polling_agent_trades_on_the_virtual_clock():
+    code = _agent(
+        "while (true) {\n"
+        '  const quote = await swap("POL", "USDC", ownerAddress, "1");\n'
+        "  await sendTransaction(quote.transactionRequest);\n"
+        "  await new Promise((r) => setTimeout(r, 3600 * 1000));\n"
+        "}")
+    result = dry_run(code, simulated_seconds=6 * 3600)
+    assert result["success"], result
+    assert result["report"]["trades"] == 7
+
+
+def test_agent_sees_no_service_environment(monkeypatch):
+    monkeypatch.setenv("SECRET_FOR_TEST", "leak")
+    result = dry_run(_agent("log(Object.keys(process.env).join(','));"), simulated_seconds=60)
+    assert result["report"]["recent_logs"][0]["message"] == "PATH"
+
+
+@pytest.mark.parametrize("body", [
+    'const fs = await import("fs"); fs.readFileSync("/etc/hostname");',
+    'const cp = await import("child_process"); cp.execSync("id");',
+    'await fetch("https://example.com");',
+    'const net = await import("net"); net.connect(80, "127.0.0.1");',
+])
+def test_agent_is_sandboxed(body):
+    result = dry_run(_agent(body), simulated_seconds=60)
+    assert not result["success"]
+    assert result["report"]["fatal_error"]
+
+
+@pytest.fixture
+def listener():
+    """A local TCP server recording the connections it accepts."""
+    server = socket.create_server(("127.0.0.1", 0))
+    server.settimeout(0.1)
+    accepted = []
+    done = threading.Event()
+
+    def serve():
+        while not done.is_set():
+            try:
+                accepted.append(server.accept()[0])
+            except (socket.timeout, OSError):
+                pass
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield server.getsockname()[1], accepted
+    done.set()
+    thread.join()
+    server.close()
+
+
+def _connect(expression):
+    return _agent(
+        f"const socket = {expression};\n"
+        "await new Promise((resolve, reject) => {\n"
+        '  socket.on("connect", resolve);\n'
+        '  socket.on("error", reject);\n'
+        "});\n"
+        'log("connected");')
+
+
+NETWORK_ATTEMPTS = {
+    "net.connect": _connect('(await import("net")).connect(PORT, "127.0.0.1")'),
+    "new Socket": _connect('new (await import("net")).Socket().connect(PORT, "127.0.0.1")'),
+    "tls.connect": _connect('(await import("tls")).connect(PORT, "127.0.0.1")'),
+    # A Socket constructor reached through an existing instance
+    "stderr constructor": _connect('Reflect.construct(process.stderr.constructor, [{}]).connect(PORT, "127.0.0.1")'),
+    "http.get": _connect('(await import("http")).get("http://127.0.0.1:PORT/")'),
+    "agent connection": _connect('(await import("http")).globalAgent.createConnection(PORT, "127.0.0.1")'),
+    "udp": _agent('const { createSocket } = await import("dgram"); createSocket("udp4").send("x", PORT, "127.0.0.1");'),
+    "dns": _agent('await (await import("dns")).promises.lookup("example.com");'),
+}
+
+
+@pytest.mark.parametrize("namespace", [True, False], ids=["namespace", "harness-only"])
+@pytest.mark.parametrize("code", NETWORK_ATTEMPTS.values(), ids=NETWORK_ATTEMPTS.keys())
+def test_agent_cannot_reach_the_network(code, namespace, listener, monkeypatch):
+    port, accepted = listener
+    if not namespace:
+        monkeypatch.setattr(dryrun, "_network_namespace", lambda: [])
+    elif not dryrun._network_namespace():
+        pytest.skip("network namespaces unavailable")
+    result = dry_run(code.replace("PORT", str(port)), simulated_seconds=60)
+    assert not result["success"]
+    assert result["report"]["fatal_error"]
+    assert "connected" not in [entry["message"] for entry in result["report"]["recent_logs"]]
+    assert accepted == []
+    if not namespace:
+        assert result["report"]["fatal_error"] == "Network access is disabled in dry runs"
+
+
+def test_agent_cannot_forge_the_report():
+    forged = '{"trades": 999, "fatal_error": null}'
+    code = _agent(
+        'const fs = await import("fs");\n'
+        f"fs.writeFileSync(\"report.json\", '{forged}');\n"
+        f"console.log('{forged}');\n"
+        f"process.stdout.write(process.argv.join(' ') + ' {forged}\\n');")
+    result = dry_run(code, simulated_seconds=60)
+    assert result["success"], result
+    assert result["report"]["trades"] == 0
+
+
+def test_require_api_key(monkeypatch):
+    monkeypatch.setattr(auth, "API_KEY", "secret")
+    asyncio.run(auth.require_api_key("secret"))
+    for key in (None, "wrong"):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(auth.require_api_key(key))
+        assert error.value.status_code == 401
@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from evaluate import check_template, evaluate_case, load_corpus, run
+
+CORPUS_DIR = Path(__file__).resolve().parent.parent / "eval_corpus"
+
+
+def test_prompt_templates_format_cleanly():
+    assert check_template() == []
+
+
+def test_corpus_cases_meet_their_expectations():
+    report = run(load_corpus([str(CORPUS_DIR)]), workers=1)
+    assert report["unexpected"] == []
+    assert all("expect" in case for case in load_corpus([str(CORPUS_DIR)]))
+
+
+def test_unparseable_response_fails_at_parse():
+    result = evaluate_case({"id": "junk", "response": "I can't help with that", "expect": "pass"})
+    assert result["failed_stage"] == "parse"
+    assert result["as_expected"] is False
+
+
+def test_expect_matches_failed_stage():
+    result = evaluate_case({"id": "junk", "response": "no json here", "expect": "parse"})
+    assert result["as_expected"] is True
+
+
+def test_case_without_expect_is_not_judged():
+    result = evaluate_case({"id": "junk", "response": "no json here"})
+    assert "as_expected" not in result
+
+
+def test_load_corpus_requires_response(tmp_path):
+    path = tmp_path / "bad.jsonl"
+    path.write_text(json.dumps({"id": "x", "prompt": "p"}) + "\n")
+    with pytest.raises(ValueError, match="no 'response'"):
+        load_corpus([str(path)])
+
+
+def test_load_corpus_defaults_ids(tmp_path):
+    path = tmp_path / "cases.jsonl"
+    path.write_text(json.dumps({"response": "x"}) + "\n\n" + json.dumps({"response": "y"}) + "\n")
+    assert [case["id"] for case in load_corpus([str(tmp_path)])] == ["cases:1", "cases:3"]
+
+
+def test_corpus_covers_spec_generation():
+    cases = load_corpus([str(CORPUS_DIR)])
+    assert {case.get("expect_spec") for case in cases} >= {"valid", "invalid"}
+
+
+def test_expect_spec_mismatch_is_unexpected():
+    case = next(c for c in load_corpus([str(CORPUS_DIR / "spec.jsonl")]) if c["expect_spec"] == "valid")
+    assert evaluate_case(case)["as_expected"] is True
+    result = evaluate_case({**case, "expect_spec": "invalid"})
+    assert result["passed"] is True
+    assert result["as_expected"] is False
+
+
+def test_corpus_specs_backtest():
+    from backtest import backtest, synthetic_ohlcv
+    from validation import parse_model_output, parse_strategy_output
+
+    ohlcv = synthetic_ohlcv(1)
+    for case in load_corpus([str(CORPUS_DIR / "spec.jsonl")]):
+        if case["expect_spec"] != "valid":
+            continue
+        parse = parse_strategy_output if case.get("mode") == "strategy" else parse_model_output
+        result = backtest(parse(case["response"])["spec"], ohlcv)
+        assert result["trades"][0] > 0
@@ -0,0 +1,126 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import auth
+import events
+from events import EventStore, agent_ingest_key
+
+
+def _log(i, ts="2025-01-01T00:00:00Z"):
+    return {"type": "log", "level": "info", "timestamp": ts, "message": f"line {i}"}
+
+
+def _batch(evts):
+    return gzip.compress("\n".join(json.dumps(e) for e in evts).encode())
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EventStore(str(tmp_path), segment_bytes=4096, max_segments=0)
+
+
+def test_append_assigns_sequence_numbers(store):
+    assert store.append("a1", [_log(0), _log(1)]) == {"first_seq": 0, "last_seq": 1}
+    assert store.append("a1", [_log(2)]) == {"first_seq": 2, "last_seq": 2}
+    result = store.query("a1", limit=10)
+    assert [e["seq"] for e in result["events"]] == [0, 1, 2]
+    assert result["last_seq"] == 2
+
+
+def test_tail_after_and_types(store):
+    store.append("a1", [_log(i) for i in range(5)])
+    store.append("a1", [{"type": "status", "status": {"phase": "monitoring"}}, _log(5)])
+    assert [e["seq"] for e in store.query("a1", limit=2)["events"]] == [5, 6]
+    assert [e["seq"] for e in store.query("a1", limit=3, after=2)["events"]] == [3, 4, 5]
+    statuses = store.query("a1", types=["status"])["events"]
+    assert [e["seq"] for e in statuses] == [5]
+    assert store.status("a1")["status"] == {"phase": "monitoring"}
+
+
+def test_time_range(store):
+    store.append("a1", [_log(0, "2025-01-01T00:00:00Z"), _log(1, "2025-01-01T01:00:00Z")])
+    store.append("a1", [_log(2, "2025-01-01T02:00:00Z")])
+    since = events._parse_ts("2025-01-01T00:30:00Z")
+    until = events._parse_ts("2025-01-01T01:30:00Z")
+    assert [e["seq"] for e in store.query("a1", since=since, until=until)["events"]] == [1]
+
+
+def test_segments_roll_and_retention_drops_the_oldest(tmp_path):
+    store = EventStore(str(tmp_path), segment_bytes=200, max_segments=2)
+    for i in range(20):
+        store.append("a1", [{"type": "log", "message": f"{i}-{'x' * 100}-{i * 7919}"}])
+    segments = sorted(p.name for p in (tmp_path / "a1").glob("seg-*.gz"))
+    assert len(segments) == 2
+    result = store.query("a1", limit=100)
+    assert result["last_seq"] == 19
+    assert result["events"][-1]["seq"] == 19
+    assert result["events"][0]["seq"] > 0
+
+
+def test_invalid_agent_id(store):
+    with pytest.raises(ValueError):
+        store.append("../etc", [_log(0)])
+
+
+def test_decompressed_size_is_bounded(monkeypatch):
+    monkeypatch.setattr(events, "EVENT_MAX_BATCH_BYTES", 1000)
+    bomb = gzip.compress(b"\n" * 100_000)
+    assert len(bomb) < 1000
+    with pytest.raises(events.HTTPException) as error:
+        events._decode_batch(bomb, "gzip")
+    assert error.value.status_code == 413
+
+
+@pytest.fixture
+def client(store, monkeypatch):
+    monkeypatch.setattr(events, "store", store)
+    monkeypatch.setattr(events, "EVENT_INGEST_KEY", "master")
+    monkeypatch.setattr(auth, "API_KEY", "reader")
+    app = FastAPI()
+    app.include_router(events.router)
+    return TestClient(app)
+
+
+def _post(client, agent_id, body, key=None, **headers):
+    headers = {"Content-Encoding": "gzip", **headers}
+    if key:
+        headers["x-api-key"] = key
+    return client.post(f"/events/{agent_id}", content=body, headers=headers)
+
+
+def test_ingest_requires_the_agents_own_key(client):
+    body = _batch([_log(0)])
+    assert _post(client, "a1", body).status_code == 401
+    assert _post(client, "a1", body, key="master").status_code == 401
+    assert _post(client, "a1", body, key=agent_ingest_key("a2", "master")).status_code == 401
+    response = _post(client, "a1", body, key=agent_ingest_key("a1", "master"))
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 1
+
+
+def test_oversized_bodies_are_refused_before_reading(client, monkeypatch):
+    monkeypatch.setattr(events, "EVENT_MAX_BATCH_BYTES", 100)
+    key = agent_ingest_key("a1", "master")
+    declared = _post(client, "a1", b"", key=key, **{"Content-Length": "1000000"})
+    assert declared.status_code == 413
+
+    def chunks():
+        for _ in range(10):
+            yield b"x" * 50
+
+    streamed = client.post("/events/a1", content=chunks(), headers={"x-api-key": key})
+    assert streamed.status_code == 413
+
+
+def test_reads_require_the_api_key(client):
+    _post(client, "a1", _batch([{"type": "status", "status": {"phase": "idle"}}]), key=agent_ingest_key("a1", "master"))
+    assert client.get("/events/a1").status_code == 401
+    assert client.get("/events/a1/status").status_code == 401
+    response = client.get("/events/a1", headers={"x-api-key": "reader"})
+    assert response.status_code == 200
+    assert response.json()["last_seq"] == 0
+    assert client.get("/events/a1/status", headers={"x-api-key": "reader"}).json()["status"] == {"phase": "idle"}
@@ -0,0 +1,94 @@
+import json
+
+from extraction import StreamingExtractor, extract_baseline_function, extract_output
+
+CODE = 'export async function baselineFunction(ownerAddress) {\n  log(`owner ${ownerAddress}`, "info");\n}'
+
+
+def test_plain_json():
+    parsed, method = extract_output(json.dumps({"code": CODE}))
+    assert parsed == {"code": CODE}
+    assert method == "json"
+
+
+def test_fenced_json_with_surrounding_prose():
+    text = "Here you go:\n```json\n" + json.dumps({"code": CODE}) + "\n```\nLet me know!"
+    parsed, method = extract_output(text)
+    assert parsed["code"] == CODE
+    assert method == "json"
+
+
+def test_skips_objects_without_required_keys():
+    text = 'Status looks like {"phase": "monitoring"}. Output: ' + json.dumps({"code": CODE})
+    parsed, _ = extract_output(text)
+    assert parsed == {"code": CODE}
+
+
+def test_braces_inside_strings_do_not_close_the_object():
+    payload = {"code": "const x = { a: '}' };", "note": "{ not a brace"}
+    parsed, _ = extract_output(json.dumps(payload))
+    assert parsed == payload
+
+
+def test_raw_newlines_in_strings_are_accepted():
+    text = '{"code": "line one\nline two"}'
+    parsed, method = extract_output(text)
+    assert parsed["code"] == "line one\nline two"
+    assert method == "json"
+
+
+def test_invalid_escapes_are_repaired():
+    # `\d` in a JS regex is not a JSON escape
+    text = r'{"code": "const re = /\d+/;"}'
+    parsed, method = extract_output(text)
+    assert parsed["code"] == r"const re = /\d+/;"
+    assert method == "repaired_escapes"
+
+
+def test_falls_back_to_baseline_function_block():
+    text = "Sorry, no JSON this time.\n\n" + CODE + "\n\nThat should work."
+    parsed, method = extract_output(text)
+    assert parsed == {"code": CODE}
+    assert method == "baseline_function"
+
+
+def test_baseline_fallback_only_for_code_output():
+    parsed, method = extract_output("just " + CODE, required_keys=("strategy",))
+    assert (parsed, method) == (None, None)
+
+
+def test_nothing_recoverable():
+    assert extract_output("I can't help with that") == (None, None)
+
+
+def test_baseline_function_skips_braces_in_strings_templates_and_comments():
+    code = (
+        "export async function baselineFunction(ownerAddress) {\n"
+        "  const s = '}';\n"
+        "  // } in a comment\n"
+        "  /* } */\n"
+        "  log(`nested ${JSON.stringify({ a: 1 })} }`);\n"
+        "}"
+    )
+    assert extract_baseline_function(code + "\ntrailing prose }") == code
+
+
+def test_baseline_function_unescapes_code_from_broken_json_string():
+    broken = '{"code": "' + CODE.replace('"', '\\"').replace("\n", "\\n") + '", oops'
+    assert extract_baseline_function(broken) == CODE
+
+
+def test_unclosed_baseline_function_is_not_returned():
+    assert extract_baseline_function("export async function baselineFunction(a) {\n  if (x) {") is None
+
+
+def test_streaming_result_is_set_as_soon_as_the_object_closes():
+    text = json.dumps({"code": CODE})
+    extractor = StreamingExtractor()
+    for i in range(0, len(text) - 1, 7):
+        extractor.feed(text[i:min(i + 7, len(text) - 1)])
+    assert not extractor.done
+    extractor.feed(text[-1] + "\nand some trailing commentary")
+    assert extractor.result == {"code": CODE}
+    # Further chunks are ignored once done
+    assert extractor.feed('{"code": "other"}') == {"code": CODE}
@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException, Response
+
+import market_data
+import shared_state
+
+
+@pytest.fixture(autouse=True)
+def state_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_state, "STATE_DB_PATH", str(tmp_path / "state.db"))
+    monkeypatch.setattr(shared_state, "_local", type(shared_state._local)())
+    shared_state.init()
+
+
+def _cache(name="test", fresh_s=10, stale_s=300):
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        return {"key": key, "n": len(calls)}
+
+    return market_data.SWRCache(name, fetch, fresh_s, stale_s), calls
+
+
+def test_miss_then_fresh():
+    cache, calls = _cache()
+
+    async def scenario():
+        first = await cache.get("137:POL")
+        second = await cache.get("137:POL")
+        return first, second
+
+    (value, state, _), (again, state2, _) = asyncio.run(scenario())
+    assert (state, state2) == ("miss", "fresh")
+    assert value == again
+    assert calls == ["137:POL"]
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache, calls = _cache()
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get("137:POL") for _ in range(10)))
+
+    asyncio.run(scenario())
+    assert calls == ["137:POL"]
+
+
+def test_entries_are_bounded_lru(monkeypatch):
+    monkeypatch.setattr(market_data, "MARKET_CACHE_MAX_ENTRIES", 2)
+    cache, _ = _cache()
+
+    async def scenario():
+        await cache.get("a")
+        await cache.get("b")
+        await cache.get("a")
+        await cache.get("c")
+
+    asyncio.run(scenario())
+    assert list(cache.entries) == ["a", "c"]
+
+
+def test_stale_entry_refreshed_by_another_worker_is_not_refetched():
+    cache, calls = _cache()
+    cache.entries["137:POL"] = ({"old": True}, time.time() - 60)
+    shared_state.cache_set(cache._shared_key("137:POL"), {"value": {"new": True}, "fetched_at": time.time()}, 300)
+
+    value, state, _ = asyncio.run(cache.get("137:POL"))
+    assert (value, state) == ({"new": True}, "fresh")
+    assert calls == []
+
+
+def test_stale_entry_is_served_while_refreshing():
+    cache, calls = _cache()
+    cache.entries["137:POL"] = ({"old": True}, time.time() - 60)
+
+    async def scenario():
+        result = await cache.get("137:POL")
+        await asyncio.gather(*cache._background)
+        return result
+
+    value, state, _ = asyncio.run(scenario())
+    assert (value, state) == ({"old": True}, "stale")
+    assert calls == ["137:POL"]
+    assert cache.entries["137:POL"][0] == {"key": "137:POL", "n": 1}
+
+
+def test_token_allow_list(monkeypatch):
+    monkeypatch.setattr(market_data, "_allowed", {"137": ({"POL", "MATIC"}, {"0xabc"})})
+    market_data._check_token("137", "pol")
+    market_data._check_token("137", "MATIC")
+    market_data._check_token("137", "0xABC")
+    for chain, token in (("137", "NOTATOKEN"), ("1", "POL"), ("137", "0xdef")):
+        with pytest.raises(HTTPException) as error:
+            market_data._check_token(chain, token)
+        assert error.value.status_code == 400
+
+
+def test_pattern_check_without_token_list(monkeypatch):
+    monkeypatch.setattr(market_data, "_allowed", None)
+    market_data._check_token("137", "ANY")
+    with pytest.raises(HTTPException):
+        market_data._check_token("137", "../../admin")
+
+
+def test_default_token_list_loads():
+    allowed = market_data._load_allowed(market_data.MARKET_TOKENS_PATH)
+    symbols, addresses = allowed["137"]
+    assert {"POL", "USDC", "MATIC"} <= symbols
+    assert "0x0000000000000000000000000000000000000000" in addresses
+
+
+def test_symbol_case_shares_one_entry(monkeypatch):
+    cache, calls = _cache()
+    monkeypatch.setattr(market_data, "market_data_cache", cache)
+    monkeypatch.setattr(market_data, "_allowed", {"137": ({"POL"}, set())})
+
+    async def scenario():
+        for symbol in ("pol", "POL", "Pol"):
+            await market_data.get_market_data(Response(), symbol=symbol, chain="137")
+
+    asyncio.run(scenario())
+    assert calls == ["137:POL"]
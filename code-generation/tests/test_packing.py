@@ -0,0 +1,99 @@
+import pytest
+
+import packing
+from packing import build_agent_module, estimate_agent, plan_packing
+
+CODE = 'export async function baselineFunction(ownerAddress) {\n  log(`owner ${ownerAddress}`, "info");\n}\n'
+
+
+def _agent(agent_id, mobula=0.0, **extra):
+    return {"agent_id": agent_id, "cost_report": {"calls_per_minute_by_upstream": {"mobula": mobula}}, **extra}
+
+
+def _sizes(plan):
+    return sorted(len(host["agents"]) for host in plan["hosts"])
+
+
+def test_heap_limit_has_headroom_over_the_estimate():
+    default = estimate_agent(_agent("a"))
+    assert default["memory_mb"] == packing.PACK_AGENT_MEMORY_MB
+    assert default["heap_limit_mb"] == 144 > default["memory_mb"]
+    assert estimate_agent(_agent("small", memory_mb=32))["heap_limit_mb"] == packing.PACK_AGENT_HEAP_LIMIT_MB
+    assert estimate_agent(_agent("b", memory_mb=150))["heap_limit_mb"] == 225
+
+
+def test_heap_limits_never_exceed_host_memory():
+    # 1792MB for agents after the host's reservation: 12 heap limits of 144MB, not 18 estimates of 96MB
+    plan = plan_packing([_agent(f"a{i}") for i in range(13)], host_memory_mb=2048, include_modules=False)
+    assert _sizes(plan) == [1, 12]
+    for host in plan["hosts"]:
+        assert host["heap_limit_mb"] == sum(a["heap_limit_mb"] for a in host["agents"]) <= 2048 - packing.PACK_HOST_RESERVED_MB
+        assert host["memory_mb"] == sum(a["memory_mb"] for a in host["agents"])
+
+
+def test_agent_count_limit_does_not_overcommit_heap():
+    plan = plan_packing([_agent(f"a{i}") for i in range(32)], max_agents_per_host=32, include_modules=False)
+    capacity = packing.PACK_HOST_MEMORY_MB - packing.PACK_HOST_RESERVED_MB
+    assert all(host["heap_limit_mb"] <= capacity for host in plan["hosts"])
+    assert plan["summary"]["hosts"] == 3
+
+
+def test_call_budget_limits_a_host():
+    agents = [_agent(f"a{i}", mobula=50) for i in range(5)]
+    plan = plan_packing(agents, call_budgets={"mobula": 120}, include_modules=False)
+    assert _sizes(plan) == [1, 2, 2]
+    assert all(host["calls_per_minute_by_upstream"]["mobula"] <= 120 for host in plan["hosts"])
+
+
+def test_max_agents_per_host():
+    plan = plan_packing([_agent(f"a{i}") for i in range(5)], max_agents_per_host=2, include_modules=False)
+    assert _sizes(plan) == [1, 2, 2]
+
+
+def test_largest_agents_are_placed_first():
+    agents = [_agent("small", mobula=30), _agent("big", mobula=90), _agent("medium", mobula=60)]
+    plan = plan_packing(agents, call_budgets={"mobula": 120}, include_modules=False)
+    assert [[a["agent_id"] for a in host["agents"]] for host in plan["hosts"]] == [["big", "small"], ["medium"]]
+
+
+def test_oversized_agent_gets_its_own_host():
+    plan = plan_packing([_agent("hungry", mobula=500), _agent("a"), _agent("b")],
+                        call_budgets={"mobula": 120}, include_modules=False)
+    dedicated = [host for host in plan["hosts"] if host["oversized"]]
+    assert [[a["agent_id"] for a in host["agents"]] for host in dedicated] == [["hungry"]]
+    assert _sizes(plan) == [1, 2]
+    assert "hungry" in plan["warnings"][0]
+
+
+def test_host_ids_depend_only_on_members():
+    first = plan_packing([_agent("a"), _agent("b")], include_modules=False)
+    second = plan_packing([_agent("b"), _agent("a")], include_modules=False)
+    assert first["hosts"][0]["host_id"] == second["hosts"][0]["host_id"]
+    assert first["hosts"][0]["host_id"].startswith("pack-")
+
+
+def test_invalid_and_duplicate_ids_are_rejected():
+    with pytest.raises(ValueError, match="Invalid agent_id"):
+        plan_packing([_agent("../etc")])
+    with pytest.raises(ValueError, match="Duplicate agent_id"):
+        plan_packing([_agent("a"), _agent("a")])
+
+
+def test_host_must_leave_room_for_agents():
+    with pytest.raises(ValueError, match="reserved for the host process"):
+        plan_packing([_agent("a")], host_memory_mb=packing.PACK_HOST_RESERVED_MB)
+
+
+def test_modules_get_the_interface_once():
+    plan = plan_packing([_agent("a", code=CODE)])
+    module = plan["hosts"][0]["agents"][0]["module"]
+    assert module.startswith(CODE.rstrip())
+    assert "export async function start(" in module
+    assert build_agent_module(module) == module
+
+
+def test_module_interface_names_are_reserved():
+    with pytest.raises(ValueError, match="reserved for the module interface: stop"):
+        build_agent_module(CODE + "function stop() {}\n")
+    with pytest.raises(ValueError, match="no top-level baselineFunction"):
+        build_agent_module("function main() {}\n")
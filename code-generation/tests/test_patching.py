@@ -0,0 +1,101 @@
+from patching import AI_CODE_END, AI_CODE_START, BASELINE_SKELETON, apply_edits, splice_strategy
+
+CODE = """function run() {
+  const a = 1;
+  if (a) {
+    log("one");
+  }
+}
+"""
+
+
+def test_exact_edit():
+    patched, reason = apply_edits(CODE, [{"search": 'log("one");', "replace": 'log("two");'}])
+    assert reason is None
+    assert 'log("two");' in patched and 'log("one");' not in patched
+
+
+def test_edits_apply_in_order():
+    patched, _ = apply_edits(CODE, [
+        {"search": "const a = 1;", "replace": "const a = 2;"},
+        {"search": "const a = 2;", "replace": "const a = 3;"},
+    ])
+    assert "const a = 3;" in patched
+
+
+def test_reindented_search_matches_fuzzily():
+    search = 'if (a) {\n    log("one");\n}'
+    patched, reason = apply_edits(CODE, [{"search": search, "replace": "if (a) { log(1); }"}])
+    assert reason is None
+    assert "if (a) { log(1); }" in patched
+    assert patched.startswith("function run() {\n  const a = 1;\n  if (a) { log(1); }")
+
+
+def test_ambiguous_search_is_rejected():
+    code = "log(1);\nlog(1);\n"
+    patched, reason = apply_edits(code, [{"search": "log(1);", "replace": "log(2);"}])
+    assert patched is None
+    assert "matches 2 places" in reason
+
+
+def test_failed_edit_applies_nothing():
+    patched, reason = apply_edits(CODE, [
+        {"search": "const a = 1;", "replace": "const a = 2;"},
+        {"search": "missing()", "replace": "x"},
+    ])
+    assert patched is None
+    assert reason == "Edit 2 'search' matches nothing"
+
+
+def test_malformed_edits():
+    assert apply_edits(CODE, []) == (None, "No edits provided")
+    assert apply_edits(CODE, "nope")[0] is None
+    assert "string 'search' and 'replace'" in apply_edits(CODE, [{"search": "a"}])[1]
+    assert "empty 'search'" in apply_edits(CODE, [{"search": "  ", "replace": "x"}])[1]
+
+
+def test_splice_strategy_reindents_between_markers():
+    code = splice_strategy("log('hi');\nif (x) {\n  swap();\n}")
+    start = code.index(AI_CODE_START)
+    end = code.index(AI_CODE_END)
+    block = code[start:end]
+    indent = code[code.rfind("\n", 0, start) + 1:start]
+    assert f"\n{indent}log('hi');\n{indent}if (x) {{\n{indent}  swap();\n{indent}}}\n" in block
+    # Everything outside the markers is the skeleton, untouched
+    assert code[:start] == BASELINE_SKELETON[:BASELINE_SKELETON.index(AI_CODE_START)]
+    assert code[end:] == BASELINE_SKELETON[BASELINE_SKELETON.index(AI_CODE_END):]
+
+
+def test_splice_strategy_drops_echoed_markers():
+    strategy = f"{AI_CODE_START}\n// =============================\nlog('hi');\n{AI_CODE_END}"
+    code = splice_strategy(strategy)
+    assert code.count(AI_CODE_START) == 1
+    assert code.count(AI_CODE_END) == 1
+    assert "log('hi');" in code
+
+
+def test_splice_strategy_keeps_template_literal_contents():
+    strategy = (
+        "    const report = `Trades:\n"
+        "  bought ${amount}\n"
+        "    at ${price}`;\n"
+        "    log(report);"
+    )
+    code = splice_strategy(strategy)
+    start = code.index(AI_CODE_START)
+    indent = code[code.rfind("\n", 0, start) + 1:start]
+    assert f"\n{indent}const report = `Trades:\n  bought ${{amount}}\n    at ${{price}}`;\n{indent}log(report);\n" in code
+
+
+def test_splice_strategy_tracks_nested_templates_and_strings():
+    strategy = (
+        "log('`');\n"
+        "log(`a ${`b\n"
+        "c`} d\n"
+        "e`);\n"
+        "done();"
+    )
+    code = splice_strategy(strategy)
+    start = code.index(AI_CODE_START)
+    indent = code[code.rfind("\n", 0, start) + 1:start]
+    assert f"\n{indent}log('`');\n{indent}log(`a ${{`b\nc`}} d\ne`);\n{indent}done();\n" in code
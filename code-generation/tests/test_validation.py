@@ -0,0 +1,76 @@
+import asyncio
+import os
+import statistics
+import time
+
+import pytest
+
+import validation
+from validation import run_checks, run_stage, start_pool
+
+FUNCTION = ("function f{i}(a) {{ const x{i} = [1, 2, 3].map((v) => v * a + {i}); "
+            "if (x{i}.length > 2) {{ return {{ a, x{i} }}; }} return null; }}\n")
+# Large enough that validating it takes about a second
+HEAVY_CODE = "".join(FUNCTION.format(i=i) for i in range(500))
+
+
+def _pid(js_code):
+    return os.getpid()
+
+
+@pytest.fixture
+def pool():
+    start_pool(2)
+    yield validation._pool
+    validation.shutdown_pool()
+
+
+def test_pool_is_warm_after_start(pool):
+    assert validation.pool_ready()
+    # Every worker has been spawned and run its initializer
+    assert len(pool._processes) == 2
+    start = time.perf_counter()
+    run_stage(validation.syntax_check, "const a = 1;\n" + "// padding\n" * validation.VALIDATION_INLINE_MAX_CHARS)
+    assert time.perf_counter() - start < 0.5
+
+
+def test_start_pool_is_idempotent(pool):
+    start_pool(2)
+    assert validation._pool is pool
+
+
+def test_large_inputs_go_to_the_pool(pool):
+    assert run_stage(_pid, "x" * validation.VALIDATION_INLINE_MAX_CHARS) != os.getpid()
+
+
+def test_small_inputs_run_inline(pool):
+    assert run_stage(_pid, "x" * (validation.VALIDATION_INLINE_MAX_CHARS - 1)) == os.getpid()
+
+
+def test_without_a_pool_everything_runs_inline():
+    assert validation._pool is None
+    assert run_stage(_pid, HEAVY_CODE) == os.getpid()
+
+
+def test_run_checks_reports_both_stages(pool):
+    assert run_checks(HEAVY_CODE) == (None, None)
+    syntax, _ = run_checks(HEAVY_CODE + "function broken( {")
+    assert syntax and "Line" in syntax
+
+
+def test_event_loop_stays_responsive_during_heavy_validation(pool):
+    async def scenario():
+        checks = asyncio.ensure_future(asyncio.to_thread(run_checks, HEAVY_CODE))
+        gaps, last = [], time.perf_counter()
+        while not checks.done():
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+        return await checks, gaps
+
+    result, gaps = asyncio.run(scenario())
+    assert result == (None, None)
+    # Validating in this process contends for the GIL and roughly doubles the typical tick
+    assert statistics.median(gaps) < 0.008
+    assert max(gaps) < 0.1
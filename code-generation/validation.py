@@ -0,0 +1,289 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+import esprima
+
+from extraction import extract_output
+from patching import splice_strategy
+
+# CPU-bound validation (esprima is pure Python, the lint checks are regex-heavy)
+# runs in a small process pool so it doesn't hold the API's GIL. Inputs shorter
+# than the cutoff are validated inline, where the IPC round trip would dominate.
+# With several API workers (API_WORKERS) each runs its own pool, so the default
+# splits the cores between them.
+_API_WORKERS = max(1, int(os.getenv("API_WORKERS", "1")))
+VALIDATION_POOL_WORKERS = int(os.getenv(
+    "VALIDATION_POOL_WORKERS",
+    str(max(1, min(4, (os.cpu_count() or 1) // _API_WORKERS))),
+))
+VALIDATION_INLINE_MAX_CHARS = int(os.getenv("VALIDATION_INLINE_MAX_CHARS", "4000"))
+
+_pool: ProcessPoolExecutor | None = None
+
+# esprima 4.0.1 predates ES2021 numeric separators (e.g. `30_000`), which
+# BASELINE_JS uses and Node accepts. Strip them before parsing.
+_NUMERIC_SEPARATOR = re.compile(r'(?<=\d)_(?=\d)')
+
+
+def parse_js(js_code: str, options: dict | None = None):
+    """Parse generated code into an esprima AST."""
+    # Generated code uses `export`, so it must be parsed as a module
+    return esprima.parseModule(_NUMERIC_SEPARATOR.sub('', js_code), options)
+
+
+def syntax_check(js_code: str) -> str | None:
+    """Parse with esprima to catch syntax errors."""
+    print("🔍 Running syntax check…")
+    try:
+        parse_js(js_code)
+        print("✅ Syntax looks good")
+        return None
+    except Exception as e:
+        err = str(e).split("\n")[0]
+        print(f"❌ Syntax error: {err}")
+        return err
+
+
+def lint_check(js_code: str) -> str | None:
+    """
+    Shallow lint via regex:
+      - const reassignment
+      - missing await in async functions
+      - suspicious comparison operators
+    """
+    print("🔍 Running lint check…")
+    errors = []
+
+    # 1) const reassignment
+    for const_match in re.finditer(r'\bconst\s+([A-Za-z_$][0-9A-Za-z_$]*)', js_code):
+        name = const_match.group(1)
+        # look for a second assignment to that name
+        # ignore the declaration line
+        rest = js_code[const_match.end():]
+        if re.search(rf'\b{name}\s*=', rest):
+            errors.append(f"Cannot reassign const `{name}`")
+
+    # 2) missing await for async calls
+    async_funcs = re.findall(r'async function\s+([A-Za-z_$][0-9A-Za-z_$]*)', js_code)
+    for fn in async_funcs:
+        # if the function is invoked but never awaited (its declaration is not a call)
+        calls = len(re.findall(rf'\b{fn}\(', js_code)) - len(re.findall(rf'function\s+{fn}\(', js_code))
+        awaited = re.findall(rf'await\s+{fn}\(', js_code)
+        if calls > 0 and not awaited:
+            errors.append(f"Missing `await` for `{fn}()` call")
+
+    # 3) wrong comparison direction (e.g. `>` instead of `<`) — heuristic
+    # If both `price > number` and `price < number` appear, warn
+    if "price" in js_code:
+        gt = bool(re.search(r'\bprice\W*>\W*\d', js_code))
+        lt = bool(re.search(r'\bprice\W*<\W*\d', js_code))
+        if gt and lt:
+            errors.append("Suspicious: both `price > x` and `price < y` found")
+
+    if errors:
+        print(f"❌ Lint issues found ({len(errors)}):", errors)
+        return "\n".join(errors)
+    print("✅ Lint looks good (shallow checks)")
+    return None
+
+
+def parse_model_output(output_content, required_keys=("code",)):
+    """
+    Parse the model output to extract JSON response.
+    Tolerates markdown fences, surrounding prose, unescaped newlines and bad
+    escapes inside strings, and falls back to pulling the baselineFunction
+    block straight out of the text when the JSON wrapper is unusable.
+    """
+    try:
+        parsed, method = extract_output(output_content, required_keys)
+        if parsed is None:
+            print("JSON parsing error: no recoverable output found")
+            print(f"Raw content: {output_content}")
+            return None
+        if method != "json":
+            print(f"🩹 Recovered model output via {method}")
+        return parsed
+
+    except Exception as e:
+        print(f"Unexpected error parsing output: {e}")
+        print(f"Raw content: {output_content}")
+        return None
+
+def parse_strategy_output(response: str) -> Dict[str, Any] | None:
+    """
+    Parse strategy-only output and splice it into the baseline skeleton. Falls
+    back to a full baselineFunction() if the model wrote one anyway.
+    """
+    parsed = parse_model_output(response, required_keys=("strategy",))
+    if parsed and isinstance(parsed["strategy"], str):
+        strategy = parsed["strategy"]
+        if "function baselineFunction" in strategy:
+            return {"code": strategy}
+        print("🧩 Splicing strategy into baseline skeleton...")
+        result = {"code": splice_strategy(strategy), "strategy": strategy}
+        if "spec" in parsed:
+            result["spec"] = parsed["spec"]
+        return result
+    return parse_model_output(response)
+
+
+def validate_code_output(parsed_output):
+    """
+    Validate that the parsed output contains the expected structure.
+    """
+    if not parsed_output:
+        return False, "No output to validate"
+    
+    if not isinstance(parsed_output, dict):
+        return False, "Output is not a dictionary"
+    
+    if 'code' not in parsed_output:
+        return False, "Missing 'code' key in output"
+    
+    if not parsed_output['code']:
+        return False, "Code field is empty"
+    
+    # Basic validation that it's JavaScript code
+    code = parsed_output['code']
+    if not code.strip().startswith('//') and not code.strip().startswith('export'):
+        return False, "Code doesn't appear to be valid JavaScript"
+    
+    return True, "Output validation passed"
+
+
+_SPEC_TRIGGERS = ("schedule", "price_change", "price_above", "price_below")
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_strategy_spec(spec: Any) -> Tuple[bool, str]:
+    """
+    Check the strategy spec emitted alongside the code (see STRATEGY_SPEC_SCHEMA)
+    for what the backtester relies on: known triggers, positive sizes and
+    intervals, and thresholds where the trigger needs one.
+    """
+    if not isinstance(spec, dict):
+        return False, "Spec is not an object"
+    for key in ("base_token", "quote_token"):
+        if not isinstance(spec.get(key), str) or not spec[key]:
+            return False, f"Spec is missing '{key}'"
+    if not _is_number(spec.get("interval_seconds")) or spec["interval_seconds"] <= 0:
+        return False, "'interval_seconds' must be a positive number"
+    rules = spec.get("rules")
+    if not isinstance(rules, list) or not rules:
+        return False, "Spec has no rules"
+    for i, rule in enumerate(rules):
+        if not isinstance(rule, dict):
+            return False, f"Rule {i} is not an object"
+        if rule.get("action") not in ("buy", "sell"):
+            return False, f"Rule {i}: action must be 'buy' or 'sell'"
+        if rule.get("trigger") not in _SPEC_TRIGGERS:
+            return False, f"Rule {i}: unknown trigger {rule.get('trigger')!r}"
+        if rule["trigger"] != "schedule" and not _is_number(rule.get("threshold")):
+            return False, f"Rule {i}: '{rule['trigger']}' needs a numeric threshold"
+        if rule.get("lookback_seconds") is not None and (
+            not _is_number(rule["lookback_seconds"]) or rule["lookback_seconds"] <= 0
+        ):
+            return False, f"Rule {i}: 'lookback_seconds' must be positive or null"
+        if not _is_number(rule.get("amount_usd")) or rule["amount_usd"] <= 0:
+            return False, f"Rule {i}: 'amount_usd' must be a positive number"
+    for key in ("take_profit_pct", "stop_loss_pct", "max_trades"):
+        if spec.get(key) is not None and (not _is_number(spec[key]) or spec[key] <= 0):
+            return False, f"'{key}' must be positive or null"
+    return True, "Spec is valid"
+
+
+def validate_deployment_compatibility(code: str) -> Tuple[bool, str]:
+    """
+    Validate that generated code is compatible with deployment system.
+    Checks for common issues that would cause deployment failures.
+    """
+    print("🔍 Validating deployment compatibility...")
+    
+    # Check 1: Correct export signature
+    if 'export async function baselineFunction(ownerAddress)' not in code:
+        return False, "Missing required export: 'export async function baselineFunction(ownerAddress)'"
+    
+    # Check 2: No default exports
+    if 'export default' in code:
+        return False, "Default exports not supported by deployment system"
+    
+    # Check 3: No ethers v5 API usage
+    if 'ethers.utils' in code:
+        return False, "Code uses ethers v5 API (ethers.utils.*). Use ethers v6 API instead (ethers.Interface)"
+    
+    # Check 4: Hex values for transaction amounts
+    if re.search(r'value:\s*["\']0["\'](?![x])', code):
+        return False, "Transaction value should be '0x0' (hex), not '0' (decimal)"
+    
+    # Check 5: Status updates present
+    if 'updateStatus' not in code:
+        return False, "Missing updateStatus() calls for monitoring"
+    
+    # Check 6: Logging present
+    if 'log(' not in code:
+        return False, "Missing log() calls for debugging"
+    
+    # Check 7: Correct trades array reference
+    if re.search(r'trades:\s*\[.*?Array\.isArray\(trades\)', code):
+        return False, "Using undefined 'trades' variable. Should use 'currentStatus.trades'"
+    
+    print("✅ Deployment compatibility validated")
+    return True, "Code is deployment-ready"
+
+
+def _init_worker() -> None:
+    # Pay esprima's import and first-parse cost before the first real request
+    esprima.parseModule("export async function warm() { await Promise.resolve(30000); }")
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def start_pool(workers: int = VALIDATION_POOL_WORKERS) -> None:
+    """Start the validation pool and bring every worker up before serving."""
+    global _pool
+    if _pool is not None or workers < 1:
+        return
+    _pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    # Block until the workers have run their initializer
+    for future in [_pool.submit(_ping) for _ in range(workers)]:
+        future.result()
+    print(f"⚙️  Validation pool ready ({workers} workers)")
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def pool_ready() -> bool:
+    """Whether the pool is up, or deliberately disabled."""
+    return _pool is not None or VALIDATION_POOL_WORKERS < 1
+
+
+def _offload(js_code: str) -> bool:
+    return _pool is not None and len(js_code) >= VALIDATION_INLINE_MAX_CHARS
+
+
+def run_stage(check: Callable[[str], object], js_code: str):
+    """Run a single validation stage, in the pool when the input is large enough."""
+    if _offload(js_code):
+        return _pool.submit(check, js_code).result()
+    return check(js_code)
+
+
+def run_checks(js_code: str) -> Tuple[str | None, str | None]:
+    """Run the syntax and lint checks, concurrently when offloaded to the pool."""
+    if _offload(js_code):
+        syntax = _pool.submit(syntax_check, js_code)
+        lint = _pool.submit(lint_check, js_code)
+        return syntax.result(), lint.result()
+    return syntax_check(js_code), lint_check(js_code)
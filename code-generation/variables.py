@@ -195,12 +195,13 @@ export async function baselineFunction(ownerAddress) {
 
       updateStatus({
         phase: "checking_balance",
-        lastMessage: "Target not reached, retrying in 30 seconds",
-        nextStep: "Checking balance again in 30 seconds",
+        lastMessage: "Target not reached, waiting for funding",
+        nextStep: "Checking balance again once funded (or in 30 seconds)",
       });
 
-      log("❌ Target not reached yet. Retrying in 30 seconds.", "warning");
-      await new Promise((resolve) => setTimeout(resolve, 30_000));
+      log("❌ Target not reached yet. Waiting for funding.", "warning");
+      // Returns when the balance watcher reports the wallet funded, or after 30s without one
+      await waitForFunding(wallet.address, 0.01, 30_000);
     } catch (error) {
       log(`Error checking balance: ${error.message}`, "error");
       updateStatus({
@@ -216,6 +217,57 @@ export async function baselineFunction(ownerAddress) {
 [/CODE]
 """
 
+# Appended to a generated baselineFunction() for packed deployments (packing.py), so
+# the agent host can start and stop each agent through the same two exports.
+# Timers the strategy creates are tracked so stop() can cancel its pending work.
+AGENT_MODULE_INTERFACE = """
+// ======= AGENT MODULE INTERFACE =======
+const agentTimers = new Set();
+let agentStopped = false;
+
+const setTimeout = (callback, delay, ...args) => {
+  const id = globalThis.setTimeout(() => {
+    agentTimers.delete(id);
+    if (!agentStopped) callback(...args);
+  }, delay);
+  agentTimers.add(id);
+  return id;
+};
+const setInterval = (callback, delay, ...args) => {
+  const id = globalThis.setInterval(() => {
+    if (!agentStopped) callback(...args);
+  }, delay);
+  agentTimers.add(id);
+  return id;
+};
+const clearTimeout = (id) => {
+  agentTimers.delete(id);
+  globalThis.clearTimeout(id);
+};
+const clearInterval = (id) => {
+  agentTimers.delete(id);
+  globalThis.clearInterval(id);
+};
+
+export async function start({ ownerAddress } = {}) {
+  agentStopped = false;
+  // Not awaited: the strategy runs until stop(). A rejection is left unhandled
+  // so the host restarts the agent, as it would restart a crashed container.
+  baselineFunction(ownerAddress || process.env.OWNER_ADDRESS);
+}
+
+export async function stop() {
+  agentStopped = true;
+  for (const id of agentTimers) {
+    globalThis.clearTimeout(id);
+    globalThis.clearInterval(id);
+  }
+  agentTimers.clear();
+  updateStatus({ phase: "stopped", isRunning: false, lastMessage: "Agent stopped" });
+}
+// ======= END AGENT MODULE INTERFACE =======
+"""
+
 STATUS_FORMAT = """
 {{
   "phase": "initializing",
@@ -287,7 +339,7 @@ CODER_PROMPT = """
     RULES
       1. Do not access any external JavaScript libraries/packages. This may cause the script to fail.
       2. Use the Date() function when needed, nothing that needs to be installed.
-      3. Always output the entire baselineFunction().
+      3. {OUTPUT_RULE}
 
     EXECUTION WORKFLOW:
     When a user prompt arrives, follow this comprehensive approach:
@@ -315,12 +367,151 @@ CODER_PROMPT = """
     {BASELINE_JS}
 
     OUTPUT FORMAT:
-     Return ONLY a structured JSON object with the key:
-     - code: Complete baselineFunction() with integrated timing logic and strategy execution. 
+     Return ONLY a structured JSON object with the keys:
+     - {OUTPUT_FORMAT}
+     - {SPEC_FORMAT}
 
      CORE PRINCIPLES:
      - Resilience & Error Handling: Every operation that can fail (API calls, transactions) must be wrapped in a try-catch block. Log errors using log(error.message, "error") and update the status.
      - Transparency & Communication: You must use the provided functions for all output. Use log(message, type) for logs and updateStatus({{ phase, ... }}) for state changes. Do not use console.log().
      - Efficiency: Write optimized code that minimizes resource consumption by avoiding redundant API calls and unnecessary computations.
      - Autonomy: The generated baselineFunction must be fully autonomous, capable of running from start to finish without any manual intervention.
-    """
\ No newline at end of file
+    """
+
+# Output instructions for CODER_PROMPT. In "full" mode the model writes the whole
+# baselineFunction(); in "strategy" mode it writes only the ENTER AI CODE section,
+# which the service splices into BASELINE_JS.
+FULL_OUTPUT_RULE = "Always output the entire baselineFunction()."
+FULL_OUTPUT_FORMAT = "code: Complete baselineFunction() with integrated timing logic and strategy execution."
+
+STRATEGY_OUTPUT_RULE = (
+    "Output ONLY the code that goes between `// ======= ENTER AI CODE =======` and `// ======= END AI CODE =======`. "
+    "Do not repeat the wallet creation, balance-check loop or anything else from BASELINE_JS; it is added for you. "
+    "Your code runs inside that block, so `wallet` and `ownerAddress` are in scope, and the loop `break`s right after it."
+)
+STRATEGY_OUTPUT_FORMAT = "strategy: The statements for the ENTER AI CODE section only, with timing logic and strategy execution."
+
+# Machine-readable summary of the strategy, emitted alongside the code and used by backtest.py
+SPEC_OUTPUT_FORMAT = """spec: A summary of the strategy the code implements, with these fields:
+       - base_token: symbol of the token traded (e.g. "POL"); quote_token: symbol it is priced and paid in (e.g. "USDC")
+       - interval_seconds: how often the strategy checks the market
+       - rules: list of trade rules, each with
+           action: "buy" or "sell" (of base_token)
+           trigger: "schedule" (every check), "price_change" (percent change over lookback_seconds, negative for drops),
+                    "price_above" or "price_below" (absolute quote price)
+           threshold: percent for price_change, price for price_above/price_below, null for schedule
+           lookback_seconds: window for price_change (null means since the previous check)
+           amount_usd: quote amount per trade
+       - take_profit_pct, stop_loss_pct: percent from the average entry price that closes the position, or null
+       - max_trades: total trade limit, or null
+       Use numbers from the code, not from prose; if the code doesn't fit this shape, describe its closest equivalent."""
+
+EDITOR_PROMPT = """
+    You are <Agent E1>, a trading agent launcher created by Xade for EVM blockchains.
+
+    You will receive an existing, working baselineFunction() for a trading agent on Polygon (Chain ID 137)
+    and an instruction describing a change the user wants. Your task is to make that change with the
+    smallest possible patch. Do NOT rewrite the function.
+
+    RESOURCES:
+      1. Helper Functions:
+        {HELPER_FUNCTIONS}
+      2. Transactions Usage:
+        {TRANSACTIONS_USAGE}
+
+    RULES:
+      1. Return a list of search/replace edits. Each `search` must be copied verbatim from the existing code
+         and must match exactly one place. Include just enough surrounding lines to make it unique.
+      2. `replace` is the text that takes its place. Keep the surrounding style, logging and updateStatus() calls.
+      3. Leave everything you don't need to change untouched, including the wallet, balance-check and status scaffolding.
+      4. Keep the `export async function baselineFunction(ownerAddress)` signature. Use ethers v6, hex transaction
+         values ("0x0") and currentStatus.trades, as in the original code.
+
+    OUTPUT FORMAT:
+     Return ONLY a structured JSON object with the key:
+     - edits: list of {{"search": "<exact existing text>", "replace": "<new text>"}} objects, applied in order.
+    """
+
+# JSON schema for the coder's output, used when structured outputs are enabled
+CODE_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "code": {"type": "string"},
+    },
+    "required": ["code"],
+    "additionalProperties": False,
+}
+
+# JSON schema for the strategy spec (see SPEC_OUTPUT_FORMAT and validation.validate_strategy_spec)
+_NULLABLE_NUMBER = {"type": ["number", "null"]}
+STRATEGY_SPEC_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "base_token": {"type": "string"},
+        "quote_token": {"type": "string"},
+        "interval_seconds": {"type": "number"},
+        "rules": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "action": {"type": "string", "enum": ["buy", "sell"]},
+                    "trigger": {"type": "string", "enum": ["schedule", "price_change", "price_above", "price_below"]},
+                    "threshold": _NULLABLE_NUMBER,
+                    "lookback_seconds": _NULLABLE_NUMBER,
+                    "amount_usd": {"type": "number"},
+                },
+                "required": ["action", "trigger", "threshold", "lookback_seconds", "amount_usd"],
+                "additionalProperties": False,
+            },
+        },
+        "take_profit_pct": _NULLABLE_NUMBER,
+        "stop_loss_pct": _NULLABLE_NUMBER,
+        "max_trades": _NULLABLE_NUMBER,
+    },
+    "required": ["base_token", "quote_token", "interval_seconds", "rules", "take_profit_pct", "stop_loss_pct", "max_trades"],
+    "additionalProperties": False,
+}
+
+# Coder output: the code plus its spec
+CODER_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "code": {"type": "string"},
+        "spec": STRATEGY_SPEC_SCHEMA,
+    },
+    "required": ["code", "spec"],
+    "additionalProperties": False,
+}
+
+# JSON schema for the editor's search/replace patch
+EDIT_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "edits": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "search": {"type": "string"},
+                    "replace": {"type": "string"},
+                },
+                "required": ["search", "replace"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["edits"],
+    "additionalProperties": False,
+}
+
+# JSON schema for strategy-only output
+STRATEGY_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "strategy": {"type": "string"},
+        "spec": STRATEGY_SPEC_SCHEMA,
+    },
+    "required": ["strategy", "spec"],
+    "additionalProperties": False,
+}